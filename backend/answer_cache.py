@@ -0,0 +1,255 @@
+"""
+Answer cache for the farmer chatbot.
+
+Questions are normalized (case, punctuation, common transliterated Hindi
+words) and looked up exactly first. Otherwise a character-trigram TF-IDF
+index over the sorted question tokens finds the most similar cached
+question. A near match must agree on crop names and numbers, so "when to
+sow rice" never reuses the answer for wheat. Entries are evicted LRU-first
+and after a TTL, and can be persisted to SQLite so they survive restarts.
+"""
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+# Transliterated Hindi (and a few spelling variants) -> canonical English
+SYNONYMS = {
+    "gehun": "wheat", "gehu": "wheat", "gahu": "wheat", "gehoon": "wheat",
+    "dhan": "rice", "dhaan": "rice", "chawal": "rice", "paddy": "rice",
+    "makka": "maize", "makkai": "maize", "makai": "maize", "corn": "maize",
+    "ganna": "sugarcane", "kapas": "cotton", "bajra": "millet", "jowar": "millet",
+    "jau": "barley", "dal": "pulses", "daal": "pulses", "chana": "chickpea",
+    "soyabean": "soybean", "moongphali": "groundnut", "mungfali": "groundnut",
+    "peanut": "groundnut", "sarson": "mustard", "aloo": "potato", "aalu": "potato",
+    "tamatar": "tomato", "pyaz": "onion", "pyaaz": "onion",
+    "khad": "fertilizer", "khaad": "fertilizer", "urvarak": "fertilizer",
+    "fertiliser": "fertilizer", "fertilizers": "fertilizer",
+    "beej": "seed", "seeds": "seed",
+    "buvai": "sow", "bowai": "sow", "buwai": "sow", "bona": "sow", "boye": "sow", "sowing": "sow",
+    "katai": "harvest", "harvesting": "harvest",
+    "pani": "water", "paani": "water", "sinchai": "irrigation",
+    "keeda": "pest", "kida": "pest", "keet": "pest", "pests": "pest",
+    "rog": "disease", "bimari": "disease", "mitti": "soil", "fasal": "crop", "crops": "crop",
+    "barish": "rainfall", "baarish": "rainfall", "rain": "rainfall",
+    "kab": "when", "kaise": "how", "kya": "what", "kitna": "how much", "kaun": "which",
+    "accha": "best", "achha": "best", "acha": "best", "good": "best", "better": "best",
+}
+
+# Filler words (English and Hindi) that do not change the question
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "of", "for", "to", "in", "on", "my", "i", "me",
+    "please", "should", "do", "does", "can", "tell", "about",
+    "ka", "ki", "ke", "ko", "mein", "hai", "hain", "liye", "se", "par", "aur",
+    "sabse", "kare", "karen", "karein", "karna", "karni", "hota", "hoti", "chahiye",
+}
+
+# Terms a near match must agree on
+KEY_TERMS = {
+    "wheat", "rice", "maize", "sugarcane", "cotton", "millet", "barley", "pulses",
+    "chickpea", "soybean", "groundnut", "mustard", "potato", "tomato", "onion",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_NUMBER = re.compile(r"^\d+(\.\d+)?$")
+
+
+def normalize(question):
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    tokens = []
+    for word in text.split():
+        word = SYNONYMS.get(word, word)
+        if word not in STOPWORDS:
+            tokens.append(word)
+    return " ".join(tokens)
+
+
+def _signature(normalized):
+    """Crop names and numbers in a normalized question."""
+    return frozenset(t for t in normalized.split() if t in KEY_TERMS or _NUMBER.match(t))
+
+
+def _ngrams(normalized, n=3):
+    # Sorted tokens make the match independent of word order (Hindi is SOV)
+    padded = " " + " ".join(sorted(normalized.split())) + " "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class _Entry:
+    __slots__ = ("question", "answer", "created", "ngrams", "signature")
+
+    def __init__(self, key, question, answer, created):
+        self.question = question
+        self.answer = answer
+        self.created = created
+        self.ngrams = _ngrams(key)
+        self.signature = _signature(key)
+
+
+class AnswerCache:
+    def __init__(self, max_size=1000, ttl=7 * 24 * 3600, threshold=0.85, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()        # normalized question -> _Entry (LRU order)
+        self._postings = {}                  # trigram -> set of normalized questions
+        self._lock = threading.Lock()
+        self.stats = Counter(hits=0, near_hits=0, misses=0, evictions=0, expirations=0)
+
+        self.path = path
+        self._db = None
+        if path:
+            self._db = self._connect()
+            self._load()
+
+    # --- Public API ---
+    def get(self, question):
+        key = normalize(question)
+        now = time.time()
+        with self._lock:
+            entry = self._lookup(key, now)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return entry.answer
+
+            match = self._nearest(key, now)
+            if match is not None:
+                self.stats["near_hits"] += 1
+                return match.answer
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question, answer):
+        key = normalize(question)
+        if not key:
+            return
+        created = time.time()
+        with self._lock:
+            self._insert(key, question, answer, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                    (key, question, answer, created),
+                )
+                self._db.commit()
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["near_hits"] + self.stats["misses"]
+            served = self.stats["hits"] + self.stats["near_hits"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    def reopen(self):
+        """New SQLite connection for a forked worker (connections must not cross fork())."""
+        if self.path:
+            self._db = self._connect()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS answers "
+            "(key TEXT PRIMARY KEY, question TEXT, answer TEXT, created REAL)"
+        )
+        return db
+
+    # --- Internals (call with the lock held) ---
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry.created > self.ttl:
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, key, now):
+        query = _ngrams(key)
+        signature = _signature(key)
+
+        candidates = set()
+        for gram in query:
+            candidates.update(self._postings.get(gram, ()))
+        if not candidates:
+            return None
+
+        total = len(self._entries)
+        idf = {}
+
+        def weight(gram):
+            if gram not in idf:
+                idf[gram] = math.log((1 + total) / (1 + len(self._postings.get(gram, ())))) + 1
+            return idf[gram]
+
+        query_norm = math.sqrt(sum((c * weight(g)) ** 2 for g, c in query.items()))
+        best_key, best_score = None, self.threshold
+        for candidate in candidates:
+            entry = self._entries[candidate]
+            if entry.signature != signature:
+                continue
+            dot = sum(c * entry.ngrams[g] * weight(g) ** 2 for g, c in query.items() if g in entry.ngrams)
+            norm = math.sqrt(sum((c * weight(g)) ** 2 for g, c in entry.ngrams.items()))
+            score = dot / (query_norm * norm) if query_norm and norm else 0.0
+            if score >= best_score:
+                best_key, best_score = candidate, score
+
+        return self._lookup(best_key, now) if best_key is not None else None
+
+    def _insert(self, key, question, answer, created):
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(key, question, answer, created)
+        self._entries[key] = entry
+        for gram in entry.ngrams:
+            self._postings.setdefault(gram, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for gram in entry.ngrams:
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        self._db.execute("DELETE FROM answers WHERE created < ?", (cutoff,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, question, answer, created FROM answers ORDER BY created DESC LIMIT ?",
+            (self.max_size,),
+        ).fetchall()
+        with self._lock:
+            for key, question, answer, created in reversed(rows):
+                self._insert(key, question, answer, created)
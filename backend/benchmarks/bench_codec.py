@@ -0,0 +1,163 @@
+"""
+CPU cost of request decoding and response encoding, per request.
+
+Compares the handlers' old path (request.json(), then .get()/float() key
+juggling; jsonable_encoder, then json.dumps, as JSONResponse does) with the
+schema/codec path (one pydantic-core parse and validation; orjson, or
+MessagePack when installed). Payloads are sampled from the bundled CSVs and
+timed with time.process_time, so the numbers are CPU per call:
+
+    python benchmarks/bench_codec.py
+    python benchmarks/bench_codec.py --batch 5000 --output codec.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+CROP_DIR = os.path.join(BACKEND_DIR, "crop-selector", "datasets")
+WATER_DIR = os.path.join(BACKEND_DIR, "water-advisor", "datasets")
+sys.path.insert(0, BACKEND_DIR)
+
+import codec  # noqa: E402
+from crop_inference import FEATURE_ALIASES, _pick  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from schemas import CropConditions, ROIRequest, SoilReading, WaterAdvisorRequest  # noqa: E402
+
+
+# --- The handlers' previous decoding, kept here as the baseline ---
+def legacy_soil(body):
+    data = json.loads(body)
+    return {f: float(_pick(data, keys)) for f, keys in FEATURE_ALIASES.items()}
+
+
+def legacy_conditions(body):
+    data = json.loads(body)
+    return {k: float(data.get(k, 0)) for k in ("temperature", "rainfall", "ph", "N", "P", "K")}
+
+
+def legacy_roi(body):
+    data = json.loads(body)
+    return (
+        data.get("crop"),
+        float(data.get("investment")),
+        float(data.get("expected_yield") or data.get("expectedYield")),
+        float(data.get("market_price") or data.get("marketPrice")),
+    )
+
+
+def legacy_water(body):
+    data = json.loads(body)
+    return (
+        data.get("Crop_Name", "").lower(),
+        float(data.get("Rainfall_Requirement", 0)),
+        float(data.get("Temperature_Requirement", 0)),
+        float(data.get("Yield", 0)),
+        int(data.get("Crop_Cycle_Duration", 0)),
+        data.get("Soil_Type", "Unknown"),
+        data.get("Irrigation_Type", "Unknown"),
+        data.get("Water_Scarcity", "Unknown"),
+    )
+
+
+def legacy_encode(content):
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+# --- Payloads ---
+def build_payloads(n, batch, seed):
+    rng = random.Random(seed)
+    soil = pd.read_csv(os.path.join(CROP_DIR, "crop_yield_by_rainfall.csv")).to_dict("records")
+    water = pd.read_csv(os.path.join(WATER_DIR, "agricultural_water_footprint.csv")).to_dict("records")
+    features = ("N", "P", "K", "temperature", "humidity", "ph", "rainfall")
+    water_keys = ("Crop_Name", "Soil_Type", "Irrigation_Type", "Water_Scarcity", "Rainfall_Requirement",
+                  "Temperature_Requirement", "Yield", "Crop_Cycle_Duration")
+
+    def encode(body):
+        return json.dumps(body).encode()
+
+    requests = {"predict_crop": [], "select_crop": [], "calculate_roi": [], "water_advisor": []}
+    for _ in range(n):
+        row = rng.choice(soil)
+        requests["predict_crop"].append(encode({k: row[k] for k in features}))
+        requests["select_crop"].append(encode({k: row[k] for k in ("N", "P", "K", "ph", "temperature", "rainfall")}))
+        requests["calculate_roi"].append(encode({
+            "crop": row["crop"], "investment": rng.randint(10_000, 200_000),
+            "expected_yield": rng.randint(10, 60), "market_price": rng.randint(1000, 6000),
+        }))
+        w = rng.choice(water)
+        requests["water_advisor"].append(encode({k: w[k] for k in water_keys if k in w}))
+
+    top = [{"crop": rng.choice(soil)["crop"], "probability": round(rng.random() * 100, 2)} for _ in range(3)]
+    responses = {
+        "predict_crop": {"predicted_crop": top[0]["crop"], "top_3_predictions": top},
+        "predict_crop_batch": {
+            "count": batch, "failed": 0,
+            "results": [{"predicted_crop": top[0]["crop"], "top_predictions": top} for _ in range(batch)],
+        },
+        "select_crop_batch": {
+            "count": batch, "failed": 0,
+            "results": [{"recommended_crops": ["rice", "wheat", "maize", "cotton", "jute"]} for _ in range(batch)],
+        },
+    }
+    return requests, responses
+
+
+def cpu_per_call(fn, items, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return (time.process_time() - start) / (repeat * len(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request CPU of request decoding and response encoding.")
+    parser.add_argument("--requests", type=int, default=2000, help="sampled request bodies per endpoint")
+    parser.add_argument("--batch", type=int, default=1000, help="rows in the batch response payloads")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    requests, responses = build_payloads(args.requests, args.batch, args.seed)
+    decoders = {
+        "predict_crop": (legacy_soil, SoilReading.model_validate_json),
+        "select_crop": (legacy_conditions, CropConditions.model_validate_json),
+        "calculate_roi": (legacy_roi, ROIRequest.model_validate_json),
+        "water_advisor": (legacy_water, WaterAdvisorRequest.model_validate_json),
+    }
+
+    report = {"orjson": codec.orjson is not None, "msgpack": codec.msgpack is not None, "decode": {}, "encode": {}}
+    for name, (legacy, typed) in decoders.items():
+        old = cpu_per_call(legacy, requests[name], args.repeat)
+        new = cpu_per_call(typed, requests[name], args.repeat)
+        report["decode"][name] = {"legacy_us": round(old * 1e6, 2), "schema_us": round(new * 1e6, 2),
+                                  "speedup": round(old / new, 2)}
+
+    for name, content in responses.items():
+        repeat = args.repeat * (200 if name == "predict_crop" else 1)
+        old = cpu_per_call(legacy_encode, [content], repeat)
+        new = cpu_per_call(codec.dumps, [content], repeat)
+        entry = {"legacy_us": round(old * 1e6, 2), "codec_us": round(new * 1e6, 2), "speedup": round(old / new, 2),
+                 "json_bytes": len(codec.dumps(content))}
+        if codec.msgpack is not None:
+            entry["msgpack_us"] = round(cpu_per_call(codec.packb, [content], repeat) * 1e6, 2)
+            entry["msgpack_bytes"] = len(codec.packb(content))
+        report["encode"][name] = entry
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+In-process load and latency benchmark for the backend endpoints.
+
+Drives the FastAPI app through httpx's ASGI transport (no sockets) with
+payloads sampled from the bundled CSVs. For each endpoint and concurrency
+level it records throughput and p50/p95/p99 latency. It also records
+import/startup time and the memory of this single benchmark process (not of
+a multi-worker server; benchmarks/measure_memory.py reports per-worker
+PSS/USS). Results are written as JSON and can be compared against a stored
+baseline:
+
+    python benchmarks/bench_endpoints.py --output bench.json
+    python benchmarks/bench_endpoints.py --baseline bench.json --threshold 0.15
+
+The comparison exits with status 1 when any endpoint's p95 latency grows, or
+its throughput drops, by more than the threshold, or when it returns more
+errors than in the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import pandas as pd
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+CROP_DIR = os.path.join(BACKEND_DIR, "crop-selector", "datasets")
+WATER_DIR = os.path.join(BACKEND_DIR, "water-advisor", "datasets")
+
+# Benchmarks must not call a real LLM
+os.environ.setdefault("CHATBOT_BACKEND", "fake")
+# Finish warmup before the first timed request
+os.environ.setdefault("MODEL_WARMUP", "1")
+
+
+# --- Payloads ---
+def build_payloads(n, seed):
+    """Returns {endpoint: [(method, url, json), ...]} sampled from the datasets."""
+    rng = random.Random(seed)
+    soil = pd.read_csv(os.path.join(CROP_DIR, "crop_yield_by_rainfall.csv")).to_dict("records")
+    region = pd.read_csv(
+        os.path.join(CROP_DIR, "crop_yield_by_region.csv"), usecols=["Crop", "Area", "Production", "Yield"]
+    ).dropna()
+    region = region[region["Production"] > 0].to_dict("records")
+    water = pd.read_csv(os.path.join(WATER_DIR, "agricultural_water_footprint.csv")).to_dict("records")
+
+    def soil_reading():
+        row = rng.choice(soil)
+        return {k: row[k] for k in ("N", "P", "K", "temperature", "humidity", "ph", "rainfall")}, row["crop"]
+
+    payloads = {"predict_crop": [], "select_crop": [], "recommend_inputs": [], "water_advisor": [], "calculate_roi": [],
+                "roi_scenarios": []}
+    for _ in range(n):
+        reading, crop = soil_reading()
+        payloads["predict_crop"].append(("POST", "/api/predict_crop", reading))
+        payloads["select_crop"].append(("POST", "/api/select_crop", {**reading, "rainfall": reading["rainfall"] * 5}))
+        payloads["recommend_inputs"].append(("GET", f"/api/recommend_inputs/{crop}", None))
+
+        row = rng.choice(water)
+        payloads["water_advisor"].append(("POST", "/api/water_advisor", {
+            "Crop_Name": rng.choice(["rice", "wheat", "maize", "cotton", "soybean"]),
+            "Soil_Type": row["Soil Type"],
+            "Irrigation_Type": row["Irrigation Type"] if isinstance(row["Irrigation Type"], str) else "Unknown",
+            "Water_Scarcity": row["Water Scarcity"],
+            "Rainfall_Requirement": row["Rainfall Requirement (mm/year)"],
+            "Temperature_Requirement": row["Temperature Requirement (°C)"],
+            "Yield": row["Yield (tons/ha)"],
+            "Crop_Cycle_Duration": row["Crop Cycle Duration (days)"],
+        }))
+
+        row = rng.choice(region)
+        area = max(float(row["Area"]), 1.0)
+        payloads["calculate_roi"].append(("POST", "/api/calculate_roi", {
+            "crop": row["Crop"],
+            "investment": round(area * rng.uniform(20000, 60000), 2),
+            "expected_yield": float(row["Production"]),
+            "market_price": round(rng.uniform(1500, 4000), 2),
+        }))
+        # roi_scenarios prices are per tonne (yields are t/ha)
+        price = rng.uniform(15000, 40000)
+        payloads["roi_scenarios"].append(("POST", "/api/roi_scenarios", {
+            "crop": row["Crop"],
+            "investment": round(rng.uniform(20000, 60000), 2),
+            "market_price": {"dist": "normal", "mean": round(price, 2), "std": round(price * 0.15, 2)},
+            "seed": rng.randrange(2**31),
+        }))
+    return payloads
+
+
+# --- Load generation ---
+async def run_level(client, requests, concurrency):
+    queue = list(requests)
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            method, url, payload = queue.pop()
+            start = time.perf_counter()
+            response = await client.request(method, url, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200 or "error" in response.json():
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ms = sorted(x * 1000 for x in latencies)
+    q = statistics.quantiles(ms, n=100, method="inclusive")
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "throughput_rps": round(len(ms) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(q[49], 3),
+        "p95_ms": round(q[94], 3),
+        "p99_ms": round(q[98], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+async def run_benchmarks(app, payloads, levels, warmup):
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for endpoint, requests in payloads.items():
+                await run_level(client, requests[:warmup], 1)
+                results[endpoint] = {}
+                for level in levels:
+                    results[endpoint][str(level)] = await run_level(client, requests, level)
+                    row = results[endpoint][str(level)]
+                    print(f"{endpoint:>18} c={level:<3} {row['throughput_rps']:>9} rps  "
+                          f"p50 {row['p50_ms']:>8} ms  p95 {row['p95_ms']:>8} ms  p99 {row['p99_ms']:>8} ms  "
+                          f"errors {row['errors']}")
+    return results
+
+
+# --- Process measurements ---
+def measure_startup(runs):
+    """Seconds to import server.py in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return {"runs": runs, "median_s": round(statistics.median(times), 4), "max_s": round(max(times), 4)}
+
+
+def memory_usage():
+    """
+    RSS of this one process, which hosts the app in-process. For a server with
+    several workers, use benchmarks/measure_memory.py (per-worker PSS/USS).
+    """
+    usage = {"scope": "single process", "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    usage["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+# --- Baseline comparison ---
+def compare(current, baseline, threshold):
+    """Returns a list of human-readable regressions."""
+    regressions = []
+    for endpoint, levels in current["results"].items():
+        for level, row in levels.items():
+            base = baseline.get("results", {}).get(endpoint, {}).get(level)
+            if not base:
+                continue
+            # A handler that starts failing gets faster, so errors are checked before speed
+            if row["errors"] > base.get("errors", 0):
+                regressions.append(f"{endpoint} c={level}: errors {base.get('errors', 0)} -> {row['errors']}")
+            if row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(f"{endpoint} c={level}: p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+            if row["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{endpoint} c={level}: throughput {base['throughput_rps']} -> {row['throughput_rps']} rps")
+    base_startup = baseline.get("startup", {}).get("median_s")
+    if base_startup and current["startup"]["median_s"] > base_startup * (1 + threshold):
+        regressions.append(f"startup: {base_startup} -> {current['startup']['median_s']} s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process endpoint benchmark.")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and level")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--endpoints", help="comma-separated subset of endpoints")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--startup-runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args()
+
+    startup = measure_startup(args.startup_runs)
+    print(f"Startup (import server): median {startup['median_s']} s")
+
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+
+    payloads = build_payloads(args.requests, args.seed)
+    if args.endpoints:
+        wanted = set(args.endpoints.split(","))
+        payloads = {k: v for k, v in payloads.items() if k in wanted}
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = asyncio.run(run_benchmarks(server.app, payloads, levels, args.warmup))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "seed": args.seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "startup": startup,
+        "memory": memory_usage(),
+        "results": results,
+    }
+    print(f"Memory: {report['memory']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\n✅ No regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
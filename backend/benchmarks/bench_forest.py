@@ -0,0 +1,72 @@
+"""
+Compares sklearn's RandomForestClassifier.predict_proba with the flattened
+evaluator in forest_eval.py: checks both give the same probabilities (within
+float rounding) and the same predicted class on the training dataset, then
+times single rows and small batches.
+
+Run from the backend folder after crop-selector/make_model.py:
+    python benchmarks/bench_forest.py [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(BACKEND_DIR)
+from forest_eval import FlatForest
+
+MODEL_PATH = os.path.join(BACKEND_DIR, "crop-selector", "crop_prediction_model.pkl")
+DATASET_PATH = os.path.join(BACKEND_DIR, "crop-selector", "datasets", "crop_yield_by_rainfall.csv")
+
+
+def time_call(fn, repeat):
+    fn()  # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1e6
+    return np.median(times), np.percentile(times, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch-sizes", default="1,8,64,512")
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    flat = FlatForest.from_sklearn(model)
+    features = list(model.feature_names_in_)
+
+    data = pd.read_csv(DATASET_PATH)
+    data["rainfall"] = data["rainfall"] / 100
+    X = data[features].to_numpy(dtype=np.float64)
+
+    expected = model.predict_proba(pd.DataFrame(X, columns=features))
+    actual = flat.predict_proba(X)
+    print(f"Trees: {flat.n_trees}, nodes: {len(flat.threshold)}, max depth: {flat.max_depth}")
+    close = np.allclose(expected, actual, rtol=0, atol=1e-12)
+    same_class = np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1))
+    print(f"Probabilities equal within float rounding on {len(X)} rows: {close} "
+          f"(max abs diff {np.abs(expected - actual).max():.2e}); same predicted class: {same_class}\n")
+    if not close:
+        sys.exit("Flat forest probabilities differ from sklearn's.")
+
+    print(f"{'batch':>6} {'sklearn p50 µs':>15} {'p99':>10} {'flat p50 µs':>13} {'p99':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.batch_sizes.split(",")):
+        rows = X[:size]
+        frame = pd.DataFrame(rows, columns=features)
+        sk_p50, sk_p99 = time_call(lambda: model.predict_proba(frame), args.repeat)
+        fl_p50, fl_p99 = time_call(lambda: flat.predict_proba(rows), args.repeat)
+        print(f"{size:>6} {sk_p50:>15.1f} {sk_p99:>10.1f} {fl_p50:>13.1f} {fl_p99:>10.1f} {sk_p50 / fl_p50:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
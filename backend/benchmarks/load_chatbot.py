@@ -0,0 +1,113 @@
+"""
+Offline load test for /api/ask admission control.
+
+Fires a burst of concurrent questions at the app through httpx's ASGI
+transport. The chatbot runs on the fake backend, with a configurable delay
+standing in for the LLM. A few "trending" questions are repeated many
+times, alongside some unique ones. The answer cache is off, so the run
+measures coalescing and queueing only. It reports upstream calls, coalesced
+and rejected requests, queue wait and latency percentiles:
+
+    python benchmarks/load_chatbot.py --requests 500 --distinct 5 --unique 50 --delay 0.5
+    python benchmarks/load_chatbot.py --max-concurrency 4 --max-queue 16   # force rejections
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+TRENDING = [
+    "How do I control fall armyworm in maize?",
+    "Locust swarm alert, what should I spray?",
+    "When to sow wheat this season?",
+    "Pink bollworm in cotton, what to do?",
+    "How much urea for paddy per acre?",
+    "Yellow rust on wheat leaves, treatment?",
+    "Whitefly attack on cotton, which pesticide?",
+    "Best time to irrigate sugarcane in summer?",
+]
+
+
+def build_questions(n, distinct, unique, seed):
+    rng = random.Random(seed)
+    trending = TRENDING[:distinct]
+    questions = [f"Question {i} about my farm" for i in range(unique)]
+    questions += [rng.choice(trending) for _ in range(n - len(questions))]
+    rng.shuffle(questions)
+    return questions
+
+
+async def run(args):
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+
+    app = server.app
+    results = []
+
+    async def ask(client, question):
+        start = time.perf_counter()
+        response = await client.post("/api/ask", json={"query": question})
+        results.append((response.status_code, time.perf_counter() - start, response.headers.get("Retry-After")))
+
+    questions = build_questions(args.requests, args.distinct, args.unique, args.seed)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(ask(client, q) for q in questions))
+            elapsed = time.perf_counter() - start
+            stats = (await client.get("/api/ask/queue_stats")).json()
+
+    ok = sorted(seconds * 1000 for status, seconds, _ in results if status == 200)
+    rejected = [r for r in results if r[0] == 429]
+    q = statistics.quantiles(ok, n=100, method="inclusive") if len(ok) > 1 else [ok[0] if ok else 0.0] * 99
+    report = {
+        "requests": len(results),
+        "answered": len(ok),
+        "rejected": len(rejected),
+        "retry_after_hints": sorted({int(r[2]) for r in rejected if r[2]}),
+        "upstream_calls": stats["upstream_calls"],
+        "coalesced": stats["coalesced"],
+        "mean_queue_wait_seconds": stats["mean_wait_seconds"],
+        "elapsed_seconds": round(elapsed, 3),
+        "p50_ms": round(q[49], 1),
+        "p95_ms": round(q[94], 1),
+        "max_ms": round(ok[-1], 1) if ok else None,
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst /api/ask against the fake LLM and report admission stats.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=5, help="trending questions repeated across the burst")
+    parser.add_argument("--unique", type=int, default=50, help="one-off questions in the burst")
+    parser.add_argument("--delay", type=float, default=0.5, help="fake LLM latency in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "CHATBOT_BACKEND": "fake",
+        "CHATBOT_FAKE_DELAY": str(args.delay),
+        "CHATBOT_MAX_CONCURRENCY": str(args.max_concurrency),
+        "CHATBOT_MAX_QUEUE": str(args.max_queue),
+        "CHATBOT_CACHE_SIZE": "0",
+        "MODEL_WARMUP": "0",
+        "METRICS_ENABLED": "1",
+    })
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
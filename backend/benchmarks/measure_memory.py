@@ -0,0 +1,193 @@
+"""
+Per-process memory (RSS, PSS, USS) of a multi-worker server.
+
+RSS counts shared pages in full for every process, so summing it across
+workers overstates memory use. PSS splits each shared page between the
+processes that map it, so the PSS total is what the server really costs.
+USS (private pages) is what one more worker would add. Values come from
+/proc/<pid>/smaps_rollup, so this only runs on Linux.
+
+Inspect a running server (the parent pid and all its descendants):
+
+    python benchmarks/measure_memory.py --pid 12345
+
+Or launch serve_prefork.py and `uvicorn --workers` one after the other with
+the same worker count, send some traffic, and compare:
+
+    python benchmarks/measure_memory.py --compare --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+# A few requests that touch every preloaded model and dataset
+TRAFFIC = [
+    ("POST", "/api/predict_crop", {"N": 90, "P": 42, "K": 43, "temperature": 20.8, "humidity": 82.0, "ph": 6.5, "rainfall": 202.9}),
+    ("POST", "/api/select_crop", {"N": 90, "P": 42, "K": 43, "temperature": 25, "ph": 6.5, "rainfall": 900}),
+    ("GET", "/api/recommend_inputs/rice", None),
+    ("GET", "/api/analytics/yield?state=Punjab&crop=Wheat", None),
+    ("POST", "/api/water_advisor", {
+        "Crop_Name": "rice", "Soil_Type": "Clay", "Irrigation_Type": "Drip", "Water_Scarcity": "High",
+        "Rainfall_Requirement": 1200, "Temperature_Requirement": 25, "Yield": 4, "Crop_Cycle_Duration": 120,
+    }),
+]
+
+
+# --- /proc readers ---
+def memory(pid):
+    """Memory fields of one process in kB, from smaps_rollup (or summed smaps on older kernels)."""
+    values = dict.fromkeys(FIELDS, 0)
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        path = f"/proc/{pid}/smaps"
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(":")
+            if key in values and len(parts) >= 2:
+                values[key] += int(parts[1])
+    values["Uss"] = values["Private_Clean"] + values["Private_Dirty"]
+    return values
+
+
+def descendants(pid):
+    """All live descendants of pid, found through the PPid of every process."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Field 4 is the parent pid; the command name in () may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return sorted(found)
+
+
+def command(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="replace").strip()[:60]
+    except OSError:
+        return "?"
+
+
+def snapshot(pid):
+    rows = []
+    for p in [pid] + descendants(pid):
+        try:
+            rows.append({"pid": p, "role": "parent" if p == pid else "worker", "cmd": command(p), **memory(p)})
+        except OSError:
+            continue
+    totals = {k: sum(r[k] for r in rows) for k in FIELDS + ("Uss",)}
+    return {"processes": rows, "totals": totals}
+
+
+def print_snapshot(title, snap):
+    mb = lambda kb: f"{kb / 1024:8.1f}"
+    print(f"\n{title}")
+    print(f"{'pid':>8} {'role':<7} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'shared MB':>9}  command")
+    for r in snap["processes"]:
+        shared = r["Shared_Clean"] + r["Shared_Dirty"]
+        print(f"{r['pid']:>8} {r['role']:<7} {mb(r['Rss'])} {mb(r['Pss'])} {mb(r['Uss'])} {mb(shared):>9}  {r['cmd']}")
+    t = snap["totals"]
+    print(f"{'total':>8} {'':<7} {mb(t['Rss'])} {mb(t['Pss'])} {mb(t['Uss'])}")
+
+
+# --- Launching servers ---
+def request(port, method, path, payload=None, timeout=10):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.status
+
+
+def wait_ready(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if request(port, "GET", "/ready", timeout=2) == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def measure_launch(cmd, port, workers, rounds, settle, timeout):
+    env = {**os.environ, "CHATBOT_BACKEND": "fake", "MODEL_WARMUP": "1", "PYTHONPATH": BACKEND_DIR}
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(port, timeout):
+            raise RuntimeError(f"Server did not become ready: {' '.join(cmd)}")
+        # Spread traffic over the workers so each one has loaded and used everything
+        for _ in range(rounds * workers):
+            for method, path, payload in TRAFFIC:
+                request(port, method, path, payload)
+        time.sleep(settle)
+        return snapshot(proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-worker RSS/PSS/USS of the backend.")
+    parser.add_argument("--pid", type=int, help="parent pid of a running server")
+    parser.add_argument("--compare", action="store_true", help="launch prefork and uvicorn --workers and compare")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rounds", type=int, default=5, help="traffic rounds per worker before measuring")
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to wait after traffic")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for /ready")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    if args.pid:
+        results = {"pid": snapshot(args.pid)}
+        print_snapshot(f"Server {args.pid}", results["pid"])
+    elif args.compare:
+        port = str(args.port)
+        modes = {
+            "prefork": [sys.executable, "serve_prefork.py", "--workers", str(args.workers),
+                        "--host", "127.0.0.1", "--port", port, "--log-level", "warning"],
+            "uvicorn": [sys.executable, "-m", "uvicorn", "server:app", "--workers", str(args.workers),
+                        "--host", "127.0.0.1", "--port", port, "--log-level", "warning"],
+        }
+        results = {}
+        for mode, cmd in modes.items():
+            results[mode] = measure_launch(cmd, args.port, args.workers, args.rounds, args.settle, args.timeout)
+            print_snapshot(f"{mode} ({args.workers} workers)", results[mode])
+        pre, uvi = results["prefork"]["totals"], results["uvicorn"]["totals"]
+        print(f"\nTotal PSS: prefork {pre['Pss'] / 1024:.1f} MB vs uvicorn {uvi['Pss'] / 1024:.1f} MB "
+              f"({1 - pre['Pss'] / max(uvi['Pss'], 1):.0%} less)")
+    else:
+        parser.error("pass --pid or --compare")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
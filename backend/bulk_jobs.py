@@ -0,0 +1,369 @@
+"""
+Bulk CSV scoring jobs.
+
+An uploaded CSV of soil tests is streamed to a temporary file, so the
+upload never sits in memory. A dispatcher thread then reads it back with
+pandas in fixed-size chunks and scores each chunk in a process pool. Every
+worker loads the crop model, the suitability table and the water model
+once. At most `max_inflight` chunks are out at a time, so memory is bounded
+by the chunk size, not by the size of the upload. Results are appended as
+NDJSON to a result file in input order as chunks complete. Clients can poll
+the job for progress, tail the results while the job runs (NDJSON or CSV),
+or cancel it.
+
+Each row gets a crop prediction (top 3), the suitable crops from
+CROP_DATA and a water-use prediction. Water inputs come from the row's
+water-advisor columns when present (Crop_Name, Soil_Type, ...); otherwise
+the predicted crop and the row's temperature/rainfall are used.
+"""
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+STATUSES = ("uploading", "queued", "running", "done", "failed", "cancelled")
+FINISHED = ("done", "failed", "cancelled")
+FORMATS = ("ndjson", "csv")
+
+
+# --- Worker side ---
+# Set once per worker process by _init_worker
+_scorers = {}
+
+
+def _init_worker(config):
+    from crop_suitability import SuitabilityTable
+
+    if os.path.exists(config["flat_model_path"]):
+        from forest_eval import FlatForest
+        _scorers["crop"] = FlatForest.load(config["flat_model_path"])
+    else:
+        import joblib
+        _scorers["crop"] = joblib.load(config["model_path"])
+    _scorers["suitability"] = SuitabilityTable.from_crop_data(config["crop_data"])
+    try:
+        from water_model import load_water_advisor
+        _scorers["water"] = load_water_advisor(config["water_model_dir"], config["water_dataset_path"])
+    except Exception as e:
+        print("⚠️ Bulk worker could not load the water model:", e)
+        _scorers["water"] = None
+
+
+def _water_record(record, crop):
+    """Water-advisor inputs for a row, falling back to the predicted crop and the soil-test climate."""
+    return {
+        **record,
+        "Crop_Name": record.get("Crop_Name") or crop,
+        "Rainfall_Requirement": record.get("Rainfall_Requirement", record.get("rainfall")),
+        "Temperature_Requirement": record.get("Temperature_Requirement", record.get("temperature")),
+    }
+
+
+def score_chunk(frame, first_row):
+    """Scores one chunk; returns (NDJSON text, rows, failed rows)."""
+    from crop_inference import predict_records
+
+    # NaN -> None so missing cells read as missing, not as the string "nan"
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    predictions = predict_records(_scorers["crop"], records, k=3)
+    rankings, _ = _scorers["suitability"].recommend(
+        [{k: v for k, v in r.items() if v is not None} for r in records], k=5
+    )
+
+    valid = [i for i, p in enumerate(predictions) if "error" not in p]
+    water = {}
+    if _scorers["water"] is not None and valid:
+        inputs = [_water_record(records[i], predictions[i]["predicted_crop"]) for i in valid]
+        water = dict(zip(valid, _scorers["water"].predict(inputs)))
+
+    lines = []
+    for i, prediction in enumerate(predictions):
+        row = {"row": first_row + i}
+        if "error" in prediction:
+            row["error"] = prediction["error"]
+        else:
+            row.update(prediction)
+            row["suitable_crops"] = rankings[i] or []
+            row["water"] = water.get(i)
+        lines.append(json.dumps(row, ensure_ascii=False))
+    return "\n".join(lines) + "\n", len(records), len(records) - len(valid)
+
+
+# --- Jobs ---
+class BulkJob:
+    def __init__(self, job_id, directory):
+        self.id = job_id
+        self.directory = directory
+        self.upload_path = os.path.join(directory, "upload.csv")
+        self.result_path = os.path.join(directory, "results.ndjson")
+        self.status = "uploading"
+        self.error = None
+        self.bytes = 0
+        self.rows_total = 0
+        self.rows_done = 0
+        self.failed = 0
+        self.chunks_done = 0
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancelled = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def snapshot(self):
+        elapsed = (self.finished or time.time()) - self.started if self.started else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "upload_bytes": self.bytes,
+            "rows_total": self.rows_total,
+            "rows_done": self.rows_done,
+            "rows_failed": self.failed,
+            "chunks_done": self.chunks_done,
+            "progress": round(min(self.rows_done / self.rows_total, 1.0), 4) if self.rows_total else (1.0 if self.done else 0.0),
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.rows_done / elapsed, 1) if elapsed else None,
+        }
+
+
+class JobLimitExceeded(Exception):
+    pass
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class JobManager:
+    def __init__(self, scorer_config, workers=None, chunk_rows=5000, max_inflight=None, max_jobs=4,
+                 max_upload_bytes=200 << 20, ttl=3600.0, root=None, start_method="spawn"):
+        self.scorer_config = scorer_config
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_rows = chunk_rows
+        self.max_inflight = max_inflight or self.workers * 2
+        self.max_jobs = max_jobs
+        self.max_upload_bytes = max_upload_bytes
+        self.ttl = ttl
+        self.root = root or tempfile.mkdtemp(prefix="kisan-jobs-")
+        self.start_method = start_method
+        self.jobs = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # --- Pool ---
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn by default: forking a process that runs an event loop and threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self.scorer_config,),
+                )
+            return self._pool
+
+    def _discard(self, pool):
+        """Drops a pool whose worker died, so the next job starts a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        for job in list(self.jobs.values()):
+            job.cancelled.set()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    # --- Lifecycle ---
+    def _expire(self):
+        now = time.time()
+        for job in list(self.jobs.values()):
+            if job.done and now - job.finished > self.ttl:
+                self.remove(job.id)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def remove(self, job_id):
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            job.cancelled.set()
+            shutil.rmtree(job.directory, ignore_errors=True)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and not job.done:
+            job.cancelled.set()
+        return job
+
+    async def submit(self, chunks):
+        """
+        Creates a job from an async iterator of upload bytes and starts it.
+        Raises JobLimitExceeded or UploadTooLarge.
+        """
+        self._expire()
+        if sum(not job.done for job in self.jobs.values()) >= self.max_jobs:
+            raise JobLimitExceeded(f"Too many running jobs (max {self.max_jobs}).")
+
+        job_id = uuid.uuid4().hex[:16]
+        job = BulkJob(job_id, os.path.join(self.root, job_id))
+        os.makedirs(job.directory)
+        self.jobs[job_id] = job
+        try:
+            newlines, last = 0, b"\n"
+            with open(job.upload_path, "wb") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    job.bytes += len(chunk)
+                    if job.bytes > self.max_upload_bytes:
+                        raise UploadTooLarge(f"Upload too large (max {self.max_upload_bytes >> 20} MB).")
+                    f.write(chunk)
+                    newlines += chunk.count(b"\n")
+                    last = chunk[-1:]
+            # Header line excluded; a row counter for progress, quoted newlines aside
+            job.rows_total = max(newlines + (last != b"\n") - 1, 0)
+        except BaseException:
+            self.remove(job_id)
+            raise
+
+        job.status = "queued"
+        threading.Thread(target=self._run, args=(job,), name=f"bulk-{job_id}", daemon=True).start()
+        return job
+
+    def _run(self, job):
+        import pandas as pd
+
+        job.status = "running"
+        job.started = time.time()
+        inflight = deque()
+
+        def collect(out):
+            text, rows, failed = inflight.popleft().result()
+            out.write(text)
+            out.flush()
+            job.rows_done += rows
+            job.failed += failed
+            job.chunks_done += 1
+
+        pool = None
+        try:
+            pool = self._executor()
+            with open(job.result_path, "w", encoding="utf-8") as out:
+                first_row = 0
+                for frame in pd.read_csv(job.upload_path, chunksize=self.chunk_rows, skipinitialspace=True):
+                    if job.cancelled.is_set():
+                        break
+                    inflight.append(pool.submit(score_chunk, frame, first_row))
+                    first_row += len(frame)
+                    # Bounded read-ahead: wait for the oldest chunk before reading more
+                    while len(inflight) >= self.max_inflight:
+                        collect(out)
+                while inflight and not job.cancelled.is_set():
+                    collect(out)
+            job.status = "cancelled" if job.cancelled.is_set() else "done"
+        except CancelledError:
+            job.status = "cancelled"
+        except BrokenProcessPool as e:
+            # A worker died (OOM, crash); the pool is unusable for every later job too
+            job.status = "failed"
+            job.error = f"A scoring worker stopped unexpectedly: {e}"
+            print(f"⚠️ Bulk job {job.id} failed, restarting the worker pool:", e)
+            self._discard(pool)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"⚠️ Bulk job {job.id} failed:", e)
+        finally:
+            for future in inflight:
+                future.cancel()
+            job.finished = time.time()
+            try:
+                os.remove(job.upload_path)
+            except OSError:
+                pass
+
+
+# --- Result streaming ---
+def _csv_line(row, columns):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns if row is None else [row.get(c, "") for c in columns])
+    return buffer.getvalue()
+
+
+def _flatten(result, targets):
+    flat = {"row": result["row"], "error": result.get("error", "")}
+    if "predicted_crop" in result:
+        top = result["top_predictions"]
+        flat["predicted_crop"] = result["predicted_crop"]
+        flat["probability"] = top[0]["probability"] if top else ""
+        flat["top_crops"] = ";".join(p["crop"] for p in top)
+        flat["suitable_crops"] = ";".join(result["suitable_crops"])
+        water = result.get("water") or {}
+        for target in targets:
+            flat[target] = water.get(target, "")
+        flat["water_warnings"] = " ".join(water.get("warnings", []))
+    return flat
+
+
+async def iter_results(job, fmt="ndjson", progress=False, poll=0.2, block=1 << 16):
+    """
+    Yields the job's results as they are written, until the job finishes.
+    NDJSON may be interleaved with {"progress": {...}} lines; CSV is flattened.
+    """
+    from water_model import TARGETS
+
+    columns = ["row", "predicted_crop", "probability", "top_crops", "suitable_crops", *TARGETS,
+               "water_warnings", "error"]
+    if fmt == "csv":
+        yield _csv_line(None, columns)
+
+    position, pending, reported = 0, b"", -1
+    while True:
+        finished = job.done
+        data = b""
+        if os.path.exists(job.result_path):
+            with open(job.result_path, "rb") as f:
+                f.seek(position)
+                data = f.read(block)
+        position += len(data)
+        pending += data
+        # Only whole lines; a chunk being written may end mid-line
+        cut = pending.rfind(b"\n") + 1
+        lines, pending = pending[:cut], pending[cut:]
+        if lines:
+            if fmt == "csv":
+                yield "".join(_csv_line(_flatten(json.loads(line), TARGETS), columns) for line in lines.splitlines())
+            else:
+                yield lines.decode("utf-8")
+                if progress and job.chunks_done != reported:
+                    reported = job.chunks_done
+                    yield json.dumps({"progress": job.snapshot()}) + "\n"
+        if len(data) == block:
+            continue
+        if finished and not data:
+            break
+        if not data:
+            await asyncio.sleep(poll)
+
+    if fmt == "ndjson":
+        yield json.dumps({"summary": job.snapshot()}) + "\n"
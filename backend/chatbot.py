@@ -0,0 +1,276 @@
+"""
+Chatbot backends for /api/ask.
+
+Backends are async, so an LLM round-trip never blocks the event loop. The
+Chatbot wrapper sits in front of the backend and does three things:
+- Identical questions that are already in flight share one upstream call.
+- An admission queue caps concurrent upstream calls. Waiting callers are
+  served first-come, first-served.
+- Once the queue is full, callers are rejected at once with a retry hint
+  (Overloaded) instead of piling up until everyone times out.
+
+Pick a backend with CHATBOT_BACKEND ("cohere" or "fake"). The fake one
+answers locally and is what tests, offline runs and load tests
+(benchmarks/load_chatbot.py) use.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+PROMPT = "Answer this farmer's question in simple terms: {question}"
+
+
+class CohereBackend:
+    def __init__(self, api_key, model="command-r", timeout=30.0):
+        import cohere
+
+        self.model = model
+        self.client = cohere.AsyncClient(api_key, timeout=timeout)
+
+    async def answer(self, question):
+        response = await self.client.chat(model=self.model, message=PROMPT.format(question=question))
+        return response.text.strip()
+
+    async def stream(self, question):
+        async for event in self.client.chat_stream(model=self.model, message=PROMPT.format(question=question)):
+            if event.event_type == "text-generation":
+                yield event.text
+
+
+class FakeBackend:
+    """Answers locally with no network; delays simulate a slow provider."""
+
+    def __init__(self, delay=0.0, token_delay=0.0, answers=None):
+        self.delay = delay
+        self.token_delay = token_delay
+        self.answers = answers or {}
+        self.calls = 0
+
+    def _reply(self, question):
+        return self.answers.get(question, f"(offline answer) You asked: {question}")
+
+    async def answer(self, question):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self._reply(question)
+
+    async def stream(self, question):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        words = self._reply(question).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else " " + word
+
+
+def _cohere_backend():
+    api_key = os.getenv("COHERE_API_KEY")
+    return CohereBackend(api_key, model=os.getenv("COHERE_MODEL", "command-r")) if api_key else None
+
+
+def _fake_backend():
+    return FakeBackend(
+        delay=float(os.getenv("CHATBOT_FAKE_DELAY", 0)),
+        token_delay=float(os.getenv("CHATBOT_FAKE_TOKEN_DELAY", 0)),
+    )
+
+
+# name -> factory returning a backend (or None when it cannot be configured)
+BACKENDS = {
+    "cohere": _cohere_backend,
+    "fake": _fake_backend,
+}
+
+
+def create_backend(name=None):
+    name = name or os.getenv("CHATBOT_BACKEND", "cohere")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown chatbot backend '{name}'. Choose from {', '.join(BACKENDS)}.")
+    return BACKENDS[name]()
+
+
+class Overloaded(Exception):
+    """The admission queue is full; retry_after is a hint in whole seconds."""
+
+    def __init__(self, retry_after, queued):
+        super().__init__(f"Chatbot busy ({queued} questions queued), retry in {retry_after}s.")
+        self.retry_after = retry_after
+        self.queued = queued
+
+
+class QueueFull(Exception):
+    pass
+
+
+class AdmissionQueue:
+    """
+    Up to `limit` callers hold a slot at once and up to `max_queue` wait in
+    FIFO order; anyone beyond that is rejected. A released slot is handed
+    straight to the oldest waiter, so newcomers cannot overtake the queue.
+    """
+
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters = deque()
+        self.stats = {"admitted": 0, "waited": 0, "rejected": 0}
+
+    @property
+    def depth(self):
+        return len(self._waiters)
+
+    def full(self):
+        return self.active >= self.limit and len(self._waiters) >= self.max_queue
+
+    async def acquire(self):
+        """Takes a slot, waiting if needed; returns the seconds spent waiting. Raises QueueFull."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFull()
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["waited"] += 1
+        try:
+            await waiter
+        except BaseException:
+            # Cancelled, or the stream generator was closed while waiting
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was already handed over; pass it on
+            else:
+                self._waiters.remove(waiter)
+            raise
+        self.stats["admitted"] += 1
+        return time.perf_counter() - start
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot moves to the waiter; active is unchanged
+                return
+        self.active -= 1
+
+
+def _question_key(question):
+    return " ".join(question.lower().split())
+
+
+class Chatbot:
+    """Runs a backend with single-flight coalescing, admission control and per-call timeouts."""
+
+    def __init__(self, backend, max_concurrency=8, timeout=30.0, max_queue=64, key=_question_key, on_wait=None):
+        """
+        key(question) decides which questions count as identical; on_wait(seconds)
+        is called with each admitted call's queue wait.
+        """
+        self.backend = backend
+        self.timeout = timeout
+        self.key = key
+        self.on_wait = on_wait
+        self.admission = AdmissionQueue(max_concurrency, max_queue)
+        self._inflight = {}
+        # Running estimate of one upstream call, for Retry-After
+        self.latency = None
+        self.stats = {"upstream_calls": 0, "coalesced": 0, "failures": 0, "wait_seconds": 0.0}
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely free: the queue drained at `limit` calls per latency."""
+        latency = self.latency if self.latency is not None else min(self.timeout, 2.0)
+        batches = (self.admission.depth + 1) / self.admission.limit
+        return max(1, min(60, math.ceil(latency * batches)))
+
+    def overloaded(self):
+        """Overloaded error to raise if a new call would be rejected right now, else None."""
+        if self.admission.full():
+            return Overloaded(self.retry_after(), self.admission.depth)
+        return None
+
+    async def _admit(self):
+        try:
+            waited = await self.admission.acquire()
+        except QueueFull:
+            raise Overloaded(self.retry_after(), self.admission.depth) from None
+        self.stats["wait_seconds"] += waited
+        if self.on_wait is not None:
+            self.on_wait(waited)
+
+    def _record_latency(self, seconds):
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+    async def _call(self, question):
+        await self._admit()
+        try:
+            self.stats["upstream_calls"] += 1
+            start = time.perf_counter()
+            answer = await asyncio.wait_for(self.backend.answer(question), self.timeout)
+            self._record_latency(time.perf_counter() - start)
+            return answer
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+        finally:
+            self.admission.release()
+
+    async def ask(self, question):
+        """Answers a question; concurrent identical questions share one call. Raises Overloaded."""
+        key = self.key(question)
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._call(question))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one caller giving up does not cancel the call for the others
+        return await asyncio.shield(pending)
+
+    def _finish(self, key, done):
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            done.exception()  # retrieved, so an error nobody awaited is not logged as unhandled
+
+    async def stream(self, question):
+        """Yields text chunks; the timeout applies to the whole answer. Raises Overloaded."""
+        await self._admit()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        self.stats["upstream_calls"] += 1
+        try:
+            chunks = self.backend.stream(question)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(chunks), deadline - loop.time())
+                    except StopAsyncIteration:
+                        return
+                    yield chunk
+            finally:
+                await chunks.aclose()
+        finally:
+            self.admission.release()
+
+    def snapshot(self):
+        admission = self.admission
+        admitted = admission.stats["admitted"]
+        return {
+            "active": admission.active,
+            "queued": admission.depth,
+            "max_concurrency": admission.limit,
+            "max_queue": admission.max_queue,
+            "inflight_questions": len(self._inflight),
+            **admission.stats,
+            **{k: v for k, v in self.stats.items() if k != "wait_seconds"},
+            "mean_wait_seconds": round(self.stats["wait_seconds"] / admitted, 4) if admitted else 0.0,
+            "upstream_latency_seconds": round(self.latency, 4) if self.latency is not None else None,
+            "retry_after_seconds": self.retry_after(),
+        }
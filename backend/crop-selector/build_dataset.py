@@ -0,0 +1,175 @@
+"""
+Builds the merged crop training set (super_dataset_detailed) in bounded memory.
+
+The old create_dataset_OLD.py left-merged every region row with every
+rainfall sample of the same crop (about 100 per crop) before merging the
+soil data, so the intermediate frame grew with regions x samples. Here:
+
+1. rainfall samples are reduced to per-crop means,
+2. soil samples are reduced to per-(crop, year) means and the most common
+   soil type, with per-crop fallbacks,
+3. the regional data is streamed in chunks, each chunk is joined against
+   those small lookup tables and appended to a columnar table
+   (see datasets.TableWriter).
+
+Memory is bounded by the chunk size plus one row per crop/year, whatever
+the source sizes. Run from anywhere:
+
+    python backend/crop-selector/build_dataset.py
+    python backend/crop-selector/build_dataset.py --chunksize 20000 --csv super_dataset_detailed.csv
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(HERE, "datasets")
+sys.path.append(os.path.join(HERE, ".."))
+from datasets import TableWriter  # noqa: E402
+
+RAINFALL_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph"]
+OUTPUT_COLUMNS = [
+    "label", "Year", "Season", "State", "Area", "Production", "Yield",
+    "N", "P", "K", "temperature", "humidity", "soil_type", "ph",
+]
+
+
+class GroupStats:
+    """Running per-group sums and counts, so means can be built chunk by chunk."""
+
+    def __init__(self):
+        self.sums = None
+        self.counts = None
+
+    def add(self, grouped):
+        sums, counts = grouped.sum(), grouped.count()
+        if self.sums is None:
+            self.sums, self.counts = sums, counts
+        else:
+            self.sums = self.sums.add(sums, fill_value=0)
+            self.counts = self.counts.add(counts, fill_value=0)
+
+    def means(self):
+        return self.sums / self.counts.where(self.counts > 0)
+
+
+def _label(series):
+    return series.astype(str).str.strip().str.lower()
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(stage, started, **counts):
+    details = ", ".join(f"{k.replace('_', ' ')} {v:,}" for k, v in counts.items())
+    print(f"✅ {stage}: {details} in {time.perf_counter() - started:.2f}s (peak RSS {_peak_rss_mb():.0f} MB)")
+
+
+# --- Stages ---
+def aggregate_rainfall(path, chunksize):
+    """Per-crop means of the soil-test features."""
+    started = time.perf_counter()
+    stats, rows = GroupStats(), 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        label = "label" if "label" in chunk.columns else "crop"
+        chunk["label"] = _label(chunk[label])
+        stats.add(chunk.groupby("label")[RAINFALL_FEATURES])
+        rows += len(chunk)
+    means = stats.means()
+    report("rainfall", started, rows=rows, crops=len(means))
+    return means
+
+
+def aggregate_soil(path, chunksize):
+    """
+    Per-(crop, year) and per-crop mean pH and most common soil type, or
+    (None, None) when the soil dataset is not available.
+    """
+    if not os.path.exists(path):
+        print(f"⚠️ {os.path.basename(path)} not found, soil_type is left empty and ph comes from the rainfall data only")
+        return None, None
+
+    started = time.perf_counter()
+    by_year, by_crop, soil_counts, rows = GroupStats(), GroupStats(), None, 0
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=["Date", "Crop_Type", "Soil_Type", "Soil_pH"]):
+        chunk = chunk.rename(columns={"Crop_Type": "label", "Soil_Type": "soil_type", "Soil_pH": "ph"})
+        chunk["label"] = _label(chunk["label"])
+        chunk["Year"] = pd.to_datetime(chunk["Date"]).dt.year
+        by_year.add(chunk.groupby(["label", "Year"])[["ph"]])
+        by_crop.add(chunk.groupby("label")[["ph"]])
+        counts = chunk.groupby(["label", "Year", "soil_type"]).size()
+        soil_counts = counts if soil_counts is None else soil_counts.add(counts, fill_value=0)
+        rows += len(chunk)
+
+    year_table = by_year.means()
+    if soil_counts is not None and len(soil_counts):
+        # Most common soil type per (crop, year)
+        top = soil_counts.sort_values(ascending=False).reset_index().drop_duplicates(["label", "Year"])
+        year_table = year_table.join(top.set_index(["label", "Year"])["soil_type"])
+    crop_table = by_crop.means()
+    report("soil", started, rows=rows, crop_years=len(year_table), crops=len(crop_table))
+    return year_table, crop_table
+
+
+def merge_region(path, rainfall, soil_by_year, soil_by_crop, writer, chunksize, csv_path=None):
+    started = time.perf_counter()
+    rows_in = chunks = 0
+    rainfall = rainfall.add_suffix("_rain")
+    usecols = ["Crop", "Crop_Year", "Season", "State", "Area", "Production", "Yield"]
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=usecols):
+        chunk = chunk.rename(columns={"Crop": "label", "Crop_Year": "Year"})
+        chunk["label"] = _label(chunk["label"])
+        chunk["Season"] = chunk["Season"].str.strip()
+
+        merged = chunk.join(rainfall, on="label")
+        for col in ["N", "P", "K", "temperature", "humidity"]:
+            merged[col] = merged[col + "_rain"]
+        merged["ph"] = merged["ph_rain"]
+        merged["soil_type"] = None
+
+        if soil_by_year is not None:
+            soil = merged[["label", "Year"]].join(soil_by_year, on=["label", "Year"])
+            merged["soil_type"] = soil["soil_type"] if "soil_type" in soil else None
+            # Same precedence as before: rainfall pH first, then soil pH for the year, then for the crop
+            merged["ph"] = merged["ph"].combine_first(soil["ph"])
+            merged["ph"] = merged["ph"].combine_first(merged[["label"]].join(soil_by_crop, on="label")["ph"])
+
+        out = merged[OUTPUT_COLUMNS]
+        writer.append(out)
+        if csv_path:
+            out.to_csv(csv_path, mode="w" if chunks == 0 else "a", header=chunks == 0, index=False)
+        rows_in += len(chunk)
+        chunks += 1
+    report("region merge", started, rows=rows_in, chunks=chunks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the merged crop training set in bounded memory.")
+    parser.add_argument("--rainfall", default=os.path.join(DATASET_DIR, "crop_yield_by_rainfall.csv"))
+    parser.add_argument("--region", default=os.path.join(DATASET_DIR, "crop_yield_by_region.csv"))
+    parser.add_argument("--soil", default=os.path.join(DATASET_DIR, "crop_yield_by_soil.csv"))
+    parser.add_argument("--output", default=os.path.join(DATASET_DIR, "super_dataset_detailed"),
+                        help="columnar table directory (read with datasets.read_table)")
+    parser.add_argument("--csv", help="also write the merged rows to this CSV")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    rainfall = aggregate_rainfall(args.rainfall, args.chunksize)
+    soil_by_year, soil_by_crop = aggregate_soil(args.soil, args.chunksize)
+
+    dtypes = {"Year": "int32", "Area": "float64", "Production": "float64", "Yield": "float64"}
+    with TableWriter(args.output, dtypes=dtypes, source=os.path.basename(args.region)) as writer:
+        merge_region(args.region, rainfall, soil_by_year, soil_by_crop, writer, args.chunksize, args.csv)
+
+    report("total", started, rows_written=writer.rows)
+    print(f"📦 {args.output}" + (f" and {args.csv}" if args.csv else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Crop calendar: sowing and harvest windows per (state, crop, season).
+
+Windows are built in one pass over three sources:
+- the State/Crop/Season combinations of crop_yield_by_region.csv, which say
+  where and in which season each crop is grown;
+- the cycle_days ranges of CROP_DATA;
+- the per-crop Crop Cycle Duration of agricultural_water_footprint.csv, for
+  crops that CROP_DATA does not cover.
+
+Each season has a sowing window (Kharif: June-July, Rabi: mid October to
+mid December, ...). The harvest window is that window shifted by the crop's
+shortest and longest cycle. Crops with no known cycle use the season's
+typical one.
+
+The table is written to .cache/datasets/crop_calendar-<hash>.json, keyed by
+the sources' content hashes, so it is computed once per dataset version. It
+is then served from dicts keyed by state and crop. Requests never touch the
+CSVs. Prebuild it (e.g. in a Docker build) with `python crop_calendar.py`.
+"""
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from datasets import CACHE_DIR, read_dataset, source_hash
+
+FORMAT_VERSION = 1
+
+# season -> sowing window ((month, day), (month, day)) and typical cycle (min, max days)
+SEASONS = {
+    "kharif": {"label": "Kharif", "sowing": ((6, 1), (7, 31)), "cycle": (90, 150)},
+    "rabi": {"label": "Rabi", "sowing": ((10, 15), (12, 15)), "cycle": (110, 150)},
+    "summer": {"label": "Summer (Zaid)", "sowing": ((3, 1), (4, 30)), "cycle": (60, 100)},
+    "autumn": {"label": "Autumn (Aus)", "sowing": ((4, 15), (6, 15)), "cycle": (90, 120)},
+    "winter": {"label": "Winter (Aman)", "sowing": ((6, 15), (8, 15)), "cycle": (130, 160)},
+    "whole year": {"label": "Whole Year", "sowing": ((1, 1), (12, 31)), "cycle": (300, 365)},
+}
+
+# Regional crop names -> CROP_DATA keys
+CROP_ALIASES = {
+    "cotton(lint)": "cotton",
+    "soyabean": "soybean",
+    "bajra": "millet",
+    "jowar": "millet",
+    "ragi": "millet",
+    "small millets": "millet",
+    "arhar/tur": "pulses",
+    "gram": "pulses",
+    "masoor": "pulses",
+    "moong(green gram)": "pulses",
+    "urad": "pulses",
+    "moth": "pulses",
+    "khesari": "pulses",
+    "horse-gram": "pulses",
+    "cowpea(lobia)": "pulses",
+    "peas & beans (pulses)": "pulses",
+    "other kharif pulses": "pulses",
+    "other rabi pulses": "pulses",
+    "other summer pulses": "pulses",
+}
+
+# Non-leap reference year for month-day arithmetic in the stored table
+_REFERENCE_YEAR = 2001
+
+
+def _key(name):
+    return re.sub(r"\s+", " ", str(name).strip().lower())
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def _range(text):
+    from crop_suitability import parse_range
+    low, high = parse_range(text)
+    return None if low != low else (int(low), int(high))
+
+
+def crop_cycles(crop_data):
+    """{crop: (min, max days)} from CROP_DATA's cycle_days ranges."""
+    cycles = {}
+    for crop, info in crop_data.items():
+        cycle = _range(info.get("cycle_days", ""))
+        if cycle:
+            cycles[_key(crop)] = cycle
+    return cycles
+
+
+def water_cycles(path, low=0.25, high=0.75):
+    """{crop: (p25, p75 days)} of Crop Cycle Duration, also under singular names ("bananas" -> "banana")."""
+    data = read_dataset(path, usecols=["Crop", "Crop Cycle Duration (days)"]).dropna()
+    data["Crop"] = data["Crop"].map(_key)
+    grouped = data.groupby("Crop")["Crop Cycle Duration (days)"]
+    lo, hi = grouped.quantile(low), grouped.quantile(high)
+    cycles = {}
+    for crop in lo.index:
+        cycle = (int(round(lo[crop])), int(round(hi[crop])))
+        names = {crop, crop[:-1] if crop.endswith("s") else crop, crop[:-2] if crop.endswith("es") else crop}
+        for name in names:
+            cycles.setdefault(name, cycle)
+    return cycles
+
+
+def _shift(month_day, days):
+    date = datetime.date(_REFERENCE_YEAR, *month_day) + datetime.timedelta(days=days)
+    return date.strftime("%m-%d"), date.year - _REFERENCE_YEAR
+
+
+def build_calendar(region_path, crop_data, water_path=None):
+    """Calendar entries for every (state, crop, season) grown in the regional dataset."""
+    data = read_dataset(region_path, usecols=["State", "Crop", "Season", "Crop_Year", "Area"])
+    data = data.dropna(subset=["State", "Crop", "Season"])
+    for column in ("State", "Crop", "Season"):
+        data[column] = data[column].astype(str).str.strip()
+    grouped = data.groupby(["State", "Crop", "Season"]).agg(
+        records=("Crop_Year", "size"), last_year=("Crop_Year", "max"), area=("Area", "mean")
+    )
+
+    known = crop_cycles(crop_data)
+    fallback = water_cycles(water_path) if water_path else {}
+
+    entries = []
+    for (state, crop, season), row in grouped.iterrows():
+        info = SEASONS.get(_key(season))
+        if info is None:
+            continue
+        name = _key(crop)
+        base = CROP_ALIASES.get(name, name)
+        if base in known:
+            cycle, source = known[base], "crop_data"
+        elif name in fallback or base in fallback:
+            cycle, source = fallback.get(name) or fallback[base], "water_footprint"
+        else:
+            cycle, source = info["cycle"], "season"
+
+        (sow_start, sow_end) = info["sowing"]
+        harvest_start, start_offset = _shift(sow_start, cycle[0])
+        harvest_end, end_offset = _shift(sow_end, cycle[1])
+        entries.append({
+            "state": state,
+            "crop": crop,
+            "season": info["label"],
+            "season_key": _key(season),
+            "year_round": _key(season) == "whole year",
+            "sowing": {"start": "%02d-%02d" % sow_start, "end": "%02d-%02d" % sow_end},
+            "harvest": {"start": harvest_start, "end": harvest_end, "next_year": bool(start_offset or end_offset)},
+            "cycle_days": {"min": cycle[0], "max": cycle[1], "source": source},
+            "records": int(row["records"]),
+            "last_year": int(row["last_year"]),
+            "mean_area_ha": round(float(row["area"]), 1) if row["area"] == row["area"] else None,
+        })
+    return entries
+
+
+def _signature(region_path, crop_data, water_path):
+    h = hashlib.sha256()
+    h.update(json.dumps([FORMAT_VERSION, sorted(crop_cycles(crop_data).items())]).encode())
+    for path in (region_path, water_path):
+        h.update((source_hash(path) if path else "-").encode())
+    return h.hexdigest()[:16]
+
+
+def load_or_build(region_path, crop_data, water_path=None, cache_dir=None):
+    """Entries from the cached table when the sources are unchanged, else built and cached."""
+    cache_dir = cache_dir or CACHE_DIR
+    path = os.path.join(cache_dir, f"crop_calendar-{_signature(region_path, crop_data, water_path)}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["entries"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    entries = build_calendar(region_path, crop_data, water_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        for stale in glob.glob(os.path.join(cache_dir, "crop_calendar-*.json")):
+            if stale != path:
+                os.remove(stale)
+    except OSError as e:
+        print("⚠️ Could not cache the crop calendar:", e)
+    return entries
+
+
+class CropCalendar:
+    def __init__(self, entries):
+        self.entries = entries
+        self._states = {}
+        self._by_state = {}
+        self._by_crop = {}
+        for entry in entries:
+            state, crop = _key(entry["state"]), _key(entry["crop"])
+            self._states.setdefault(state, entry["state"])
+            self._by_state.setdefault(state, []).append(entry)
+            self._by_crop.setdefault((state, crop), []).append(entry)
+        # Most widely grown first
+        for group in (*self._by_state.values(), *self._by_crop.values()):
+            group.sort(key=lambda e: (-(e["mean_area_ha"] or 0), e["crop"], e["season"]))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def states(self):
+        return sorted(self._states.values())
+
+    def crops(self, state):
+        return sorted({e["crop"] for e in self._by_state.get(_key(state), [])})
+
+    def lookup(self, state, crop=None, season=None):
+        """Entries for a state (all crops, or one), optionally one season. None if the state is unknown."""
+        state = _key(state)
+        if state not in self._states:
+            return None
+        entries = self._by_crop.get((state, _key(crop)), []) if crop else self._by_state[state]
+        if season:
+            season = _key(season)
+            entries = [e for e in entries if season in (e["season_key"], _key(e["season"]))]
+        return entries
+
+
+# --- iCalendar export ---
+def _escape(text):
+    return str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+    # RFC 5545: lines longer than 75 octets continue on the next line after a space
+    out = []
+    while len(line.encode("utf-8")) > 75:
+        cut = 75
+        while len(line[:cut].encode("utf-8")) > 75:
+            cut -= 1
+        out.append(line[:cut])
+        line = " " + line[cut:]
+    out.append(line)
+    return "\r\n".join(out)
+
+
+def _date(year, month_day):
+    month, day = (int(part) for part in month_day.split("-"))
+    return datetime.date(year, month, min(day, 28) if (month, day) == (2, 29) else day)
+
+
+def _event(uid, stamp, start, end, summary, description):
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{start:%Y%m%d}",
+        # DTEND is exclusive for all-day events
+        f"DTEND;VALUE=DATE:{end + datetime.timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{_escape(summary)}",
+        f"DESCRIPTION:{_escape(description)}",
+        "TRANSP:TRANSPARENT",
+        "END:VEVENT",
+    ]
+
+
+def to_ical(entries, year, name="Kisan Mitra crop calendar"):
+    """An iCalendar (RFC 5545) document with sowing and harvest events for the given sowing year."""
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Kisan Mitra//Crop Calendar//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for entry in entries:
+        cycle = entry["cycle_days"]
+        uid = slugify(f"{entry['state']}-{entry['crop']}-{entry['season_key']}")
+        where = f"{entry['crop']} ({entry['season']}, {entry['state']})"
+        if entry["year_round"]:
+            lines += _event(
+                f"{uid}-{year}@kisan-mitra", stamp, datetime.date(year, 1, 1), datetime.date(year, 12, 31),
+                f"{where}: grown year-round",
+                f"Can be sown any time; harvest about {cycle['min']}-{cycle['max']} days after sowing.",
+            )
+            continue
+        sow_start, sow_end = _date(year, entry["sowing"]["start"]), _date(year, entry["sowing"]["end"])
+        lines += _event(
+            f"{uid}-sowing-{year}@kisan-mitra", stamp, sow_start, sow_end, f"Sow {where}",
+            f"Sowing window. Crop cycle {cycle['min']}-{cycle['max']} days.",
+        )
+        lines += _event(
+            f"{uid}-harvest-{year}@kisan-mitra", stamp,
+            sow_start + datetime.timedelta(days=cycle["min"]), sow_end + datetime.timedelta(days=cycle["max"]),
+            f"Harvest {where}", f"Harvest window for crops sown {sow_start:%d %b}-{sow_end:%d %b} {year}.",
+        )
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+if __name__ == "__main__":
+    from server import CROP_DATA, REGION_DATASET_PATH, WATER_DATASET_PATH
+
+    calendar = CropCalendar(load_or_build(REGION_DATASET_PATH, CROP_DATA, WATER_DATASET_PATH))
+    print(f"✅ Crop calendar: {len(calendar)} entries for {len(calendar.states())} states in {CACHE_DIR}")
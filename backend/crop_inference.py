@@ -0,0 +1,141 @@
+"""
+Vectorized helpers for the crop prediction endpoints.
+
+Records are validated column by column into a single float matrix so the
+model can score a whole batch with one predict_proba call, and the top-k
+crops per row are picked with a partial sort instead of sorting every class.
+"""
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+# Model feature -> request keys accepted for it (the frontend sends n/p/k/temp)
+FEATURE_ALIASES = {
+    "N": ("N", "n"),
+    "P": ("P", "p"),
+    "K": ("K", "k"),
+    "temperature": ("temperature", "temp"),
+    "humidity": ("humidity",),
+    "ph": ("ph",),
+    "rainfall": ("rainfall",),
+}
+FEATURES = list(FEATURE_ALIASES)
+
+# The model is trained on rainfall / 100 (see crop-selector/make_model.py)
+RAINFALL_SCALE = 100.0
+
+
+def model_features(model):
+    """Feature columns the model was fitted on, in fit order."""
+    names = getattr(model, "feature_names_in_", None)
+    return [str(n) for n in names] if names is not None else FEATURES
+
+
+def _pick(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def records_to_matrix(records, features=FEATURES):
+    """
+    Validates a list of request records as columns.
+
+    Returns (matrix, errors) where matrix is an (n, len(features)) float64
+    array in input order and errors maps row index -> message for every row
+    that could not be used. Rainfall is rescaled the same way as in training.
+    """
+    n = len(records)
+    matrix = np.empty((n, len(features)), dtype=np.float64)
+    errors = {}
+
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors[i] = "Record must be a JSON object."
+    records = [r if isinstance(r, dict) else {} for r in records]
+
+    for j, feature in enumerate(features):
+        keys = FEATURE_ALIASES.get(feature, (feature,))
+        column = [_pick(r, keys) for r in records]
+        try:
+            # Fast path: the whole column converts at once (None becomes NaN)
+            matrix[:, j] = np.asarray(column, dtype=np.float64)
+        except (TypeError, ValueError):
+            for i, value in enumerate(column):
+                try:
+                    matrix[i, j] = float(value) if value is not None else np.nan
+                except (TypeError, ValueError):
+                    matrix[i, j] = np.nan
+                    errors.setdefault(i, f"Invalid value for '{feature}': {value!r}")
+
+        for i in np.flatnonzero(~np.isfinite(matrix[:, j])):
+            errors.setdefault(int(i), f"Missing or invalid value for '{feature}'.")
+
+    if "rainfall" in features:
+        matrix[:, features.index("rainfall")] /= RAINFALL_SCALE
+    return matrix, errors
+
+
+def top_k(probabilities, classes, k=3):
+    """
+    Picks the k most likely classes per row with argpartition, then orders
+    only those k. Returns (labels, probabilities), both shaped (n, k).
+    """
+    probabilities = np.asarray(probabilities)
+    k = max(1, min(int(k), probabilities.shape[1]))
+    candidates = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    candidate_probs = np.take_along_axis(probabilities, candidates, axis=1)
+    order = np.argsort(-candidate_probs, axis=1, kind="stable")
+    best = np.take_along_axis(candidates, order, axis=1)
+    return np.asarray(classes)[best], np.take_along_axis(probabilities, best, axis=1)
+
+
+def predict_proba(model, matrix):
+    """Runs one predict_proba call over the whole matrix."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and not getattr(model, "takes_arrays", False):
+        # Keep feature names so sklearn does not warn about a bare array
+        matrix = pd.DataFrame(matrix, columns=names, copy=False)
+    return model.predict_proba(matrix)
+
+
+def format_predictions(labels, probabilities):
+    return [
+        {"crop": str(crop), "probability": round(float(prob) * 100, 2)}
+        for crop, prob in zip(labels, probabilities)
+    ]
+
+
+def _no_timer(stage):
+    return nullcontext()
+
+
+def predict_records(model, records, k=3, timer=_no_timer):
+    """
+    Scores a batch of records and returns one result per input record, in
+    input order. Invalid rows get an {"error": ...} entry instead of failing
+    the batch. timer(stage) may return a context manager to time the
+    "prepare" and "inference" stages.
+    """
+    features = model_features(model)
+    with timer("prepare"):
+        matrix, errors = records_to_matrix(records, features)
+    results = [None] * len(records)
+
+    valid = np.array([i not in errors for i in range(len(records))], dtype=bool)
+    if valid.any():
+        with timer("inference"):
+            probabilities = predict_proba(model, matrix[valid])
+        labels, probs = top_k(probabilities, model.classes_, k)
+        for row, i in enumerate(np.flatnonzero(valid)):
+            results[i] = {
+                "predicted_crop": str(labels[row, 0]),
+                "top_predictions": format_predictions(labels[row], probs[row]),
+            }
+
+    for i, message in errors.items():
+        results[i] = {"error": message}
+    return results
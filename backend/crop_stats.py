@@ -0,0 +1,102 @@
+"""
+Per-crop aggregate index over crop_yield_by_rainfall.csv.
+
+The dataset is grouped once into plain dicts (mean, median, p10, p90, std of
+every input), so lookups are a dict access with no pandas work. The source
+file is re-checked every few seconds and the index is rebuilt in the
+background when it changes; readers keep using the old index until the new
+one is swapped in.
+"""
+import os
+import threading
+import time
+
+from datasets import read_dataset
+
+INPUT_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+STATISTICS = ("mean", "median", "p10", "p90", "std")
+
+# recommend_inputs has always reported rainfall scaled by 100
+OUTPUT_SCALE = {"rainfall": 100}
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def build_index(path, columns=INPUT_COLUMNS):
+    """Groups the dataset by crop and returns {crop: {"samples", stat: {col: value}}}."""
+    data = read_dataset(path)
+    grouped = data.groupby(data["crop"].str.strip().str.lower())[columns]
+    tables = {
+        "mean": grouped.mean(),
+        "median": grouped.median(),
+        "p10": grouped.quantile(0.1),
+        "p90": grouped.quantile(0.9),
+        "std": grouped.std(),
+    }
+    counts = grouped.size()
+
+    index = {}
+    for crop in counts.index:
+        entry = {"samples": int(counts[crop])}
+        for stat, table in tables.items():
+            row = table.loc[crop]
+            entry[stat] = {
+                col: round(float(row[col]) * OUTPUT_SCALE.get(col, 1), 2)
+                for col in columns
+            }
+        index[crop] = entry
+    return index
+
+
+class CropStatsIndex:
+    def __init__(self, path, check_interval=5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._signature = _file_signature(path)
+        self._index = build_index(path)
+        self._next_check = time.monotonic() + check_interval
+
+    def crops(self):
+        self._maybe_reload()
+        return sorted(self._index)
+
+    def get(self, crop, stats=("mean",)):
+        """
+        Returns {"samples": n, stat: {column: value}} for the requested
+        statistics, or None if the crop is unknown.
+        """
+        self._maybe_reload()
+        entry = self._index.get(crop.strip().lower())
+        if entry is None:
+            return None
+        return {"samples": entry["samples"], **{s: entry[s] for s in stats}}
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check or self._rebuilding:
+            return
+        self._next_check = now + self.check_interval
+        try:
+            signature = _file_signature(self.path)
+        except OSError:
+            return  # keep serving the last good index
+        if signature != self._signature:
+            with self._lock:
+                if self._rebuilding:
+                    return
+                self._rebuilding = True
+            threading.Thread(target=self._rebuild, args=(signature,), daemon=True).start()
+
+    def _rebuild(self, signature):
+        try:
+            self._index = build_index(self.path)
+            self._signature = signature
+        except Exception as e:
+            print("⚠️ Could not rebuild crop statistics:", e)
+        finally:
+            self._rebuilding = False
@@ -0,0 +1,189 @@
+"""
+Numeric crop-suitability table.
+
+CROP_DATA keeps human-readable ranges ("20–35 °C"). They are parsed once into
+a float matrix (one row per crop) so select_crop and water_advisor compare
+numbers instead of re-splitting strings, and many input conditions can be
+scored against every crop in a single vectorized pass.
+"""
+import re
+
+import numpy as np
+
+from datasets import read_dataset
+
+# Matrix columns
+FIELDS = [
+    "temp_min", "temp_max",
+    "rain_min", "rain_max",
+    "cycle_min", "cycle_max",
+    "yield_min", "yield_max",
+    "water_min", "water_max",
+]
+COL = {name: i for i, name in enumerate(FIELDS)}
+
+# CROP_DATA key -> matrix column prefix
+RANGE_KEYS = {
+    "temperature": "temp",
+    "rainfall": "rain",
+    "cycle_days": "cycle",
+    "yield_estimate": "yield",
+    "water_use": "water",
+}
+
+_RANGE = re.compile(r"(-?\d+(?:\.\d+)?)\s*[–—-]\s*(-?\d+(?:\.\d+)?)")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Same thresholds select_crop has always used
+PH_RANGE = (5.5, 7.5)
+MIN_SCORE = 3
+
+
+def parse_range(text):
+    """'20–35 °C' -> (20.0, 35.0); a single number gives (x, x); else NaNs."""
+    match = _RANGE.search(str(text))
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    match = _NUMBER.search(str(text))
+    if match:
+        value = float(match.group(0))
+        return value, value
+    return np.nan, np.nan
+
+
+class SuitabilityTable:
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.values = np.empty((0, len(FIELDS)), dtype=np.float64)
+
+    @classmethod
+    def from_crop_data(cls, crop_data):
+        table = cls()
+        table.add_crops(
+            {
+                name: {
+                    f"{prefix}_{bound}": value
+                    for key, prefix in RANGE_KEYS.items()
+                    for bound, value in zip(("min", "max"), parse_range(info.get(key, "")))
+                }
+                for name, info in crop_data.items()
+            }
+        )
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_crops(self, crops, replace=False):
+        """
+        Adds crops from {name: {field: value}}; missing fields become NaN,
+        and a NaN range never counts as a match. Existing crops are kept
+        unless replace=True.
+        """
+        rows, names = [], []
+        for name, fields in crops.items():
+            key = name.strip().lower()
+            row = [float(fields.get(f, np.nan)) for f in FIELDS]
+            if key in self.index:
+                if replace:
+                    self.values[self.index[key]] = row
+                continue
+            names.append(key)
+            rows.append(row)
+
+        if rows:
+            self.values = np.vstack([self.values, np.asarray(rows, dtype=np.float64)])
+            for name in names:
+                self.index[name] = len(self.names)
+                self.names.append(name)
+        return len(names)
+
+    def extend_from_region(self, path, low=0.1, high=0.9):
+        """
+        Adds crops from crop_yield_by_region.csv that are not in the table yet.
+        Rainfall and yield ranges come from the p10/p90 of Annual_Rainfall and
+        Yield (t/ha, stored as kg/ha); temperature and cycle length are unknown.
+        """
+        data = read_dataset(path, usecols=["Crop", "Annual_Rainfall", "Yield"])
+        data["Crop"] = data["Crop"].str.strip().str.lower()
+        grouped = data.groupby("Crop")
+        lo, hi = grouped.quantile(low), grouped.quantile(high)
+        crops = {
+            crop: {
+                "rain_min": lo.at[crop, "Annual_Rainfall"],
+                "rain_max": hi.at[crop, "Annual_Rainfall"],
+                "yield_min": lo.at[crop, "Yield"] * 1000,
+                "yield_max": hi.at[crop, "Yield"] * 1000,
+            }
+            for crop in lo.index
+        }
+        return self.add_crops(crops)
+
+    def limits(self, crop):
+        """Numeric ranges for one crop as {field: value}, or None if unknown."""
+        i = self.index.get(crop.strip().lower())
+        if i is None:
+            return None
+        return dict(zip(FIELDS, self.values[i].tolist()))
+
+    def score(self, temperature, rainfall, ph, N, P, K):
+        """
+        Scores every condition against every crop. Inputs are scalars or 1-D
+        arrays of equal length; returns an (n_conditions, n_crops) int matrix.
+        """
+        t = np.atleast_1d(np.asarray(temperature, dtype=np.float64))[:, None]
+        r = np.atleast_1d(np.asarray(rainfall, dtype=np.float64))[:, None]
+        ph = np.atleast_1d(np.asarray(ph, dtype=np.float64))
+        N, P, K = (np.atleast_1d(np.asarray(x, dtype=np.float64)) for x in (N, P, K))
+
+        v = self.values
+        score = 2 * ((v[:, COL["temp_min"]] <= t) & (t <= v[:, COL["temp_max"]]))
+        score += 2 * ((v[:, COL["rain_min"]] <= r) & (r <= v[:, COL["rain_max"]]))
+        # Soil checks do not depend on the crop yet, so they shift whole rows
+        score += ((PH_RANGE[0] <= ph) & (ph <= PH_RANGE[1]))[:, None]
+        score += ((N > 0) & (P > 0) & (K > 0))[:, None]
+        return score
+
+    def rank(self, scores, k=5, min_score=MIN_SCORE):
+        """
+        Top-k crop names per row of a score matrix: highest score first, then
+        highest yield, then table order. Crops under min_score are dropped.
+        """
+        n = len(self.names)
+        if n == 0:
+            return [[] for _ in range(len(scores))]
+        k = max(1, min(int(k), n))
+
+        # Fold (score, yield rank, table order) into one exact integer key
+        yields = np.nan_to_num(self.values[:, COL["yield_max"]], nan=-np.inf)
+        yield_rank = np.unique(yields, return_inverse=True)[1].astype(np.int64)
+        key = (scores.astype(np.int64) * n + yield_rank) * n + (n - 1 - np.arange(n))
+
+        best = np.argpartition(-key, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(best, np.argsort(-np.take_along_axis(key, best, axis=1), axis=1), axis=1)
+        keep = np.take_along_axis(scores, best, axis=1) >= min_score
+        return [[self.names[i] for i in row[mask]] for row, mask in zip(best, keep)]
+
+    def recommend(self, conditions, k=5):
+        """
+        Ranks crops for a list of condition dicts (N, P, K, ph, temperature,
+        rainfall in mm/year; missing keys count as 0).
+
+        Returns (rankings, errors): rankings[i] is a list of crop names, or
+        None when row i is invalid and errors[i] says why.
+        """
+        names = ("temperature", "rainfall", "ph", "N", "P", "K")
+        columns = {name: np.zeros(len(conditions), dtype=np.float64) for name in names}
+        errors = {}
+        for i, condition in enumerate(conditions):
+            try:
+                for name in names:
+                    columns[name][i] = float(condition.get(name, 0))
+            except (AttributeError, TypeError, ValueError) as e:
+                errors[i] = f"Invalid condition: {e}"
+
+        rankings = self.rank(self.score(**columns), k=k)
+        for i in errors:
+            rankings[i] = None
+        return rankings, errors
@@ -0,0 +1,334 @@
+"""
+Columnar cache for the bundled CSV datasets.
+
+The first read of a CSV parses it once and writes every column as a .npy
+file (text columns as int32 codes plus a label list) under
+.cache/datasets/<name>-<sha256 prefix>/. Later reads memory-map those files
+instead of parsing the CSV again. Because the cache key is the content hash,
+an edited CSV gets a fresh cache automatically and stale ones are removed.
+
+    from datasets import read_dataset, load_columns
+    data = read_dataset("crop-selector/datasets/crop_yield_by_rainfall.csv")
+    arrays, categories = load_columns(path, ["Crop", "Yield"])
+
+Prebuild all caches (e.g. in a Docker build) with `python datasets.py`.
+
+TableWriter writes the same layout chunk by chunk (for generated datasets
+that should never be fully in memory); read them back with load_table() or
+read_table().
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR") or os.path.join(BASE_DIR, ".cache", "datasets")
+FORMAT_VERSION = 1
+
+_hashes = {}
+_uncached = set()
+_lock = threading.Lock()
+
+
+def source_hash(path):
+    """sha256 of the file, memoized per (path, mtime, size)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _hashes.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _hashes[key] = h.hexdigest()
+    return digest
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def cache_path(path, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{_stem(path)}-{source_hash(path)[:16]}")
+
+
+def _encode(data):
+    """Yields (column entry, values) in the cache layout for each column of a DataFrame."""
+    import pandas as pd
+
+    for i, name in enumerate(data.columns):
+        series = data[name]
+        entry = {"name": str(name), "file": f"c{i}.npy"}
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy()
+            entry["kind"] = "numeric"
+        else:
+            codes, labels = pd.factorize(series, sort=True)
+            values = codes.astype(np.int32)
+            entry["kind"] = "category"
+            entry["categories"] = [str(v) for v in labels]
+        entry["dtype"] = str(values.dtype)
+        yield entry, values
+
+
+def build_cache(path, target):
+    """Parses the CSV and writes one .npy per column plus meta.json, atomically."""
+    import pandas as pd  # only needed to (re)build; cached reads are pure NumPy
+
+    data = pd.read_csv(path)
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".build-", dir=parent)
+    os.chmod(tmp, 0o755)
+    try:
+        columns = []
+        for entry, values in _encode(data):
+            np.save(os.path.join(tmp, entry["file"]), values)
+            columns.append(entry)
+
+        meta = {
+            "format": FORMAT_VERSION,
+            "source": os.path.basename(path),
+            "sha256": source_hash(path),
+            "rows": len(data),
+            "columns": columns,
+        }
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # Another process built the same cache first
+            shutil.rmtree(tmp, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    # Drop caches of older versions of this file
+    for old in glob.glob(os.path.join(parent, f"{_stem(path)}-*")):
+        if old != target and os.path.isdir(old):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _meta(path, cache_dir=None):
+    target = cache_path(path, cache_dir)
+    meta_file = os.path.join(target, "meta.json")
+    if not os.path.exists(meta_file):
+        with _lock:
+            if not os.path.exists(meta_file):
+                build_cache(path, target)
+    with open(meta_file, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        shutil.rmtree(target, ignore_errors=True)
+        with _lock:
+            build_cache(path, target)
+        with open(meta_file, encoding="utf-8") as f:
+            meta = json.load(f)
+    return target, meta
+
+
+def _select(meta, columns):
+    entries = {c["name"]: c for c in meta["columns"]}
+    if columns is None:
+        return list(entries.values())
+    missing = [c for c in columns if c not in entries]
+    if missing:
+        raise KeyError(f"Columns not in {meta['source']}: {', '.join(missing)}")
+    return [entries[c] for c in columns]
+
+
+def _load(target, meta, columns, mmap_mode):
+    arrays, categories = {}, {}
+    for entry in _select(meta, columns):
+        arrays[entry["name"]] = np.load(os.path.join(target, entry["file"]), mmap_mode=mmap_mode)
+        if entry["kind"] == "category":
+            categories[entry["name"]] = entry["categories"]
+    return arrays, categories
+
+
+def load_columns(path, columns=None, mmap_mode="r", cache_dir=None):
+    """
+    Returns (arrays, categories): arrays maps column -> ndarray (memory-mapped
+    read-only by default), text columns come back as int32 codes (-1 = missing)
+    with their sorted labels in categories[column].
+    """
+    try:
+        target, meta = _meta(path, cache_dir)
+    except OSError as e:
+        if not os.path.isfile(path):
+            raise
+        # Read-only or full cache dir: serve the CSV parsed in memory instead
+        if path not in _uncached:
+            _uncached.add(path)
+            print(f"⚠️ Could not cache {os.path.basename(path)}, parsing it in memory:", e)
+        return _parse(path, columns)
+    return _load(target, meta, columns, mmap_mode)
+
+
+def _parse(path, columns):
+    """load_columns() without the cache: the CSV parsed in memory on every call."""
+    import pandas as pd
+
+    entries = {entry["name"]: (entry, values) for entry, values in _encode(pd.read_csv(path))}
+    meta = {"source": os.path.basename(path), "columns": [entry for entry, _ in entries.values()]}
+    arrays, categories = {}, {}
+    for entry in _select(meta, columns):
+        arrays[entry["name"]] = entries[entry["name"]][1]
+        if entry["kind"] == "category":
+            categories[entry["name"]] = entry["categories"]
+    return arrays, categories
+
+
+def load_table(directory, columns=None, mmap_mode="r"):
+    """load_columns() for a table directory written by TableWriter."""
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    return _load(directory, meta, columns, mmap_mode)
+
+
+def read_dataset(path, usecols=None, categorical=False, cache_dir=None):
+    """
+    Drop-in for pd.read_csv(path, usecols=...) backed by the columnar cache.
+    Numeric columns are copy-on-write memory maps (pages are only copied if
+    the frame is modified). Text columns are rebuilt as strings, or as
+    pandas Categoricals over the cached codes with categorical=True.
+    """
+    return _frame(*load_columns(path, usecols, mmap_mode="c", cache_dir=cache_dir), categorical)
+
+
+def read_table(directory, columns=None, categorical=False):
+    """read_dataset() for a table directory written by TableWriter."""
+    return _frame(*load_table(directory, columns, mmap_mode="c"), categorical)
+
+
+def _frame(arrays, categories, categorical):
+    import pandas as pd
+
+    frame = {}
+    for name, values in arrays.items():
+        if name in categories:
+            cat = pd.Categorical.from_codes(np.asarray(values), categories=categories[name])
+            frame[name] = cat if categorical else np.asarray(cat, dtype=object)
+        else:
+            frame[name] = values
+    return pd.DataFrame(frame, copy=False)
+
+
+def _npy_header(dtype, rows, size=128):
+    """Fixed-size .npy v1.0 header, so it can be rewritten once the row count is known."""
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": (rows,)})
+    header = header.ljust(size - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1")
+
+
+class TableWriter:
+    """
+    Appends DataFrame chunks to a table directory in the dataset-cache layout.
+    Only the current chunk and the category labels are held in memory. The
+    table appears at `directory` on close(); until then it is built in a
+    temporary sibling directory.
+
+        with TableWriter("out_table", dtypes={"Year": "int32"}) as writer:
+            for chunk in chunks:
+                writer.append(chunk)
+    """
+
+    def __init__(self, directory, dtypes=None, source=None):
+        self.directory = directory
+        self.dtypes = dtypes or {}
+        self.source = source
+        self.rows = 0
+        self._columns = None
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        self._tmp = tempfile.mkdtemp(prefix=".build-", dir=parent)
+        os.chmod(self._tmp, 0o755)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _open(self, frame):
+        import pandas as pd
+
+        self._columns = []
+        for i, name in enumerate(frame.columns):
+            series = frame[name]
+            numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+            entry = {"name": str(name), "file": f"c{i}.npy", "kind": "numeric" if numeric else "category"}
+            if name in self.dtypes:
+                entry["dtype"] = str(np.dtype(self.dtypes[name]))
+            else:
+                entry["dtype"] = "float64" if numeric else "int32"
+            if not numeric:
+                entry["categories"] = []
+                entry["_codes"] = {}
+            entry["_file"] = open(os.path.join(self._tmp, entry["file"]), "wb")
+            entry["_file"].write(_npy_header(entry["dtype"], 0))
+            self._columns.append(entry)
+
+    def append(self, frame):
+        import pandas as pd
+
+        if self._columns is None:
+            self._open(frame)
+        for entry in self._columns:
+            series = frame[entry["name"]]
+            if entry["kind"] == "category":
+                # Chunk-local codes -> table-wide codes (labels numbered in first-seen order)
+                local, uniques = pd.factorize(series)
+                remap = np.full(len(uniques) + 1, -1, dtype=np.int32)
+                for i, label in enumerate(uniques):
+                    label = str(label)
+                    code = entry["_codes"].get(label)
+                    if code is None:
+                        code = entry["_codes"][label] = len(entry["categories"])
+                        entry["categories"].append(label)
+                    remap[i] = code
+                values = remap[local]
+            else:
+                values = series.to_numpy(dtype=entry["dtype"])
+            entry["_file"].write(np.ascontiguousarray(values).tobytes())
+        self.rows += len(frame)
+
+    def close(self):
+        columns = []
+        for entry in self._columns or []:
+            handle = entry.pop("_file")
+            handle.seek(0)
+            handle.write(_npy_header(entry["dtype"], self.rows))
+            handle.close()
+            entry.pop("_codes", None)
+            columns.append(entry)
+        meta = {"format": FORMAT_VERSION, "source": self.source, "rows": self.rows, "columns": columns}
+        with open(os.path.join(self._tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.rename(self._tmp, self.directory)
+
+    def abort(self):
+        for entry in self._columns or []:
+            entry["_file"].close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(BASE_DIR, "**", "datasets", "*.csv"), recursive=True))
+    for csv_path in paths:
+        target, meta = _meta(csv_path)
+        print(f"✅ {os.path.relpath(csv_path)}: {meta['rows']} rows -> {os.path.relpath(target)}")
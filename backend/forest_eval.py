@@ -0,0 +1,128 @@
+"""
+Flattened RandomForestClassifier evaluator.
+
+All trees of a fitted forest are exported into a few contiguous NumPy arrays
+(feature, threshold, left, right, leaf probabilities). Every tree is then
+walked for every row at once, one vectorized step per tree level. For a
+single row this skips sklearn's per-call validation, joblib dispatch and
+per-tree Python calls. Probabilities equal sklearn's within float rounding
+(the sums are ordered differently, ~1e-16), not bit for bit.
+
+Leaves point back to themselves, so walking a fixed max_depth steps is safe.
+Inputs must be finite (missing-value routing is not supported).
+"""
+import numpy as np
+
+
+class FlatForest:
+    # Tell crop_inference to pass plain arrays instead of DataFrames
+    takes_arrays = True
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, feature_names=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        # children[2 * node + went_left] -> next node, so one gather per level
+        self.children = np.stack([self.right, self.left], axis=1).ravel()
+        self.classes_ = np.asarray(classes)
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Exports a fitted RandomForestClassifier (single output)."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            ids = np.arange(offset, offset + n)
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            lefts.append(np.where(leaf, ids, tree.children_left + offset))
+            rights.append(np.where(leaf, ids, tree.children_right + offset))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            total = value.sum(axis=1, keepdims=True)
+            total[total == 0.0] = 1.0
+            values.append(value / total)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts),
+            np.concatenate(rights),
+            np.concatenate(values),
+            np.asarray(roots),
+            max_depth,
+            forest.classes_,
+            getattr(forest, "feature_names_in_", None),
+        )
+
+    def save(self, path):
+        arrays = {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+            "max_depth": np.asarray(self.max_depth),
+            "classes": self.classes_.astype(str),
+        }
+        if hasattr(self, "feature_names_in_"):
+            arrays["feature_names"] = self.feature_names_in_.astype(str)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["feature"],
+                data["threshold"],
+                data["left"],
+                data["right"],
+                data["value"],
+                data["roots"],
+                int(data["max_depth"]),
+                data["classes"],
+                data["feature_names"] if "feature_names" in data.files else None,
+            )
+
+    def apply(self, X):
+        """Leaf node id reached in every tree, shape (n_samples, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32), dtype=np.float64)
+        n_samples, n_features = X.shape
+        values = X.ravel()
+        row_start = (np.arange(n_samples) * n_features)[:, None]
+        node = np.repeat(self.roots[None, :], n_samples, axis=0)
+        for _ in range(self.max_depth):
+            went_left = values[row_start + self.feature[node]] <= self.threshold[node]
+            node = self.children[2 * node + went_left]
+        return node
+
+    def predict_proba(self, X):
+        X = np.atleast_2d(np.asarray(X))
+        leaves = self.apply(X)
+        # Sums trees in order along a non-contiguous axis, like sklearn's loop
+        return self.value[leaves].sum(axis=1) / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
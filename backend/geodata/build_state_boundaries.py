@@ -0,0 +1,216 @@
+"""
+Builds the bundled Indian state boundaries (india_states.geojson) offline.
+
+No official boundary file ships with the repo, so the polygons are derived
+from GeoNames populated places, which carry the name of their state:
+
+1. a 0.05° grid over India is labelled with the state of the nearest place;
+   places in neighbouring countries are labelled "not India", so borders
+   fall halfway between towns on either side;
+2. cells further than --max-distance from any Indian place (sea, empty
+   high ground) are left unlabelled;
+3. each state's cells are traced into polygon rings, holes included, and
+   collinear vertices are dropped.
+
+Borders are accurate to the spacing of the towns, a few km in the plains
+and tens of km in sparse regions. For exact borders, point
+STATE_BOUNDARIES_PATH at an official GeoJSON instead; state_lookup.py reads
+either. The input is a CSV with lat, lon, admin1 and cc columns, e.g.
+rg_cities1000.csv from the reverse_geocoder package (GeoNames
+cities1000, CC BY 4.0):
+
+    python backend/geodata/build_state_boundaries.py --places rg_cities1000.csv
+"""
+import argparse
+import json
+import math
+import os
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# GeoNames admin1 names -> the State names of crop_yield_by_region.csv
+STATE_NAMES = {
+    "Kashmir": "Jammu and Kashmir",
+    "NCT": "Delhi",
+    "Pondicherry": "Puducherry",
+    "Laccadives": "Lakshadweep",
+    "Dadra and Nagar Haveli": "Dadra and Nagar Haveli and Daman and Diu",
+    "Daman and Diu": "Dadra and Nagar Haveli and Daman and Diu",
+}
+NEIGHBOURS = ("PK", "NP", "BD", "CN", "MM", "BT", "LK", "AF")
+
+# (lat_min, lat_max, lon_min, lon_max) of the grid
+EXTENT = (6.0, 37.5, 68.0, 97.5)
+
+# Directed unit edges per cell side, interior on the left (counter-clockwise exteriors)
+SIDES = {
+    "bottom": ((0, 0), (1, 0), (-1, 0)),
+    "right": ((1, 0), (1, 1), (0, 1)),
+    "top": ((1, 1), (0, 1), (1, 0)),
+    "left": ((0, 1), (0, 0), (0, -1)),
+}
+
+
+def load_places(path):
+    places = pd.read_csv(path, keep_default_na=False, usecols=["lat", "lon", "admin1", "cc"])
+    india = places[(places["cc"] == "IN") & (places["admin1"] != "")].copy()
+    india["state"] = india["admin1"].map(lambda name: STATE_NAMES.get(name, name))
+    others = places[places["cc"].isin(NEIGHBOURS)].copy()
+    others["state"] = None
+    return pd.concat([india, others], ignore_index=True)
+
+
+def label_grid(places, resolution, max_distance):
+    """(rows, cols) int array of state codes (-1: none) and the state names."""
+    from sklearn.neighbors import KDTree
+
+    lat_min, lat_max, lon_min, lon_max = EXTENT
+    rows = int(round((lat_max - lat_min) / resolution))
+    cols = int(round((lon_max - lon_min) / resolution))
+    names = sorted(places["state"].dropna().unique())
+    codes = places["state"].map({name: i for i, name in enumerate(names)}).fillna(-1).to_numpy(dtype=np.int32)
+
+    # Equirectangular: shrink longitudes by cos(lat) so distances are roughly isotropic
+    scale = math.cos(math.radians((lat_min + lat_max) / 2))
+    tree = KDTree(np.column_stack([places["lat"], places["lon"] * scale]))
+    lat = lat_min + (np.arange(rows) + 0.5) * resolution
+    lon = lon_min + (np.arange(cols) + 0.5) * resolution
+    grid_lat, grid_lon = np.meshgrid(lat, lon, indexing="ij")
+    distance, nearest = tree.query(np.column_stack([grid_lat.ravel(), grid_lon.ravel() * scale]), k=1)
+    labels = codes[nearest[:, 0]]
+    labels[distance[:, 0] > max_distance] = -1
+    return labels.reshape(rows, cols), names
+
+
+def trace(mask):
+    """Rings (lists of integer (col, row) vertices) around the True cells of a mask."""
+    padded = np.pad(mask, 1)
+    inside = padded[1:-1, 1:-1]
+    neighbours = {
+        "bottom": padded[:-2, 1:-1],
+        "right": padded[1:-1, 2:],
+        "top": padded[2:, 1:-1],
+        "left": padded[1:-1, :-2],
+    }
+    outgoing = defaultdict(list)
+    for side, (start, end, _) in SIDES.items():
+        rows, cols = np.nonzero(inside & ~neighbours[side])
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            outgoing[(c + start[0], r + start[1])].append((c + end[0], r + end[1]))
+
+    rings = []
+    while outgoing:
+        origin = next(iter(outgoing))
+        ring, vertex, heading = [origin], origin, None
+        while True:
+            targets = outgoing[vertex]
+            if len(targets) > 1 and heading is not None:
+                # Pinch point (cells touching at a corner): take the left turn, keeping rings simple
+                left = (-heading[1], heading[0])
+                target = next((t for t in targets if (t[0] - vertex[0], t[1] - vertex[1]) == left), targets[0])
+            else:
+                target = targets[0]
+            targets.remove(target)
+            if not targets:
+                del outgoing[vertex]
+            heading = (target[0] - vertex[0], target[1] - vertex[1])
+            vertex = target
+            if vertex == origin:
+                break
+            ring.append(vertex)
+        rings.append(_drop_collinear(ring))
+    return rings
+
+
+def _drop_collinear(ring):
+    kept = []
+    n = len(ring)
+    for i, (x, y) in enumerate(ring):
+        (px, py), (nx, ny) = ring[i - 1], ring[(i + 1) % n]
+        if (x - px) * (ny - y) - (y - py) * (nx - x) != 0:
+            kept.append((x, y))
+    return kept
+
+
+def _area(ring):
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def _contains(ring, x, y):
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def polygons(rings):
+    """Counter-clockwise exteriors with the clockwise holes they contain."""
+    exteriors = [[ring] for ring in rings if _area(ring) > 0]
+    for hole in (ring for ring in rings if _area(ring) < 0):
+        # Vertex coordinates are on the grid; test from just inside the hole's first edge
+        (x1, y1), (x2, y2) = hole[0], hole[1]
+        x, y = (x1 + x2) / 2 - (y2 - y1) * 0.25, (y1 + y2) / 2 + (x2 - x1) * 0.25
+        owner = next((p for p in exteriors if _contains(p[0], x, y)), None)
+        if owner is not None:
+            owner.append(hole)
+    return exteriors
+
+
+def build(places_path, resolution=0.05, max_distance=0.75):
+    places = load_places(places_path)
+    labels, names = label_grid(places, resolution, max_distance)
+    lat_min, _, lon_min, _ = EXTENT
+
+    def coordinates(ring):
+        points = [[round(lon_min + c * resolution, 4), round(lat_min + r * resolution, 4)] for c, r in ring]
+        return points + points[:1]
+
+    features = []
+    for code, name in enumerate(names):
+        parts = polygons(trace(labels == code))
+        if not parts:
+            continue
+        features.append({
+            "type": "Feature",
+            "properties": {"name": name},
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [[coordinates(ring) for ring in part] for part in parts],
+            },
+        })
+    return {
+        "type": "FeatureCollection",
+        "properties": {
+            "source": "Derived from GeoNames cities1000 (CC BY 4.0, https://www.geonames.org)",
+            "resolution_deg": resolution,
+            "max_distance_deg": max_distance,
+        },
+        "features": features,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Derive Indian state boundaries from GeoNames places.")
+    parser.add_argument("--places", required=True, help="CSV with lat, lon, admin1, cc columns")
+    parser.add_argument("--output", default=os.path.join(HERE, "india_states.geojson"))
+    parser.add_argument("--resolution", type=float, default=0.05, help="grid cell size in degrees")
+    parser.add_argument("--max-distance", type=float, default=0.75, help="degrees from the nearest Indian place")
+    args = parser.parse_args(argv)
+
+    collection = build(args.places, args.resolution, args.max_distance)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(collection, f, separators=(",", ":"))
+    vertices = sum(
+        len(ring) for feature in collection["features"] for part in feature["geometry"]["coordinates"] for ring in part
+    )
+    print(f"✅ {len(collection['features'])} states, {vertices} vertices -> {args.output} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Minimal Prometheus instrumentation for the API.
+
+Counters, gauges and histograms are plain dicts keyed by label values, behind
+a lock, and rendered in the Prometheus text format on scrape. Per request the
+cost is a couple of perf_counter() calls and dict updates, so it can stay on
+at full load.
+
+- MetricsMiddleware: request counts and latency per route template
+- Metrics.stage(): timers for parsing, inference, chatbot calls, ...
+- TimedJSONResponse: times response serialization
+- watch_event_loop(): samples event-loop lag
+- add_collector(): pulls values (cache stats, ...) at scrape time
+"""
+import asyncio
+import math
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, value=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, *labels, value):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = self._header()
+        names = self.label_names + ("le",)
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(*self.labels, value=time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, prefix="kisan"):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+        self.requests = self.counter("http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+        self.latency = self.histogram("http_request_duration_seconds", "End-to-end request latency.", ("route", "method"))
+        self.stages = self.histogram("stage_duration_seconds", "Time spent in each handler stage.", ("route", "stage"))
+        self.batch_sizes = self.histogram("inference_batch_size", "Rows per model inference call.", ("model",), BATCH_BUCKETS)
+        self.model_load_seconds = self.gauge("model_load_seconds", "Duration of the last model load.", ("model",))
+        self.model_loads = self.counter("model_loads_total", "Model loads and reloads.", ("model",))
+        self.loop_lag = self.histogram("event_loop_lag_seconds", "Event-loop scheduling delay.", (), LAG_BUCKETS)
+        self.loop_lag_last = self.gauge("event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+
+    # --- Registration ---
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(f"{self.prefix}_{name}", help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(f"{self.prefix}_{name}", help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(f"{self.prefix}_{name}", help, labels, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """collect() -> iterable of (metric name, kind, help, {label: value}, value), run on scrape."""
+        self._collectors.append(collect)
+
+    # --- Recording helpers ---
+    def stage(self, route, stage):
+        return _StageTimer(self.stages, (route, stage))
+
+    def observe_batch(self, model, size):
+        self.batch_sizes.observe(model, value=size)
+
+    def record_model_load(self, model, seconds):
+        self.model_load_seconds.set(model, value=seconds)
+        self.model_loads.inc(model)
+
+    # --- Exposition ---
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        collected = {}
+        for collect in self._collectors:
+            try:
+                for name, kind, help, labels, value in collect():
+                    collected.setdefault((f"{self.prefix}_{name}", kind, help), []).append((labels, value))
+            except Exception as e:
+                print("⚠️ Metrics collector failed:", e)
+        for (name, kind, help), samples in collected.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: counts and times every HTTP request by route template."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            self.metrics.requests.inc(path, method, str(status[0]))
+            self.metrics.latency.observe(path, method, value=elapsed)
+
+
+def timed_json_response(metrics, base=JSONResponse):
+    """Subclass of a JSON response class whose body encoding is recorded as the "serialize" stage."""
+
+    class TimedJSONResponse(base):
+        def render(self, content):
+            start = time.perf_counter()
+            try:
+                return super().render(content)
+            finally:
+                metrics.stages.observe("all", "serialize", value=time.perf_counter() - start)
+
+    return TimedJSONResponse
+
+
+async def watch_event_loop(metrics, interval=0.5):
+    """Measures how late the loop wakes a sleeping task; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        metrics.loop_lag.observe(value=lag)
+        metrics.loop_lag_last.set(value=lag)
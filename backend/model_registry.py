@@ -0,0 +1,215 @@
+"""
+Registry for the pickled models the API serves.
+
+Models are loaded lazily on first use (or eagerly through warmup()). They are
+read with joblib's mmap_mode, so arrays stored uncompressed in the pickle map
+straight from the page cache and can be shared by forked workers. Each entry
+records a content-hash version and optional metadata from a
+"<model>.meta.json" sidecar.
+
+reload() builds the new object completely before swapping the reference, so
+requests that already hold the old model finish with it undisturbed. Models
+registered with the same group (e.g. a model and an export of it) are always
+reloaded together: every member is read before any is swapped in, and a
+member whose file is gone is unloaded rather than left out of step.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ModelUnavailable(Exception):
+    pass
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + ".meta.json"
+
+
+class _Entry:
+    def __init__(self, name, path, loader, metadata, group):
+        self.name = name
+        self.path = path
+        self.loader = loader
+        self.group = group
+        self.base_metadata = metadata or {}
+        self.metadata = dict(self.base_metadata)
+        self.lock = threading.Lock()
+        self.model = None
+        self.version = None
+        self.signature = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.loads = 0
+        self.error = None
+        self.error_signature = None
+
+
+class ModelRegistry:
+    def __init__(self, mmap_mode="r"):
+        self.mmap_mode = mmap_mode
+        self._entries = {}
+        self.on_load = []       # callbacks(name, seconds) run after every successful load
+
+    def register(self, name, path, loader=None, metadata=None, group=None):
+        """Registers a model file; nothing is read until get() or warmup()."""
+        self._entries[name] = _Entry(name, path, loader or self._joblib_loader, metadata, group)
+
+    def names(self):
+        return list(self._entries)
+
+    def pending(self, names):
+        """The names whose get() would still read the file: not loaded, and no failed attempt yet."""
+        return [n for n in names if self._entries[n].model is None and self._entries[n].error is None]
+
+    def get(self, name):
+        """Returns the current model object, loading it on first use."""
+        entry = self._entries[name]
+        model = entry.model
+        if model is not None:
+            return model
+        with entry.lock:
+            if entry.model is None:
+                self._load(entry)
+            return entry.model
+
+    def warmup(self, names=None):
+        """Loads the given (or all) models now; returns {name: error} for failures."""
+        errors = {}
+        for name in names or self._entries:
+            try:
+                self.get(name)
+            except Exception as e:
+                errors[name] = str(e)
+        return errors
+
+    def group(self, name):
+        """Names reloaded together with `name`, itself included, in registration order."""
+        group = self._entries[name].group
+        return [n for n, e in self._entries.items() if n == name or (group is not None and e.group == group)]
+
+    def reload(self, name):
+        """
+        Loads fresh copies of the model and its group from disk and swaps them
+        in together. Nothing is swapped if any member fails to load; members
+        other than `name` whose file is missing are unloaded.
+        """
+        entries = [self._entries[n] for n in self.group(name)]
+        for entry in entries:          # always in registration order, so concurrent reloads cannot deadlock
+            entry.lock.acquire()
+        try:
+            loaded = []
+            for entry in entries:
+                entry.error_signature = None
+                try:
+                    loaded.append(self._read(entry))
+                except ModelUnavailable:
+                    if entry.name == name or os.path.exists(entry.path):
+                        raise
+                    loaded.append(None)
+            for entry, result in zip(entries, loaded):
+                if result is None:
+                    entry.model = entry.version = entry.signature = None
+                else:
+                    self._swap(entry, *result)
+        finally:
+            for entry in entries:
+                entry.lock.release()
+        return self.describe(name)
+
+    def check_for_updates(self):
+        """Reloads loaded models whose files changed on disk; returns their names."""
+        reloaded = []
+        for name, entry in self._entries.items():
+            if entry.model is None or name in reloaded:
+                continue
+            try:
+                changed = _signature(entry.path) != entry.signature
+            except OSError:
+                continue
+            if changed:
+                try:
+                    self.reload(name)
+                    reloaded.extend(n for n in self.group(name) if self._entries[n].model is not None)
+                except Exception as e:
+                    print(f"⚠️ Could not reload model '{name}':", e)
+        return reloaded
+
+    def describe(self, name=None):
+        if name is None:
+            return {n: self.describe(n) for n in self._entries}
+        entry = self._entries[name]
+        return {
+            "path": entry.path,
+            "loaded": entry.model is not None,
+            "version": entry.version,
+            "loaded_at": entry.loaded_at,
+            "load_seconds": entry.load_seconds,
+            "loads": entry.loads,
+            "size_bytes": entry.signature[1] if entry.signature else None,
+            "metadata": entry.metadata,
+            "error": entry.error,
+        }
+
+    # --- Internals ---
+    def _joblib_loader(self, path):
+        import joblib  # deferred: pulls in scipy/sklearn helpers, only needed once a model loads
+
+        return joblib.load(path, mmap_mode=self.mmap_mode)
+
+    def _load(self, entry):
+        self._swap(entry, *self._read(entry))
+
+    def _read(self, entry):
+        """Reads the model file; returns (model, version, signature, metadata, seconds)."""
+        try:
+            signature = _signature(entry.path)
+        except OSError as e:
+            entry.error = str(e)
+            raise ModelUnavailable(f"Model '{entry.name}' not found at {entry.path}") from e
+
+        # Do not retry a broken file on every request; wait until it changes
+        if entry.error_signature == signature:
+            raise ModelUnavailable(f"Model '{entry.name}' failed to load: {entry.error}")
+
+        start = time.perf_counter()
+        try:
+            model = entry.loader(entry.path)
+            version = _file_hash(entry.path)[:12]
+            metadata = dict(entry.base_metadata)
+            sidecar = metadata_path(entry.path)
+            if os.path.exists(sidecar):
+                with open(sidecar, encoding="utf-8") as f:
+                    metadata.update(json.load(f))
+        except Exception as e:
+            entry.error, entry.error_signature = str(e), signature
+            raise ModelUnavailable(f"Model '{entry.name}' failed to load: {e}") from e
+
+        return model, version, signature, metadata, round(time.perf_counter() - start, 4)
+
+    def _swap(self, entry, model, version, signature, metadata, seconds):
+        entry.load_seconds = seconds
+        entry.model = model            # single reference swap; old holders keep theirs
+        entry.version = version
+        entry.signature = signature
+        entry.metadata = metadata
+        entry.loaded_at = time.time()
+        entry.loads += 1
+        entry.error = entry.error_signature = None
+        for callback in self.on_load:
+            callback(entry.name, entry.load_seconds)
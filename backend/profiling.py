@@ -0,0 +1,396 @@
+"""
+On-demand request profiling, with nothing running until a request asks for it.
+
+Two modes:
+- "sample": a background thread reads the request's stack every
+  PROFILE_INTERVAL_MS with sys._current_frames(). While it runs, the GIL
+  switch interval is lowered to the same value, so a busy event loop
+  yields to it on time. The handler runs at normal speed otherwise;
+- "trace": sys.setprofile records every Python and C call under the
+  request, so the call tree and call counts are exact. Handlers run several
+  times slower while traced.
+
+A request is profiled when
+- PROFILE_SAMPLE_RATE > 0 and it is picked at random (sample mode);
+- it sends X-Profile: sample|trace together with a valid X-Admin-Token;
+- an admin has armed the next N requests (Profiler.arm(), /admin/profiling).
+
+Finished profiles go into a ring buffer of the last PROFILE_BUFFER requests.
+Each is kept as folded stacks ("frame;frame;frame <microseconds>"), the input
+of flamegraph.pl, inferno and speedscope. The first frame is the route, and
+time the request spent suspended (awaiting I/O, a thread, or other requests
+on the event loop) shows up as "(waiting)". A sampled request that finishes
+before the first sample is kept as one "(not sampled)" frame with a note.
+
+Stacks are collected on the thread that runs the middleware, i.e. the event
+loop. Work a handler hands to a thread pool appears as "(waiting)".
+"""
+import contextvars
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+MODES = ("sample", "trace")
+WAITING = "(waiting)"
+NOT_SAMPLED = "(not sampled)"
+
+_session = contextvars.ContextVar("profile_session", default=None)
+_labels = {}
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename.replace("\\", "/").split("/")
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _labels[code] = f"{name} ({'/'.join(path[-2:])}:{code.co_firstlineno})".replace(";", ",")
+    return label
+
+
+def _c_label(function):
+    module = getattr(function, "__module__", None) or type(getattr(function, "__self__", None)).__name__
+    return f"{module}.{getattr(function, '__qualname__', repr(function))}".replace(";", ",")
+
+
+class _Node:
+    __slots__ = ("children", "calls", "time")
+
+    def __init__(self):
+        self.children = {}
+        self.calls = 0
+        self.time = 0.0
+
+
+class Session:
+    """Stacks of one profiled request, keyed by frame labels and weighted by time."""
+
+    def __init__(self, mode, route, method, root, requested):
+        self.id = uuid.uuid4().hex[:12]
+        self.mode = mode
+        self.requested = requested
+        self.route = route
+        self.method = method
+        self.root = root
+        self.thread = threading.get_ident()
+        self.started = time.time()
+        self.start = self.last = time.perf_counter()
+        self.samples = 0
+        self.stacks = {}
+        # Trace mode: call tree rooted at the request, walked as a stack of nodes
+        self.tree = _Node()
+        self.stack = [self.tree]
+
+    # --- Sample mode (runs on the sampler thread) ---
+    def sample(self, frames, now):
+        elapsed, self.last = now - self.last, now
+        frame = frames.get(self.thread)
+        codes = []
+        while frame is not None and frame is not self.root:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        key = tuple(reversed(codes)) if frame is not None else (WAITING,)
+        self.stacks[key] = self.stacks.get(key, 0.0) + elapsed
+        self.samples += 1
+
+    # --- Trace mode (runs in the profile hook) ---
+    def event(self, frame, event, arg):
+        now = time.perf_counter()
+        stack = self.stack
+        stack[-1].time += now - self.last
+        self.last = now
+        if event == "call" or event == "c_call":
+            if event == "call" and frame.f_code is self.root.f_code:
+                return
+            key = frame.f_code if event == "call" else _c_label(arg)
+            node = stack[-1].children.get(key)
+            if node is None:
+                node = stack[-1].children[key] = _Node()
+            node.calls += 1
+            stack.append(node)
+        elif len(stack) > 1 and not (event == "return" and frame.f_code is self.root.f_code):
+            # return, c_return, c_exception. Suspending a coroutine returns out of its whole
+            # await chain, so between resumes the stack is back at the root
+            stack.pop()
+
+    def finish(self, status):
+        duration = time.perf_counter() - self.start
+        if self.mode == "trace":
+            self.tree.time += time.perf_counter() - self.last
+            stacks = {}
+            self._fold(self.tree, (), stacks)
+        else:
+            stacks = self.stacks
+        prefix = f"{self.method} {self.route}"
+        folded = {}
+        for key, seconds in stacks.items():
+            frames = [prefix] + [k if isinstance(k, str) else _label(k) for k in key]
+            path = ";".join(frames)
+            folded[path] = folded.get(path, 0) + seconds
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "route": self.route,
+            "method": self.method,
+            "status": status,
+            "started": round(self.started, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "samples": self.samples if self.mode == "sample" else None,
+            "stacks": {path: max(1, round(seconds * 1e6)) for path, seconds in folded.items() if seconds > 0},
+            "calls": self._calls() if self.mode == "trace" else None,
+        }
+
+    def _fold(self, node, key, stacks):
+        # Time at the root is time with none of the request's frames running
+        stacks[key or (WAITING,)] = stacks.get(key or (WAITING,), 0.0) + node.time
+        for child_key, child in node.children.items():
+            self._fold(child, key + (child_key,), stacks)
+
+    def _calls(self, limit=50):
+        """The most-called functions, with total calls, from the call tree."""
+        totals = {}
+        pending = list(self.tree.children.items())
+        while pending:
+            key, node = pending.pop()
+            label = key if isinstance(key, str) else _label(key)
+            totals[label] = totals.get(label, 0) + node.calls
+            pending.extend(node.children.items())
+        top = sorted(totals.items(), key=lambda item: -item[1])[:limit]
+        return [{"function": label, "calls": calls} for label, calls in top]
+
+
+def _trace_hook(frame, event, arg):
+    session = _session.get()
+    if session is not None and session.mode == "trace":
+        session.event(frame, event, arg)
+
+
+class Profiler:
+    def __init__(self, sample_rate=0.0, interval=0.001, buffer=50, routes=(), slow_ms=0.0, token=None,
+                 header="x-profile"):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.routes = frozenset(routes)
+        self.slow_ms = slow_ms
+        self.token = token
+        self.header = header.lower().encode()
+        self.profiles = deque(maxlen=buffer)
+        self.captured = {mode: 0 for mode in MODES}
+        # Admin-armed captures: {"mode", "remaining", "routes"}
+        self.pending = None
+        self._lock = threading.Lock()
+        self._active = set()
+        self._wake = threading.Event()
+        self._sampler = None
+        self._switch_interval = None
+        self._tracing = 0
+        self._previous_hook = None
+        self._update()
+
+    @classmethod
+    def from_env(cls, token=None):
+        routes = [r.strip() for r in os.getenv("PROFILE_ROUTES", "").split(",") if r.strip()]
+        return cls(
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            interval=float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000,
+            buffer=int(os.getenv("PROFILE_BUFFER", "50")),
+            routes=routes,
+            slow_ms=float(os.getenv("PROFILE_SLOW_MS", "0")),
+            token=token,
+        )
+
+    def _update(self):
+        # The middleware's fast path checks this one flag
+        self.armed = bool(self.sample_rate > 0 or self.pending or self.token)
+
+    # --- Control ---
+    def arm(self, mode="trace", count=1, routes=None):
+        """Profiles the next `count` requests (on `routes`, if given) in `mode`."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}'. Choose from {', '.join(MODES)}.")
+        with self._lock:
+            self.pending = {"mode": mode, "remaining": int(count), "routes": frozenset(routes or ())} if count > 0 else None
+            self._update()
+
+    def configure(self, sample_rate=None, interval_ms=None, routes=None, slow_ms=None):
+        if sample_rate is not None:
+            if not 0 <= sample_rate <= 1:
+                raise ValueError("sample_rate must be between 0 and 1.")
+            self.sample_rate = float(sample_rate)
+        if interval_ms is not None:
+            if interval_ms <= 0:
+                raise ValueError("interval_ms must be positive.")
+            self.interval = interval_ms / 1000
+        if routes is not None:
+            self.routes = frozenset(routes)
+        if slow_ms is not None:
+            self.slow_ms = float(slow_ms)
+        self._update()
+
+    def status(self):
+        pending = self.pending
+        return {
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval * 1000,
+            "routes": sorted(self.routes),
+            "slow_ms": self.slow_ms,
+            "header": self.header.decode() if self.token else None,
+            "armed": {**pending, "routes": sorted(pending["routes"])} if pending else None,
+            "active": len(self._active),
+            "buffered": len(self.profiles),
+            "buffer_size": self.profiles.maxlen,
+            "captured": dict(self.captured),
+        }
+
+    # --- Per request ---
+    def choose(self, scope):
+        """(mode, requested) for a request to profile, or None. requested: asked for by header or admin."""
+        path = scope.get("path", "")
+        if self.token:
+            requested = token = None
+            for name, value in scope.get("headers", ()):
+                if name == self.header:
+                    requested = value.decode("latin-1").strip().lower()
+                elif name == b"x-admin-token":
+                    token = value.decode("latin-1")
+            if requested in MODES and token == self.token:
+                return requested, True
+        pending = self.pending
+        if pending and (not pending["routes"] or path in pending["routes"]):
+            with self._lock:
+                if self.pending is pending and pending["remaining"] > 0:
+                    pending["remaining"] -= 1
+                    if pending["remaining"] == 0:
+                        self.pending = None
+                        self._update()
+                    return pending["mode"], True
+        if self.sample_rate > 0 and (not self.routes or path in self.routes) and random.random() < self.sample_rate:
+            return "sample", False
+        return None
+
+    def start(self, mode, requested, scope, root):
+        session = Session(mode, scope.get("path", ""), scope.get("method", ""), root, requested)
+        with self._lock:
+            self._active.add(session)
+            if mode == "sample" and not self._wake.is_set():
+                self._ensure_sampler()
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self._switch_interval, self.interval))
+                self._wake.set()
+        token = _session.set(session)
+        if mode == "trace":
+            self._install_hook()
+        return session, token
+
+    def stop(self, session, token, status):
+        if session.mode == "trace":
+            self._remove_hook()
+        _session.reset(token)
+        with self._lock:
+            self._active.discard(session)
+            if self._wake.is_set() and not any(s.mode == "sample" for s in self._active):
+                self._wake.clear()
+                sys.setswitchinterval(self._switch_interval)
+        profile = session.finish(status)
+        sampled = bool(profile["stacks"])
+        if session.mode == "sample" and not sampled:
+            # Shorter than one sampling interval: keep its duration, and say why there are no frames
+            profile["stacks"] = {f"{session.method} {session.route};{NOT_SAMPLED}": max(1, round(profile["duration_ms"] * 1000))}
+            profile["note"] = (f"Finished before the first sample ({self.interval * 1000:g} ms interval); "
+                               "X-Profile: trace records short requests exactly.")
+        # Requested profiles are always kept; random ones only when slow and sampled at least once
+        if session.requested or (profile["duration_ms"] >= self.slow_ms and sampled):
+            self.profiles.append(profile)
+            self.captured[session.mode] += 1
+        return profile
+
+    # --- Trace hook (event-loop thread only) ---
+    def _install_hook(self):
+        if self._tracing == 0:
+            self._previous_hook = sys.getprofile()
+            sys.setprofile(_trace_hook)
+        self._tracing += 1
+
+    def _remove_hook(self):
+        self._tracing -= 1
+        if self._tracing == 0:
+            sys.setprofile(self._previous_hook)
+            self._previous_hook = None
+
+    # --- Sampler thread ---
+    def _ensure_sampler(self):
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample_loop, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            # Under the lock, so a session is never sampled while it is being finished
+            with self._lock:
+                sessions = [s for s in self._active if s.mode == "sample"]
+                if not sessions:
+                    continue
+                frames = sys._current_frames()
+                now = time.perf_counter()
+                for session in sessions:
+                    session.sample(frames, now)
+                del frames
+
+    # --- Export ---
+    def get(self, profile_id):
+        return next((p for p in list(self.profiles) if p["id"] == profile_id), None)
+
+    def list(self):
+        return [{k: v for k, v in p.items() if k not in ("stacks", "calls")} for p in reversed(list(self.profiles))]
+
+    def merged(self, route=None, mode=None, min_ms=0.0):
+        """Folded stacks summed over the buffered profiles that match."""
+        stacks = {}
+        for profile in list(self.profiles):
+            if (route and profile["route"] != route) or (mode and profile["mode"] != mode):
+                continue
+            if profile["duration_ms"] < min_ms:
+                continue
+            for path, us in profile["stacks"].items():
+                stacks[path] = stacks.get(path, 0) + us
+        return stacks
+
+
+def folded(stacks):
+    """Folded-stack text: one "frame;frame;frame count" line per stack."""
+    return "".join(f"{path} {count}\n" for path, count in sorted(stacks.items()))
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: profiles the requests the Profiler picks. One flag check otherwise."""
+
+    def __init__(self, app, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.armed or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        chosen = profiler.choose(scope)
+        if chosen is None:
+            return await self.app(scope, receive, send)
+
+        status = [500]
+        session, token = profiler.start(*chosen, scope, sys._getframe())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-profile-id", session.id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop(session, token, status[0])
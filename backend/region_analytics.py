@@ -0,0 +1,286 @@
+"""
+Indexed yield analytics over the regional crop datasets.
+
+Each dataset is loaded once into typed NumPy columns. Crop, state and season
+are stored as small integer codes, and the numeric columns as float64. At
+load time every categorical column gets a posting list (code -> sorted row
+ids), and the year column a sorted order. A query starts from the smallest
+matching posting list (or year range) and only touches those rows. Group-by
+aggregates run as a single bincount over a combined group key. Results of
+repeated queries are served from an LRU cache.
+
+Two datasets are supported:
+- "india": crop_yield_by_region.csv (state/season level, yield in t/ha)
+- "global": crop_yield_by_region_older.csv (country level, no seasons; the
+  country is exposed as "state" and hg/ha yields are converted to t/ha)
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from datasets import load_columns
+
+CATEGORICAL = ("crop", "state", "season")
+GROUP_COLUMNS = CATEGORICAL + ("year",)
+METRICS = ("yield", "production", "area", "rainfall", "fertilizer", "pesticide", "temperature")
+AGGREGATES = ("mean", "sum", "min", "max", "count")
+
+# CSV column -> (analytics column, scale)
+SCHEMAS = {
+    "india": {
+        "Crop": ("crop", None),
+        "Crop_Year": ("year", None),
+        "Season": ("season", None),
+        "State": ("state", None),
+        "Area": ("area", 1.0),
+        "Production": ("production", 1.0),
+        "Annual_Rainfall": ("rainfall", 1.0),
+        "Fertilizer": ("fertilizer", 1.0),
+        "Pesticide": ("pesticide", 1.0),
+        "Yield": ("yield", 1.0),
+    },
+    "global": {
+        "Item": ("crop", None),
+        "Year": ("year", None),
+        "Area": ("state", None),
+        "hg/ha_yield": ("yield", 1e-4),
+        "average_rain_fall_mm_per_year": ("rainfall", 1.0),
+        "pesticides_tonnes": ("pesticide", 1.0),
+        "avg_temp": ("temperature", 1.0),
+    },
+}
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+class RegionTable:
+    def __init__(self, columns, categories, cache_size=256):
+        """
+        columns: {name: ndarray} with int16 codes for CATEGORICAL, int16 years
+        and float64 metrics; categories: {name: list of labels}.
+        """
+        self.columns = columns
+        self.categories = categories
+        self.n_rows = len(columns["year"])
+        self._codes = {
+            col: {label.lower(): code for code, label in enumerate(labels)}
+            for col, labels in categories.items()
+        }
+
+        # Posting lists: code -> row ids (ascending)
+        self._postings = {}
+        for col in CATEGORICAL:
+            codes = columns[col]
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(categories[col]) + 1))
+            self._postings[col] = [order[bounds[c]:bounds[c + 1]] for c in range(len(categories[col]))]
+
+        # Year index: rows sorted by year
+        self._year_order = np.argsort(columns["year"], kind="stable")
+        self._years_sorted = columns["year"][self._year_order]
+        self.year_min = int(self._years_sorted[0]) if self.n_rows else 0
+        self.year_max = int(self._years_sorted[-1]) if self.n_rows else 0
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def from_csv(cls, path, schema="india", cache_size=256):
+        mapping = SCHEMAS[schema]
+        # Memory-mapped columns from the dataset cache; text columns arrive as codes
+        arrays, labels = load_columns(path, list(mapping))
+        n = len(arrays[next(iter(mapping))])
+        columns, categories = {}, {}
+        for source, (name, scale) in mapping.items():
+            values = arrays[source]
+            if name in CATEGORICAL:
+                # Re-code on stripped labels ("Kharif     " -> "Kharif"), keeping -1 for missing
+                stripped = [label.strip() for label in labels[source]]
+                categories[name] = sorted(set(stripped))
+                index = {label: code for code, label in enumerate(categories[name])}
+                remap = np.array([index[label] for label in stripped] + [-1], dtype=np.int16)
+                columns[name] = remap[values]
+            elif name == "year":
+                columns[name] = np.asarray(values, dtype=np.int16)
+            elif source in labels:
+                columns[name] = np.full(n, np.nan)
+            else:
+                columns[name] = np.asarray(values, dtype=np.float64) * scale
+        for name in CATEGORICAL:
+            if name not in columns:
+                columns[name] = np.full(n, -1, dtype=np.int16)
+                categories[name] = []
+        for name in METRICS:
+            if name not in columns:
+                columns[name] = np.full(n, np.nan)
+        return cls(columns, categories, cache_size=cache_size)
+
+    def dimensions(self):
+        return {
+            **{col: list(self.categories[col]) for col in CATEGORICAL},
+            "years": [self.year_min, self.year_max],
+            "metrics": [m for m in METRICS if np.isfinite(self.columns[m]).any()],
+        }
+
+    # --- Filtering ---
+    def _resolve(self, column, labels):
+        codes = []
+        for label in labels:
+            code = self._codes[column].get(str(label).strip().lower())
+            if code is None:
+                raise ValueError(f"Unknown {column} '{label}'.")
+            codes.append(code)
+        return sorted(set(codes))
+
+    def select(self, crop=None, state=None, season=None, year_from=None, year_to=None):
+        """Row ids (ascending) matching every given filter."""
+        filters = {}
+        for column, labels in (("crop", crop), ("state", state), ("season", season)):
+            labels = _as_list(labels)
+            if labels:
+                filters[column] = self._resolve(column, labels)
+
+        rows = None
+        # Start from the most selective index, then check the rest on those rows only
+        by_size = sorted(filters.items(), key=lambda kv: sum(len(self._postings[kv[0]][c]) for c in kv[1]))
+        for column, codes in by_size:
+            if rows is None:
+                lists = [self._postings[column][c] for c in codes]
+                rows = lists[0] if len(lists) == 1 else np.sort(np.concatenate(lists))
+            else:
+                rows = rows[np.isin(self.columns[column][rows], codes)]
+
+        if year_from is not None or year_to is not None:
+            low = self.year_min if year_from is None else int(year_from)
+            high = self.year_max if year_to is None else int(year_to)
+            if rows is None:
+                start, stop = np.searchsorted(self._years_sorted, [low, high + 1])
+                rows = np.sort(self._year_order[start:stop])
+            else:
+                years = self.columns["year"][rows]
+                rows = rows[(years >= low) & (years <= high)]
+
+        return np.arange(self.n_rows) if rows is None else rows
+
+    # --- Aggregation ---
+    def _group_codes(self, column, rows):
+        """(codes, size) for a group-by column, codes in [0, size)."""
+        if column == "year":
+            return self.columns["year"][rows].astype(np.int64) - self.year_min, self.year_max - self.year_min + 1
+        return self.columns[column][rows].astype(np.int64), len(self.categories[column])
+
+    def _label(self, column, code):
+        if column == "year":
+            return int(code) + self.year_min
+        return self.categories[column][int(code)]
+
+    def aggregate(self, rows, group_by=(), metric="yield", agg="mean", top=None):
+        """
+        Aggregates metric over rows, grouped by up to two GROUP_COLUMNS.
+        top keeps the highest values: overall with one group column, or within
+        each value of the first column with two (e.g. top crops per state).
+        """
+        values = self.columns[metric][rows]
+        keep = np.isfinite(values)
+        for column in group_by:
+            if column in CATEGORICAL:
+                keep &= self.columns[column][rows] >= 0
+        rows, values = rows[keep], values[keep]
+
+        key = np.zeros(len(rows), dtype=np.int64)
+        sizes = []
+        for column in group_by:
+            codes, size = self._group_codes(column, rows)
+            key = key * size + codes
+            sizes.append(size)
+        groups, inverse = np.unique(key, return_inverse=True)
+        inverse = inverse.ravel()
+
+        count = np.bincount(inverse, minlength=len(groups))
+        if agg == "count":
+            result = count.astype(np.float64)
+        elif agg in ("sum", "mean"):
+            result = np.bincount(inverse, weights=values, minlength=len(groups))
+            if agg == "mean":
+                result = result / np.maximum(count, 1)
+        else:
+            result = np.full(len(groups), np.inf if agg == "min" else -np.inf)
+            (np.minimum if agg == "min" else np.maximum).at(result, inverse, values)
+
+        # Decode the combined key back into one code array per column
+        codes, rest = [], groups
+        for size in reversed(sizes):
+            rest, code = np.divmod(rest, size)
+            codes.insert(0, code)
+
+        order = np.arange(len(groups))
+        if top is not None:
+            top = max(0, int(top))
+            if len(group_by) == 2:
+                order = np.lexsort((-result, codes[0]))
+                first = codes[0][order]
+                starts = np.flatnonzero(np.r_[True, first[1:] != first[:-1]])
+                rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+                order = order[rank < top]
+            else:
+                order = np.argsort(-result, kind="stable")[:top]
+
+        return [
+            {
+                **{col: self._label(col, codes[j][i]) for j, col in enumerate(group_by)},
+                f"{metric}_{agg}": round(float(result[i]), 4),
+                "count": int(count[i]),
+            }
+            for i in order
+        ]
+
+    # --- Cached queries ---
+    def query(self, crop=None, state=None, season=None, year_from=None, year_to=None,
+              group_by=("year",), metric="yield", agg="mean", top=None):
+        """Filter + group-by + aggregate. Raises ValueError for bad parameters."""
+        group_by = tuple(c.strip().lower() for c in _as_list(group_by))
+        if len(group_by) > 2 or any(c not in GROUP_COLUMNS for c in group_by):
+            raise ValueError(f"group_by takes up to two of: {', '.join(GROUP_COLUMNS)}.")
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Choose from {', '.join(METRICS)}.")
+        if agg not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{agg}'. Choose from {', '.join(AGGREGATES)}.")
+
+        key = (
+            tuple(sorted(v.lower() for v in _as_list(crop))),
+            tuple(sorted(v.lower() for v in _as_list(state))),
+            tuple(sorted(v.lower() for v in _as_list(season))),
+            year_from, year_to, group_by, metric, agg, top,
+        )
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
+            self.stats["misses"] += 1
+
+        rows = self.select(crop, state, season, year_from, year_to)
+        result = {
+            "rows": int(len(rows)),
+            "groups": self.aggregate(rows, group_by, metric, agg, top),
+        }
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        return result
+
+    def cache_info(self):
+        return {**self.stats, "size": len(self._cache), "max_size": self.cache_size}
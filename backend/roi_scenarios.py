@@ -0,0 +1,249 @@
+"""
+Monte Carlo ROI scenarios.
+
+/api/calculate_roi turns one yield and one price into one ROI. This module
+gives the range instead. Yields are bootstrapped from the historical Yield
+values of the crop in crop_yield_by_region.csv, for the plot's state where
+there is enough history and nationwide otherwise. Prices come from a
+distribution the caller supplies. Yields are in tonnes per hectare, so
+prices are per tonne and plot areas in hectares. Yields and prices are
+drawn as NumPy matrices of (plots x draws), so a batch of plots is a handful
+of array operations. Plots are processed in blocks to bound memory. Per
+plot, the result is the ROI quantiles (P10/P50/P90 by default), mean and
+spread, profit quantiles and the probability of a loss.
+
+The same seed and request always give the same result. Without a seed, a
+fresh one is drawn and returned so the run can be repeated.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Price distributions: name -> required parameters
+DISTRIBUTIONS = {
+    "fixed": ("value",),
+    "normal": ("mean", "std"),
+    "lognormal": ("mean", "std"),
+    "uniform": ("low", "high"),
+    "triangular": ("low", "mode", "high"),
+}
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+# Elements per (plots x draws) block; a few float64 arrays of this size are live at once
+BLOCK_ELEMENTS = 2_000_000
+
+
+def parse_distribution(spec, name="market_price"):
+    """
+    (kind, params) from a number (a fixed value) or a dict such as
+    {"dist": "normal", "mean": 22000, "std": 3000}. Raises ValueError.
+    """
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        return "fixed", {"value": _number(spec, name)}
+    if not isinstance(spec, dict):
+        raise ValueError(f"{name} must be a number or a distribution object.")
+    kind = spec.get("dist", "fixed")
+    if kind not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown {name} distribution '{kind}'. Choose from {', '.join(DISTRIBUTIONS)}.")
+    try:
+        params = {p: _number(spec[p], f"{name} {p}") for p in DISTRIBUTIONS[kind]}
+    except KeyError as e:
+        raise ValueError(f"{name} '{kind}' distribution needs {', '.join(DISTRIBUTIONS[kind])} (missing {e}).")
+    if kind in ("normal", "lognormal") and (params["std"] < 0 or (kind == "lognormal" and params["mean"] <= 0)):
+        raise ValueError(f"{name} '{kind}' needs std >= 0" + (" and mean > 0." if kind == "lognormal" else "."))
+    if kind in ("uniform", "triangular") and params["low"] > params["high"]:
+        raise ValueError(f"{name} needs low <= high.")
+    if kind == "triangular" and not params["low"] <= params["mode"] <= params["high"]:
+        raise ValueError(f"{name} needs low <= mode <= high.")
+    return kind, params
+
+
+def _number(value, name):
+    """A finite float from a request field. Raises ValueError."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        number = math.nan
+    if isinstance(value, bool) or not math.isfinite(number):
+        raise ValueError(f"{name} must be a number.")
+    return number
+
+
+def draw(kind, params, rng, shape):
+    """
+    Draws of one distribution kind for a block of plots. params holds one
+    (plots, 1) column per parameter; shape is (plots, draws). Negative prices
+    from a wide normal are clipped to zero.
+    """
+    if kind == "fixed":
+        return np.broadcast_to(params["value"], shape)
+    if kind == "normal":
+        return np.maximum(params["mean"] + params["std"] * rng.standard_normal(shape), 0.0)
+    if kind == "lognormal":
+        # Parameterised by the mean and std of the price itself
+        sigma2 = np.log1p((params["std"] / params["mean"]) ** 2)
+        mu = np.log(params["mean"]) - sigma2 / 2
+        return np.exp(mu + np.sqrt(sigma2) * rng.standard_normal(shape))
+    if kind == "uniform":
+        return params["low"] + (params["high"] - params["low"]) * rng.random(shape)
+    # Triangular by inverse CDF, so that it broadcasts over per-plot parameters
+    low, mode, high = params["low"], params["mode"], params["high"]
+    u = rng.random(shape)
+    width = np.where(high > low, high - low, 1.0)
+    split = (mode - low) / width
+    left = low + np.sqrt(u * width * (mode - low))
+    right = high - np.sqrt((1 - u) * width * (high - mode))
+    return np.where(u < split, left, right)
+
+
+def _quantile_key(q):
+    return f"p{q * 100:g}"
+
+
+class ScenarioEngine:
+    def __init__(self, table, min_samples=8, cache_size=512):
+        """
+        table: a region_analytics.RegionTable. Crop/state pairs with fewer
+        than min_samples historical yields fall back to the crop's
+        nationwide history.
+        """
+        self.table = table
+        self.min_samples = min_samples
+        self.cache_size = cache_size
+        self._samples = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Yield history ---
+    def _history(self, crop, state=None, season=None, year_from=None, year_to=None):
+        rows = self.table.select(crop=crop, state=state, season=season, year_from=year_from, year_to=year_to)
+        values = self.table.columns["yield"][rows]
+        return values[np.isfinite(values)]
+
+    def yield_samples(self, crop, state=None, season=None, year_from=None, year_to=None):
+        """(samples, source) for a crop, where source says which history was used. Raises ValueError."""
+        if not crop:
+            raise ValueError("crop is required.")
+        key = tuple(str(v).strip().lower() if v is not None else None for v in (crop, state, season, year_from, year_to))
+        with self._lock:
+            if key in self._samples:
+                self._samples.move_to_end(key)
+                return self._samples[key]
+
+        source = "crop"
+        samples = None
+        if state:
+            samples = self._history(crop, state, season, year_from, year_to)
+            source = "crop+state"
+        if samples is None or len(samples) < self.min_samples:
+            samples = self._history(crop, None, season, year_from, year_to)
+            source = "crop"
+        if not len(samples):
+            raise ValueError(f"No yield history for crop '{crop}'.")
+        samples = np.ascontiguousarray(samples, dtype=np.float64)
+
+        with self._lock:
+            self._samples[key] = (samples, source)
+            if len(self._samples) > self.cache_size:
+                self._samples.popitem(last=False)
+        return samples, source
+
+    # --- Simulation ---
+    def _prepare(self, plot):
+        if not isinstance(plot, dict):
+            raise ValueError("Each plot must be an object.")
+        if plot.get("investment") is None:
+            raise ValueError("investment is required.")
+        investment = _number(plot["investment"], "investment")
+        if investment <= 0:
+            raise ValueError("investment must be positive.")
+        area = _number(plot.get("area", 1.0), "area")
+        if area <= 0:
+            raise ValueError("area must be positive.")
+        price = parse_distribution(plot.get("market_price", plot.get("marketPrice")))
+        samples, source = self.yield_samples(
+            plot.get("crop"), plot.get("state"), plot.get("season"), plot.get("year_from"), plot.get("year_to")
+        )
+        return {"investment": investment, "area": area, "price": price, "samples": samples, "source": source}
+
+    def simulate(self, plots, draws=100_000, seed=None, quantiles=DEFAULT_QUANTILES):
+        """
+        Simulates every plot. Returns (results, errors, seed) with results in
+        input order (None for failed plots) and errors as {index: message}.
+        """
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2**63)
+        rng = np.random.default_rng(seed)
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+
+        prepared, errors = [], {}
+        for i, plot in enumerate(plots):
+            try:
+                prepared.append((i, self._prepare(plot)))
+            except (TypeError, ValueError) as e:
+                errors[i] = str(e)
+
+        results = [None] * len(plots)
+        block = max(1, BLOCK_ELEMENTS // draws)
+        for start in range(0, len(prepared), block):
+            chunk = prepared[start:start + block]
+            for (i, plot), summary in zip(chunk, self._simulate_block([p for _, p in chunk], draws, rng, quantiles)):
+                results[i] = {"yield_source": plot["source"], "yield_samples": len(plot["samples"]), **summary}
+        return results, errors, seed
+
+    def _simulate_block(self, plots, draws, rng, quantiles):
+        n = len(plots)
+        shape = (n, draws)
+        column = lambda key: np.array([p[key] for p in plots], dtype=np.float64)[:, None]
+
+        # Bootstrap yields: all plots' histories in one pool, each plot indexing its own slice
+        counts = np.array([len(p["samples"]) for p in plots])
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        pool = np.concatenate([p["samples"] for p in plots])
+        # floor(u * count) is ~2x faster than Generator.integers with a per-row bound
+        picks = rng.random(shape)
+        picks *= counts[:, None]
+        yields = pool[offsets[:, None] + picks.astype(np.int64)]
+
+        # Prices: one vectorized draw per distribution kind in the block
+        prices = np.empty(shape)
+        kinds = np.array([p["price"][0] for p in plots])
+        for kind in DISTRIBUTIONS:
+            rows = np.flatnonzero(kinds == kind)
+            if len(rows):
+                params = {
+                    name: np.array([plots[r]["price"][1][name] for r in rows])[:, None]
+                    for name in DISTRIBUTIONS[kind]
+                }
+                prices[rows] = draw(kind, params, rng, (len(rows), draws))
+
+        investment = column("investment")
+        profit = yields * prices
+        profit *= column("area")
+        profit -= investment
+        roi = profit / investment * 100
+
+        # ROI is increasing in profit, so profit quantiles follow from the ROI ones
+        roi_q = np.quantile(roi, quantiles, axis=1)
+        profit_q = roi_q * investment[:, 0] / 100
+        loss = (profit < 0).mean(axis=1)
+        roi_mean, roi_std = roi.mean(axis=1), roi.std(axis=1)
+        profit_mean = profit.mean(axis=1)
+        yield_mean = yields.mean(axis=1)
+
+        keys = [_quantile_key(q) for q in quantiles]
+        for j in range(n):
+            yield {
+                "draws": draws,
+                "expected_yield": round(float(yield_mean[j]), 4),
+                "roi_percent": {
+                    "mean": round(float(roi_mean[j]), 2),
+                    "std": round(float(roi_std[j]), 2),
+                    **{k: round(float(roi_q[q, j]), 2) for q, k in enumerate(keys)},
+                },
+                "profit": {
+                    "mean": round(float(profit_mean[j]), 2),
+                    **{k: round(float(profit_q[q, j]), 2) for q, k in enumerate(keys)},
+                },
+                "probability_of_loss": round(float(loss[j]), 4),
+            }
@@ -0,0 +1,88 @@
+"""
+Typed request bodies.
+
+Each model accepts the key spellings the clients already send (n/N, temp,
+expectedYield, ...). decode() parses and validates the raw body in one pass:
+JSON goes straight through pydantic-core's parser, so no intermediate dict is
+built and then re-read key by key. MessagePack bodies are unpacked first.
+"""
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, ValidationError
+
+from codec import is_msgpack, loads
+
+
+def _alias(*names, default=...):
+    return Field(default, validation_alias=AliasChoices(*names))
+
+
+class Schema(BaseModel):
+    # Unknown keys are ignored, as the handlers always have; NaN/inf are rejected
+    model_config = ConfigDict(extra="ignore", allow_inf_nan=False)
+
+
+class Query(Schema):
+    query: str
+
+
+class SoilReading(Schema):
+    """One soil test for the crop model."""
+    N: float = _alias("N", "n")
+    P: float = _alias("P", "p")
+    K: float = _alias("K", "k")
+    temperature: float = _alias("temperature", "temp")
+    humidity: float
+    ph: float
+    rainfall: float
+    # Optional location: the state (or the point it contains) adds regional yields
+    state: str | None = None
+    lat: float | None = None
+    lon: float | None = None
+
+
+class CropConditions(Schema):
+    """Conditions for the suitability table; missing values count as 0."""
+    N: float = _alias("N", "n", default=0.0)
+    P: float = _alias("P", "p", default=0.0)
+    K: float = _alias("K", "k", default=0.0)
+    temperature: float = _alias("temperature", "temp", default=0.0)
+    ph: float = 0.0
+    rainfall: float = 0.0
+
+
+class ROIRequest(Schema):
+    crop: str | None = None
+    investment: float
+    expected_yield: float = _alias("expected_yield", "expectedYield")
+    market_price: float = _alias("market_price", "marketPrice")
+
+
+class WaterAdvisorRequest(Schema):
+    Crop_Name: str = ""
+    Soil_Type: str = "Unknown"
+    Irrigation_Type: str = "Unknown"
+    Water_Scarcity: str = "Unknown"
+    Rainfall_Requirement: float = 0.0
+    Temperature_Requirement: float = 0.0
+    Yield: float = 0.0
+    Crop_Cycle_Duration: float = 0   # clients send e.g. 120.5; the handler truncates to whole days
+
+
+async def decode(request, schema):
+    """A validated schema instance from the request body. Raises ValidationError or ValueError."""
+    body = await request.body()
+    if is_msgpack(request.headers.get("content-type")):
+        return schema.model_validate(loads(body, request.headers.get("content-type")))
+    return schema.model_validate_json(body)
+
+
+def describe(error):
+    """A ValidationError as the one-line message of the {"error": ...} responses."""
+    if not isinstance(error, ValidationError):
+        return str(error)
+    first = error.errors(include_url=False)[0]
+    if first["type"] == "json_invalid":
+        return "Invalid JSON body."
+    if first["type"] == "model_type":
+        return "Request body must be a JSON object."
+    field = ".".join(str(part) for part in first["loc"])
+    return f"Missing or invalid value for '{field}'."
@@ -0,0 +1,120 @@
+"""
+Pre-fork multi-worker server.
+
+`uvicorn --workers N` starts N fresh interpreters, and each one loads its own
+copy of every model and dataset. This script loads everything once in the
+parent (server.warmup()), freezes the GC so the collector does not write to
+those objects, and then forks the workers. Every worker shares the parent's
+pages copy-on-write. Large NumPy buffers are never written, so they stay
+shared. Models joblib-loaded with mmap_mode and the dataset cache are file
+mappings, which the page cache shares anyway. Workers accept connections on
+one listening socket opened by the parent.
+
+    python serve_prefork.py --workers 4 --port 8000
+
+The parent restarts workers that die and forwards SIGINT/SIGTERM to them.
+Metrics (/metrics) are per worker. Measure memory with
+benchmarks/measure_memory.py.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(server, sock, args):
+    """Runs uvicorn on the shared socket; never returns."""
+    import uvicorn
+
+    # Per-process resources must not be shared across fork()
+    server.answer_cache.reopen()
+    gc.enable()
+
+    config = uvicorn.Config(server.app, log_level=args.log_level, access_log=False, timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+    os._exit(0)
+
+
+def spawn(server, sock, args):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(server, sock, args)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers sharing preloaded models.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BASE_DIR)
+    # Warmup happens here, in the parent; the workers' lifespan then finds everything loaded
+    os.environ["MODEL_WARMUP"] = "1"
+    import server
+
+    started = time.perf_counter()
+    server.warmup()
+    print(f"✅ Preloaded models and datasets in {time.perf_counter() - started:.2f}s")
+
+    sock = bind_socket(args.host, args.port)
+    # Move everything allocated so far out of the GC's reach, so collections in
+    # the workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.disable()
+    gc.freeze()
+
+    workers = {spawn(server, sock, args) for _ in range(args.workers)}
+    print(f"🚀 Serving on http://{args.host}:{args.port} with {len(workers)} workers (parent pid {os.getpid()})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited (status {status}), restarting")
+            workers.add(spawn(server, sock, args))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,142 +1,749 @@
-from fastapi import FastAPI, Request
+# Taken first so the startup report covers the whole import
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import joblib
-import pandas as pd
 import os
-import cohere
+import json
+import asyncio
 from dotenv import load_dotenv
+from answer_cache import AnswerCache, normalize
+from chatbot import Chatbot, Overloaded, create_backend
+from codec import EncodedResponse, FastRoute, read_body
+from metrics import Metrics, MetricsMiddleware, timed_json_response, watch_event_loop
+from model_registry import ModelRegistry, ModelUnavailable
+from profiling import Profiler, ProfilingMiddleware, folded
+from schemas import CropConditions, Query, ROIRequest, SoilReading, WaterAdvisorRequest, decode, describe
+from startup import Lazy, StartupReport
+# NumPy/pandas/sklearn-backed modules (crop_inference, crop_stats, crop_suitability,
+# crop_calendar, forest_eval, region_analytics, roi_scenarios, similar_fields, water_model, bulk_jobs) are
+# imported where they are used, so the app starts serving /health before they are loaded.
 
 # Load environment variables
 load_dotenv()
-app = FastAPI()
-
-# --- CORS ---
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
-# --- Cohere Setup ---
-COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-co = cohere.Client(COHERE_API_KEY) if COHERE_API_KEY else None
+startup = StartupReport(started=_import_started)
+
+# --- Metrics ---
+# Prometheus counters/histograms, scraped from /metrics (METRICS_ENABLED=0 turns off the request middleware)
+metrics = Metrics()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Handler results go straight to this class: orjson, or MessagePack on request (see codec.py)
+ResponseClass = timed_json_response(metrics, EncodedResponse)
+router = APIRouter(route_class=FastRoute, default_response_class=ResponseClass)
 
-# --- Schemas ---
-class Query(BaseModel):
-    query: str
+# --- Startup ---
+def warmup():
+    """Imports the numeric stack and builds every model, dataset and client, then marks the app ready."""
+    with startup.step("warmup"):
+        with startup.step("imports"):
+            import crop_inference, crop_stats, crop_suitability, forest_eval, region_analytics  # noqa: F401
+            import crop_calendar, roi_scenarios, similar_fields, state_lookup, water_model  # noqa: F401
+        with startup.step("models"):
+            for name, error in models.warmup().items():
+                print(f"⚠️ Could not warm up model '{name}':", error)
+        for component in components:
+            component.get()
+        with startup.step("water_advisor"):
+            get_water_model()
+    startup.mark_ready()
+    print(f"✅ Ready after {startup.snapshot()['ready_after_seconds']}s")
 
-class ROIRequest(BaseModel):
-    crop: str
-    investment: float
-    expected_yield: float
-    market_price: float
+@asynccontextmanager
+async def lifespan(app):
+    # MODEL_WARMUP: "background" (default) serves right away and warms up in a thread,
+    # "1" finishes warmup before serving, "0" builds everything on first use
+    tasks = []
+    mode = os.getenv("MODEL_WARMUP", "background")
+    if mode == "1":
+        await asyncio.to_thread(warmup)
+    elif mode == "0":
+        startup.mark_ready()
+    else:
+        tasks.append(asyncio.create_task(asyncio.to_thread(warmup)))
+
+    interval = float(os.getenv("MODEL_WATCH_INTERVAL", 0))
+    if interval > 0:
+        tasks.append(asyncio.create_task(watch_models(interval)))
+    if METRICS_ENABLED:
+        tasks.append(asyncio.create_task(watch_event_loop(metrics)))
+    yield
+    for task in tasks:
+        task.cancel()
+    if weather.loaded:
+        await weather.get().aclose()
+    if jobs.loaded:
+        jobs.get().shutdown()
+
+# --- Chatbot Setup ---
+def build_chatbot():
+    # Async backend (Cohere by default, CHATBOT_BACKEND=fake for offline use)
+    try:
+        chat_backend = create_backend()
+    except Exception as e:
+        print("⚠️ Could not set up chatbot:", e)
+        return None
+    if chat_backend is None:
+        # No COHERE_API_KEY: /api/ask answers "not configured" instead of failing
+        return None
+    return Chatbot(
+        chat_backend,
+        max_concurrency=int(os.getenv("CHATBOT_MAX_CONCURRENCY", 8)),
+        timeout=float(os.getenv("CHATBOT_TIMEOUT", 30)),
+        max_queue=int(os.getenv("CHATBOT_MAX_QUEUE", 64)),
+        # Questions that normalize the same (case, punctuation, Hindi synonyms) share one call
+        key=normalize,
+        on_wait=lambda seconds: chatbot_queue_wait.observe(value=seconds),
+    )
+
+chatbot = Lazy("chatbot", build_chatbot, startup)
+chatbot_queue_wait = metrics.histogram("chatbot_queue_wait_seconds", "Time /api/ask calls waited for an LLM slot.")
+
+def chatbot_metrics():
+    if not chatbot.loaded:
+        return
+    stats = chatbot.get().snapshot()
+    yield "chatbot_active_calls", "gauge", "LLM calls in progress.", {}, stats["active"]
+    yield "chatbot_queue_depth", "gauge", "Questions waiting for an LLM slot.", {}, stats["queued"]
+    yield "chatbot_upstream_calls_total", "counter", "Calls made to the LLM provider.", {}, stats["upstream_calls"]
+    yield "chatbot_coalesced_total", "counter", "Questions answered by an identical in-flight call.", {}, stats["coalesced"]
+    yield "chatbot_rejected_total", "counter", "Questions rejected because the queue was full.", {}, stats["rejected"]
+
+metrics.add_collector(chatbot_metrics)
+
+def chatbot_busy(error, stream=False):
+    """429 with a Retry-After hint when the LLM admission queue is full."""
+    body = {"message" if stream else "answer": "⚠️ Chatbot is busy. Please try again shortly.", "retry_after": error.retry_after}
+    return JSONResponse(body, status_code=429, headers={"Retry-After": str(error.retry_after)})
+
+# Normalized/near-duplicate answer cache in front of the LLM
+answer_cache = AnswerCache(
+    max_size=int(os.getenv("CHATBOT_CACHE_SIZE", 1000)),
+    ttl=float(os.getenv("CHATBOT_CACHE_TTL", 7 * 24 * 3600)),
+    threshold=float(os.getenv("CHATBOT_CACHE_THRESHOLD", 0.85)),
+    path=os.getenv("CHATBOT_CACHE_PATH") or None,
+)
 
 # --- Health ---
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "ok", "message": "Backend running ✅"}
 
+@router.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until warmup has finished. Lists what is loaded and the startup timings."""
+    body = {
+        "ready": startup.ready,
+        "components": {
+            **{component.name: component.loaded for component in components},
+            "water_advisor": _water["model"] is not None,
+        },
+        "models": {name: info["loaded"] for name, info in models.describe().items()},
+        "startup": startup.snapshot(),
+    }
+    return body if startup.ready else JSONResponse(body, status_code=503)
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # --- Chatbot ---
-@app.post("/api/ask")
+@router.post("/api/ask")
 async def ask_ai(query: Query):
     try:
-        if co is None:
+        bot = await chatbot.aget()
+        if bot is None:
             return {"answer": "⚠️ Cohere API key not set."}
 
-        response = co.chat(
-            model="command-r",
-            message=f"Answer this farmer's question in simple terms: {query.query}"
-        )
-        return {"answer": response.text.strip()}
+        with metrics.stage("/api/ask", "cache"):
+            cached = answer_cache.get(query.query)
+        if cached is not None:
+            return {"answer": cached}
+
+        with metrics.stage("/api/ask", "chatbot"):
+            answer = await bot.ask(query.query)
+        answer_cache.put(query.query, answer)
+        return {"answer": answer}
+    except Overloaded as e:
+        return chatbot_busy(e)
+    except TimeoutError:
+        return {"answer": "⚠️ Chatbot timed out. Please try again."}
     except Exception as e:
         return {"answer": f"⚠️ Chatbot failed: {str(e)}"}
 
-# --- Crop Prediction ---
+@router.get("/api/ask/cache_stats")
+async def ask_cache_stats():
+    return answer_cache.snapshot()
+
+@router.get("/api/ask/queue_stats")
+async def ask_queue_stats():
+    """Admission queue: active calls, queue depth, coalesced/rejected counts and mean wait."""
+    bot = await chatbot.aget()
+    return bot.snapshot() if bot is not None else {"error": "Chatbot not configured."}
+
+def _sse(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/api/ask/stream")
+async def ask_ai_stream(query: Query):
+    """
+    Streams the answer as Server-Sent Events: one {"token": ...} event per
+    chunk, then a "done" event (or an "error" event if the call fails).
+    """
+    bot = await chatbot.aget()
+    cached = answer_cache.get(query.query) if bot is not None else None
+    # Reject before the stream starts, so clients get a real 429
+    busy = bot.overloaded() if bot is not None and cached is None else None
+    if busy is not None:
+        return chatbot_busy(busy, stream=True)
+
+    async def events():
+        if bot is None:
+            yield _sse({"message": "⚠️ Cohere API key not set."}, event="error")
+            return
+        if cached is not None:
+            yield _sse({"token": cached})
+            yield _sse({}, event="done")
+            return
+        try:
+            chunks = []
+            async for chunk in bot.stream(query.query):
+                chunks.append(chunk)
+                yield _sse({"token": chunk})
+            answer_cache.put(query.query, "".join(chunks).strip())
+            yield _sse({}, event="done")
+        except Overloaded as e:
+            yield _sse({"message": "⚠️ Chatbot is busy. Please try again shortly.", "retry_after": e.retry_after}, event="error")
+        except TimeoutError:
+            yield _sse({"message": "⚠️ Chatbot timed out. Please try again."}, event="error")
+        except Exception as e:
+            yield _sse({"message": f"⚠️ Chatbot failed: {str(e)}"}, event="error")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Model Registry ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "crop-selector", "crop_prediction_model.pkl")
+FLAT_MODEL_PATH = os.path.join(BASE_DIR, "crop-selector", "crop_prediction_model.npz")
+WATER_MODEL_DIR = os.path.join(BASE_DIR, "water-advisor")
 DATASET_PATH = os.path.join(BASE_DIR, "crop-selector", "datasets", "crop_yield_by_rainfall.csv")
 
-try:
-    model = joblib.load(MODEL_PATH)
-    crop_data = pd.read_csv(DATASET_PATH)
-except Exception as e:
-    print("⚠️ Could not load model/dataset:", e)
-    model, crop_data = None, None
+def load_flat_forest(path):
+    from forest_eval import FlatForest
+    return FlatForest.load(path)
+
+# Loaded lazily on first use, or by the startup warmup (see lifespan)
+models = ModelRegistry(mmap_mode=os.getenv("MODEL_MMAP_MODE", "r") or None)
+# The flat export is the same forest; reloading either reloads both so they never disagree
+models.register("crop_selector", MODEL_PATH, group="crop")
+models.register("crop_selector_flat", FLAT_MODEL_PATH, loader=load_flat_forest, group="crop")
+models.register("water_advisor", os.path.join(WATER_MODEL_DIR, "crop_model.pkl"))
+models.register("water_encoder", os.path.join(WATER_MODEL_DIR, "encoder.pkl"))
+models.register("water_scaler", os.path.join(WATER_MODEL_DIR, "scaler.pkl"))
+models.on_load.append(metrics.record_model_load)
+models.on_load.append(lambda name, seconds: startup.record(f"model:{name}", seconds))
+
+def get_model(name):
+    try:
+        return models.get(name)
+    except ModelUnavailable:
+        return None
+
+# Crop model engine: "flat" (exported arrays, see forest_eval.py), "sklearn",
+# or "auto" (flat for small batches, where it wins; sklearn for large ones)
+INFERENCE_ENGINES = ("auto", "flat", "sklearn")
+FLAT_MAX_BATCH = int(os.getenv("FLAT_MAX_BATCH", 64))
+inference = {"engine": os.getenv("CROP_INFERENCE_ENGINE", "auto")}
+
+CROP_MODELS = ("crop_selector", "crop_selector_flat")
+
+async def prepare(*components, model_names=()):
+    """
+    Builds the components and loads the models that a handler's synchronous
+    helpers are about to use. Anything not ready yet is built in a worker
+    thread, so a first use never blocks the event loop.
+    """
+    lazy = [c for c in components if not c.built]
+    names = models.pending(model_names)
+    if not lazy and not names:
+        return
+
+    def build():
+        for component in lazy:
+            component.get()
+        if names:
+            models.warmup(names)
+
+    await asyncio.to_thread(build)
+
+def get_crop_model(batch_size=1):
+    """Crop model for the selected engine; flat falls back to sklearn if not exported."""
+    engine = inference["engine"]
+    if engine == "flat" or (engine == "auto" and batch_size <= FLAT_MAX_BATCH):
+        model = get_model("crop_selector_flat")
+        if model is not None:
+            return model
+    return get_model("crop_selector")
+
+async def watch_models(interval):
+    """Polls model files and hot-reloads the ones that changed."""
+    while True:
+        await asyncio.sleep(interval)
+        reloaded = await asyncio.to_thread(models.check_for_updates)
+        for name in reloaded:
+            print(f"🔄 Reloaded model '{name}' ({models.describe(name)['version']})")
+
+# --- Admin ---
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def admin_denied(request):
+    """Admin endpoints are off unless ADMIN_TOKEN is set and sent as X-Admin-Token."""
+    if not ADMIN_TOKEN:
+        return JSONResponse({"error": "Admin API disabled (ADMIN_TOKEN not set)."}, status_code=403)
+    if request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return JSONResponse({"error": "Invalid admin token."}, status_code=401)
+    return None
+
+@router.get("/admin/models")
+async def list_models(request: Request):
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    return {"models": models.describe()}
+
+@router.post("/admin/models/{name}/reload")
+async def reload_model(name: str, request: Request):
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    if name not in models.names():
+        return JSONResponse({"error": f"Unknown model '{name}'."}, status_code=404)
+    try:
+        # Load off the event loop; requests keep using the old model meanwhile
+        # Models in the same group (crop_selector and its flat export) reload together
+        return {"model": name, "reloaded": models.group(name), **await asyncio.to_thread(models.reload, name)}
+    except ModelUnavailable as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@router.get("/admin/inference_engine")
+async def get_inference_engine(request: Request):
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    return {"engine": inference["engine"], "engines": list(INFERENCE_ENGINES)}
+
+@router.post("/admin/inference_engine")
+async def set_inference_engine(request: Request):
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    try:
+        body = await read_body(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    engine = body.get("engine") if isinstance(body, dict) else None
+    if engine not in INFERENCE_ENGINES:
+        return JSONResponse({"error": f"Unknown engine '{engine}'. Choose from {', '.join(INFERENCE_ENGINES)}."}, status_code=400)
+    inference["engine"] = engine
+    return {"engine": engine}
+
+# --- Profiling ---
+# Opt-in request profiles (see profiling.py); PROFILING_ENABLED=0 leaves the middleware out entirely
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "1") != "0"
+profiler = Profiler.from_env(token=ADMIN_TOKEN)
+
+def profiling_metrics():
+    for mode, count in profiler.captured.items():
+        yield "profiles_captured_total", "counter", "Request profiles added to the ring buffer.", {"mode": mode}, count
+
+metrics.add_collector(profiling_metrics)
+
+@router.get("/admin/profiling")
+async def get_profiling(request: Request):
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    return profiler.status()
+
+@router.post("/admin/profiling")
+async def set_profiling(request: Request):
+    """
+    Arms captures and changes sampling without a restart, e.g.
+    {"mode": "trace", "count": 5, "routes": ["/api/predict_crop"]} profiles the next 5 calls;
+    {"sample_rate": 0.01, "slow_ms": 50, "sample_routes": ["/api/select_crop"]} samples 1% of
+    those requests and keeps the ones over 50 ms.
+    """
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    try:
+        body = await read_body(request)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Expected a JSON object."}, status_code=400)
+    try:
+        if "count" in body or "mode" in body:
+            profiler.arm(body.get("mode", "trace"), int(body.get("count", 1)), body.get("routes"))
+        profiler.configure(
+            sample_rate=body.get("sample_rate"),
+            interval_ms=body.get("interval_ms"),
+            routes=body.get("sample_routes"),
+            slow_ms=body.get("slow_ms"),
+        )
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return profiler.status()
+
+@router.get("/admin/profiles")
+async def list_profiles(request: Request):
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    return {"profiles": profiler.list()}
+
+@router.get("/admin/profiles/flamegraph")
+async def merged_profile(request: Request, route: str = None, mode: str = None, min_ms: float = 0.0):
+    """Folded stacks summed over the buffered profiles, e.g. every slow /api/predict_crop call."""
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    return PlainTextResponse(folded(profiler.merged(route, mode, min_ms)))
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "folded"):
+    """One profile as folded stacks (flamegraph.pl, inferno, speedscope) or as JSON (format=json)."""
+    denied = admin_denied(request)
+    if denied:
+        return denied
+    profile = profiler.get(profile_id)
+    if profile is None:
+        return JSONResponse({"error": f"Unknown profile '{profile_id}'."}, status_code=404)
+    if format == "json":
+        return profile
+    return PlainTextResponse(
+        folded(profile["stacks"]),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
+
+# --- State Lookup ---
+STATE_BOUNDARIES_PATH = os.getenv("STATE_BOUNDARIES_PATH") or os.path.join(BASE_DIR, "geodata", "india_states.geojson")
+
+def build_states():
+    from state_lookup import StateIndex
+    return StateIndex.from_geojson(STATE_BOUNDARIES_PATH, name_field=os.getenv("STATE_BOUNDARIES_NAME_FIELD") or None)
+
+states = Lazy("states", build_states, startup)
 
-@app.post("/api/predict_crop")
+def resolve_state(lat, lon):
+    """(state, error) for optional coordinates; (None, None) when neither is given."""
+    if lat is None and lon is None:
+        return None, None
+    if lat is None or lon is None:
+        return None, "Both lat and lon are required."
+    index = states.get()
+    if index is None:
+        return None, "State boundaries not loaded."
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None, "lat and lon must be numbers."
+    state = index.locate(lat, lon)
+    if state is None:
+        return None, f"({lat}, {lon}) is not inside a known Indian state."
+    return state, None
+
+def _point(point):
+    if isinstance(point, dict):
+        point = (point.get("lat"), point.get("lon"))
+    if not isinstance(point, (list, tuple)) or len(point) != 2:
+        raise ValueError("Expected {\"lat\", \"lon\"} or [lat, lon].")
+    return float(point[0]), float(point[1])
+
+@router.get("/api/locate")
+def locate_state(lat: float, lon: float):
+    """The Indian state containing a point (null outside India), resolved offline."""
+    index = states.get()
+    if index is None:
+        return {"error": "State boundaries not loaded."}
+    with metrics.stage("/api/locate", "lookup"):
+        return {"lat": lat, "lon": lon, "state": index.locate(lat, lon)}
+
+@router.post("/api/locate_batch")
+async def locate_batch(request: Request):
+    """
+    States for many points in one vectorized lookup.
+    Body: {"points": [{"lat": 28.6, "lon": 77.2}, ...]} (or [lat, lon] pairs)
+    """
+    try:
+        with metrics.stage("/api/locate_batch", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        points = body.get("points") if isinstance(body, dict) else body
+        if not isinstance(points, list):
+            return {"error": "Expected a list of points."}
+        if len(points) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large ({len(points)} > {MAX_BATCH_SIZE} points)."}
+        index = await states.aget()
+        if index is None:
+            return {"error": "State boundaries not loaded."}
+
+        coordinates, errors = [], {}
+        for i, point in enumerate(points):
+            try:
+                coordinates.append(_point(point))
+            except (TypeError, ValueError) as e:
+                errors[i] = str(e)
+                coordinates.append((float("nan"), float("nan")))
+        with metrics.stage("/api/locate_batch", "lookup"):
+            found = index.locate_many([p[0] for p in coordinates], [p[1] for p in coordinates])
+        return {
+            "count": len(found),
+            "failed": len(errors),
+            "results": [{"error": errors[i]} if i in errors else {"state": state} for i, state in enumerate(found)]
+        }
+    except Exception as e:
+        return {"error": f"Batch lookup failed: {str(e)}"}
+
+# --- Crop Prediction ---
+def build_crop_stats():
+    from crop_stats import CropStatsIndex
+    return CropStatsIndex(DATASET_PATH)
+
+crop_stats = Lazy("crop_stats", build_crop_stats, startup)
+
+@router.post("/api/predict_crop")
 async def predict_crop(request: Request):
+    await prepare(model_names=CROP_MODELS)
+    model = get_crop_model()
     if model is None:
         return {"error": "Model not loaded."}
 
-    body = await request.json()
     try:
-        N = float(body.get("N") or body.get("n"))
-        P = float(body.get("P") or body.get("p"))
-        K = float(body.get("K") or body.get("k"))
-        temperature = float(body.get("temperature") or body.get("temp"))
-        humidity = float(body.get("humidity"))
-        ph = float(body.get("ph"))
-        rainfall = float(body.get("rainfall")) / 100
+        with metrics.stage("/api/predict_crop", "parse"):
+            reading = await decode(request, SoilReading)
+    except ValueError as e:
+        return {"error": describe(e)}
+    try:
+        metrics.observe_batch("crop_selector", 1)
+        from crop_inference import predict_records
+        result = predict_records(model, [reading.model_dump()], k=3, timer=lambda stage: metrics.stage("/api/predict_crop", stage))[0]
+        if "error" in result:
+            return result
 
-        input_data = pd.DataFrame([{
-            "N": N, "P": P, "K": K,
-            "temperature": temperature,
-            "humidity": humidity,
-            "ph": ph,
-            "rainfall": rainfall
-        }])
+        response = {
+            "predicted_crop": result["predicted_crop"],
+            "top_3_predictions": result["top_predictions"]
+        }
+        if reading.state or reading.lat is not None or reading.lon is not None:
+            await prepare(states, analytics["india"])
+        state, error = (reading.state, None) if reading.state else resolve_state(reading.lat, reading.lon)
+        if error:
+            response["state_error"] = error
+        elif state:
+            with metrics.stage("/api/predict_crop", "regional"):
+                response.update(regional_yields(state, [p["crop"] for p in result["top_predictions"]]))
+        return response
+    except Exception as e:
+        return {"error": str(e)}
 
-        probabilities = model.predict_proba(input_data)[0]
-        classes = model.classes_
-        top_3 = sorted(zip(classes, probabilities), key=lambda x: x[1], reverse=True)[:3]
+# Crop model labels -> crop names in crop_yield_by_region.csv, where they differ
+REGION_CROP_NAMES = {
+    "pigeonpeas": "arhar/tur",
+    "chickpea": "gram",
+    "mungbean": "moong(green gram)",
+    "blackgram": "urad",
+    "lentil": "masoor",
+    "mothbeans": "moth",
+    "cotton": "cotton(lint)",
+}
+
+def regional_yields(state, crops):
+    """Historical yield of each crop in the state (t/ha), from the cached regional analytics."""
+    table = analytics["india"].get()
+    if table is None:
+        return {"state": state}
+    groups = table.query(state=state, group_by="crop", metric="yield", agg="mean")["groups"]
+    by_crop = {g["crop"].strip().lower(): g for g in groups}
+    regional = []
+    for crop in crops:
+        group = by_crop.get(REGION_CROP_NAMES.get(crop, crop))
+        regional.append({
+            "crop": crop,
+            "grown_in_state": group is not None,
+            "mean_yield_t_ha": round(group["yield_mean"], 3) if group else None,
+            "records": group["count"] if group else 0,
+        })
+    return {"state": state, "regional": regional}
+
+# --- Batch Crop Prediction ---
+MAX_BATCH_SIZE = 20000
+
+@router.post("/api/predict_crop_batch")
+async def predict_crop_batch(request: Request):
+    """
+    Scores many soil-test records in one model call.
+    Body: {"records": [{N, P, K, temperature, humidity, ph, rainfall}, ...], "top_k": 3}
+    Results come back in input order; a bad record only fails its own row.
+    """
+    try:
+        with metrics.stage("/api/predict_crop_batch", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        records = body.get("records") if isinstance(body, dict) else body
+        k = int(body.get("top_k", 3)) if isinstance(body, dict) else 3
+        if not isinstance(records, list):
+            return {"error": "Expected a list of records."}
+        if len(records) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large ({len(records)} > {MAX_BATCH_SIZE} records)."}
+
+        await prepare(model_names=CROP_MODELS)
+        model = get_crop_model(len(records))
+        if model is None:
+            return {"error": "Model not loaded."}
 
+        metrics.observe_batch("crop_selector", len(records))
+        from crop_inference import predict_records
+        results = predict_records(model, records, k=k, timer=lambda stage: metrics.stage("/api/predict_crop_batch", stage))
         return {
-            "predicted_crop": top_3[0][0],
-            "top_3_predictions": [
-                {"crop": crop, "probability": round(prob * 100, 2)}
-                for crop, prob in top_3
-            ]
+            "count": len(results),
+            "failed": sum(1 for r in results if "error" in r),
+            "results": results
         }
     except Exception as e:
+        return {"error": f"Batch prediction failed: {str(e)}"}
+
+# --- Similar Fields ---
+MAX_NEIGHBORS = 100
+
+def build_similar_fields():
+    from similar_fields import SimilarityIndex
+    return SimilarityIndex.from_csv(
+        os.getenv("SIMILAR_FIELDS_DATASET", DATASET_PATH),
+        algorithm=os.getenv("SIMILAR_FIELDS_INDEX", "kd_tree"),
+    )
+
+similar_fields = Lazy("similar_fields", build_similar_fields, startup)
+
+async def find_similar(records, k, route):
+    index = await similar_fields.aget()
+    if index is None:
+        return None
+    metrics.observe_batch("similar_fields", len(records))
+    with metrics.stage(route, "search"):
+        return index.similar(records, k=min(max(int(k), 1), MAX_NEIGHBORS))
+
+@router.post("/api/similar_fields")
+async def similar_fields_endpoint(request: Request):
+    """
+    The k historical samples closest to one soil/climate reading, with their crops.
+    Body: {N, P, K, temperature, humidity, ph, rainfall, "k": 5}
+    """
+    try:
+        with metrics.stage("/api/similar_fields", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        if not isinstance(body, dict):
+            return {"error": "Expected a JSON object."}
+        results = await find_similar([body], body.get("k", 5), "/api/similar_fields")
+        if results is None:
+            return {"error": "Dataset not loaded."}
+        return results[0]
+    except Exception as e:
+        return {"error": f"Similarity search failed: {str(e)}"}
+
+@router.post("/api/similar_fields_batch")
+async def similar_fields_batch(request: Request):
+    """
+    k-NN search for many readings in one index query.
+    Body: {"records": [{N, P, K, temperature, humidity, ph, rainfall}, ...], "k": 5}
+    """
+    try:
+        with metrics.stage("/api/similar_fields_batch", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
         return {"error": str(e)}
+    try:
+        records = body.get("records") if isinstance(body, dict) else body
+        k = body.get("k", 5) if isinstance(body, dict) else 5
+        if not isinstance(records, list):
+            return {"error": "Expected a list of records."}
+        if len(records) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large ({len(records)} > {MAX_BATCH_SIZE} records)."}
+
+        results = await find_similar(records, k, "/api/similar_fields_batch")
+        if results is None:
+            return {"error": "Dataset not loaded."}
+        return {
+            "count": len(results),
+            "failed": sum(1 for r in results if "error" in r),
+            "results": results
+        }
+    except Exception as e:
+        return {"error": f"Batch similarity search failed: {str(e)}"}
 
 # --- Crop Input Recommendations ---
-@app.get("/api/recommend_inputs/{crop_name}")
-def recommend_inputs(crop_name: str):
-    if crop_data is None:
+@router.get("/api/recommend_inputs/{crop_name}")
+def recommend_inputs(crop_name: str, stats: str = None):
+    """
+    Average inputs for a crop, served from the precomputed index.
+    Pass ?stats=median,p10,p90,std (or ?stats=all) for the wider statistics.
+    """
+    from crop_stats import STATISTICS
+    index = crop_stats.get()
+    if index is None:
         return {"error": "Dataset not loaded."}
 
     crop_name = crop_name.lower()
-    filtered = crop_data[crop_data["crop"].str.lower() == crop_name]
-    if filtered.empty:
+    requested = ["mean"]
+    if stats:
+        requested = list(STATISTICS) if stats == "all" else [s.strip() for s in stats.split(",") if s.strip()]
+        unknown = [s for s in requested if s not in STATISTICS]
+        if unknown:
+            return {"error": f"Unknown statistics: {', '.join(unknown)}. Choose from {', '.join(STATISTICS)}."}
+
+    with metrics.stage("/api/recommend_inputs/{crop_name}", "lookup"):
+        entry = index.get(crop_name, stats=set(requested) | {"mean"})
+    if entry is None:
         return {"error": f"No data found for crop: {crop_name}"}
 
-    avg = filtered[["N","P","K","temperature","humidity","ph","rainfall"]].mean()
-    return {
+    response = {
         "crop": crop_name,
-        "recommended_inputs": {
-            "N": round(avg["N"],2),
-            "P": round(avg["P"],2),
-            "K": round(avg["K"],2),
-            "temperature": round(avg["temperature"],2),
-            "humidity": round(avg["humidity"],2),
-            "ph": round(avg["ph"],2),
-            "rainfall": round(avg["rainfall"]*100,2),
-        }
+        "recommended_inputs": entry["mean"]
     }
+    if stats:
+        response["samples"] = entry["samples"]
+        response["statistics"] = {s: entry[s] for s in requested}
+    return response
 
 # --- ROI Calculator ---
-@app.post("/api/calculate_roi")
+@router.post("/api/calculate_roi")
 async def calculate_roi(request: Request):
     try:
-        body = await request.json()
-        crop = body.get("crop")
-        investment = float(body.get("investment"))
-        expected_yield = float(body.get("expected_yield") or body.get("expectedYield"))
-        market_price = float(body.get("market_price") or body.get("marketPrice"))
+        body = await decode(request, ROIRequest)
+    except ValueError as e:
+        return {"error": f"ROI calc failed: {describe(e)}"}
+    try:
+        crop = body.crop
+        investment = body.investment
+        expected_yield = body.expected_yield
+        market_price = body.market_price
 
         revenue = expected_yield * market_price
         roi = ((revenue - investment) / investment) * 100
@@ -152,6 +759,102 @@ async def calculate_roi(request: Request):
     except Exception as e:
         return {"error": f"ROI calc failed: {str(e)}"}
 
+# --- ROI Scenarios ---
+ROI_DRAWS = int(os.getenv("ROI_DRAWS", 100_000))
+ROI_MAX_DRAWS = int(os.getenv("ROI_MAX_DRAWS", 1_000_000))
+ROI_MAX_TOTAL_DRAWS = int(os.getenv("ROI_MAX_TOTAL_DRAWS", 50_000_000))
+
+def build_roi_scenarios():
+    from roi_scenarios import ScenarioEngine
+    table = analytics["india"].get()
+    if table is None:
+        raise RuntimeError("regional dataset not loaded")
+    return ScenarioEngine(table, min_samples=int(os.getenv("ROI_MIN_SAMPLES", 8)))
+
+roi_scenarios = Lazy("roi_scenarios", build_roi_scenarios, startup)
+
+@router.post("/api/roi_scenarios")
+async def roi_scenarios_endpoint(request: Request):
+    """
+    Monte Carlo ROI ranges from historical yields and a price distribution.
+    One plot: {"crop", "state", "investment", "area", "market_price"} where
+    market_price is a number or e.g. {"dist": "normal", "mean": 22000, "std": 3000}
+    (also lognormal, uniform low/high, triangular low/mode/high). A plot may
+    give "lat"/"lon" instead of "state".
+    Units: yields are tonnes per hectare, so area is in hectares and
+    market_price is per tonne (10x a per-quintal mandi price); investment is
+    the total for the plot.
+    Many plots: {"plots": [...]}. Optional: "draws", "seed", "quantiles".
+    """
+    try:
+        with metrics.stage("/api/roi_scenarios", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        if not isinstance(body, dict):
+            return {"error": "Expected a JSON object."}
+        batch = "plots" in body
+        plots = body["plots"] if batch else [body]
+        if not isinstance(plots, list):
+            return {"error": "Expected a list of plots."}
+        draws = int(body.get("draws", ROI_DRAWS))
+        if not 1 <= draws <= ROI_MAX_DRAWS:
+            return {"error": f"draws must be between 1 and {ROI_MAX_DRAWS}."}
+        if len(plots) * draws > ROI_MAX_TOTAL_DRAWS:
+            return {"error": f"Too many draws ({len(plots)} plots x {draws} > {ROI_MAX_TOTAL_DRAWS})."}
+        seed = body.get("seed")
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+            return {"error": "seed must be a non-negative integer."}
+        from roi_scenarios import DEFAULT_QUANTILES
+        quantiles = [float(q) for q in body.get("quantiles", DEFAULT_QUANTILES)]
+        if not quantiles or not all(0 <= q <= 1 for q in quantiles):
+            return {"error": "quantiles must be between 0 and 1."}
+
+        engine = await roi_scenarios.aget()
+        if engine is None:
+            return {"error": "Dataset not loaded."}
+        plots = await locate_plots(plots)
+
+        metrics.observe_batch("roi_scenarios", len(plots))
+        with metrics.stage("/api/roi_scenarios", "simulation"):
+            # CPU-bound; keep the event loop free
+            results, errors, seed = await asyncio.to_thread(engine.simulate, plots, draws, seed, quantiles)
+        if not batch:
+            return {"error": errors[0]} if errors else {"crop": body.get("crop"), "state": plots[0].get("state"), "seed": seed, **results[0]}
+        return {
+            "count": len(results),
+            "failed": len(errors),
+            "seed": seed,
+            "results": [
+                {"error": errors[i]} if i in errors else {"crop": plots[i].get("crop"), "state": plots[i].get("state"), **result}
+                for i, result in enumerate(results)
+            ]
+        }
+    except Exception as e:
+        return {"error": f"ROI simulation failed: {str(e)}"}
+
+async def locate_plots(plots):
+    """Plots with "lat"/"lon" but no "state" get the state containing the point (one batched lookup)."""
+    pending = [i for i, p in enumerate(plots) if isinstance(p, dict) and not p.get("state")
+               and p.get("lat") is not None and p.get("lon") is not None]
+    index = await states.aget() if pending else None
+    if index is None:
+        return plots
+    coordinates = []
+    for i in pending:
+        try:
+            coordinates.append(_point(plots[i]))
+        except (TypeError, ValueError):
+            coordinates.append((float("nan"), float("nan")))
+    with metrics.stage("/api/roi_scenarios", "locate"):
+        found = index.locate_many([p[0] for p in coordinates], [p[1] for p in coordinates])
+    plots = list(plots)
+    for i, state in zip(pending, found):
+        if state:
+            plots[i] = {**plots[i], "state": state}
+    return plots
+
 # --- Water Advisor ---
 # --- Baseline Crop Data ---
 CROP_DATA = {
@@ -227,39 +930,200 @@ CROP_DATA = {
     }
 }
 
+# Numeric ranges compiled once from CROP_DATA (optionally plus the regional dataset)
+REGION_DATASET_PATH = os.path.join(BASE_DIR, "crop-selector", "datasets", "crop_yield_by_region.csv")
 
+def build_suitability():
+    from crop_suitability import SuitabilityTable
+    table = SuitabilityTable.from_crop_data(CROP_DATA)
+    if os.getenv("SUITABILITY_REGIONAL_CROPS") == "1":
+        try:
+            table.extend_from_region(REGION_DATASET_PATH)
+        except Exception as e:
+            print("⚠️ Could not add regional crops:", e)
+    return table
+
+suitability = Lazy("suitability", build_suitability, startup)
+
+# --- Regional Yield Analytics ---
+REGION_OLDER_DATASET_PATH = os.path.join(BASE_DIR, "crop-selector", "datasets", "crop_yield_by_region_older.csv")
+ANALYTICS_DATASETS = {
+    "india": (REGION_DATASET_PATH, "india"),
+    "global": (REGION_OLDER_DATASET_PATH, "global"),
+}
 
-@app.post("/api/water_advisor")
+def build_analytics(name):
+    from region_analytics import RegionTable
+    path, schema = ANALYTICS_DATASETS[name]
+    return RegionTable.from_csv(path, schema, cache_size=int(os.getenv("ANALYTICS_CACHE_SIZE", 256)))
+
+analytics = {name: Lazy(f"analytics_{name}", partial(build_analytics, name), startup) for name in ANALYTICS_DATASETS}
+
+@router.get("/api/analytics/dimensions")
+def analytics_dimensions(dataset: str = "india"):
+    """Crops, states, seasons, year range and metrics available in a dataset."""
+    if dataset not in ANALYTICS_DATASETS:
+        return {"error": f"Unknown dataset '{dataset}'. Choose from {', '.join(ANALYTICS_DATASETS)}."}
+    table = analytics[dataset].get()
+    if table is None:
+        return {"error": "Dataset not loaded."}
+    return {"dataset": dataset, **table.dimensions()}
+
+@router.get("/api/analytics/yield")
+def yield_analytics(
+    dataset: str = "india",
+    crop: str = None,
+    state: str = None,
+    season: str = None,
+    year_from: int = None,
+    year_to: int = None,
+    group_by: str = "year",
+    metric: str = "yield",
+    agg: str = "mean",
+    top: int = None,
+    lat: float = None,
+    lon: float = None,
+):
+    """
+    Filter/group-by/aggregate over the regional datasets, e.g.
+    ?state=Assam&crop=Rice&group_by=year (yield trend) or
+    ?group_by=state,crop&top=3 (top crops per state).
+    crop/state/season accept comma-separated values; lat/lon select the
+    state containing that point.
+    """
+    if lat is not None or lon is not None:
+        located, error = resolve_state(lat, lon)
+        if error:
+            return {"error": error}
+        state = state or located
+    if dataset not in ANALYTICS_DATASETS:
+        return {"error": f"Unknown dataset '{dataset}'. Choose from {', '.join(ANALYTICS_DATASETS)}."}
+    table = analytics[dataset].get()
+    if table is None:
+        return {"error": "Dataset not loaded."}
+    try:
+        with metrics.stage("/api/analytics/yield", "query"):
+            result = table.query(crop, state, season, year_from, year_to, group_by, metric, agg, top)
+        return {"dataset": dataset, **({"state": state} if lat is not None else {}), **result}
+    except ValueError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Analytics query failed: {str(e)}"}
+
+# --- Water Advisor Model ---
+WATER_DATASET_PATH = os.path.join(WATER_MODEL_DIR, "datasets", "agricultural_water_footprint.csv")
+_water = {"parts": None, "model": None}
+
+def get_water_model():
+    """Builds (and caches) the serving wrapper around the registry's water models."""
+    try:
+        parts = tuple(models.get(n) for n in ("water_advisor", "water_scaler", "water_encoder"))
+    except ModelUnavailable:
+        return None
+    current = _water["parts"]
+    if current is None or any(a is not b for a, b in zip(parts, current)):
+        from water_model import WaterAdvisorModel, encoders_from_artifact, encoders_from_dataset
+        forest, scaler, encoder = parts
+        # Legacy encoder.pkl is one LabelEncoder; rebuild per-column codes from the dataset
+        encoders = encoders_from_artifact(encoder) if isinstance(encoder, dict) else encoders_from_dataset(WATER_DATASET_PATH)
+        _water["model"] = WaterAdvisorModel(forest, scaler, encoders, cache_size=int(os.getenv("WATER_CACHE_SIZE", 4096)))
+        _water["parts"] = parts
+    return _water["model"]
+
+async def predict_water(records, route="/api/water_advisor"):
+    """Model predictions for water_advisor inputs, or None if the model is unavailable."""
+    # The first call reads three pickles and builds the wrapper; keep that off the event loop
+    water_model = get_water_model() if _water["model"] is not None else await asyncio.to_thread(get_water_model)
+    if water_model is None:
+        return None
+    metrics.observe_batch("water_advisor", len(records))
+    with metrics.stage(route, "inference"):
+        return water_model.predict(records)
+
+def cache_metrics():
+    """Hit/miss counters of the in-process caches, read on each /metrics scrape."""
+    caches = [("answer", answer_cache.snapshot())]
+    if _water["model"] is not None:
+        caches.append(("water_advisor", _water["model"].cache_info()))
+    if weather.loaded:
+        caches.append(("weather", weather.get().cache_info()))
+    for component in analytics.values():
+        if component.loaded:
+            caches.append((component.name, component.get().cache_info()))
+    for name, stats in caches:
+        hits = stats["hits"] + stats.get("near_hits", 0)
+        lookups = hits + stats["misses"]
+        yield "cache_hits_total", "counter", "Cache hits.", {"cache": name}, hits
+        yield "cache_misses_total", "counter", "Cache misses.", {"cache": name}, stats["misses"]
+        yield "cache_hit_ratio", "gauge", "Cache hits / lookups since start.", {"cache": name}, round(hits / lookups, 4) if lookups else 0.0
+        yield "cache_entries", "gauge", "Entries currently cached.", {"cache": name}, stats["size"]
+
+metrics.add_collector(cache_metrics)
+
+@router.post("/api/water_advisor_batch")
+async def water_advisor_batch(request: Request):
+    """
+    Model predictions for many inputs in one forest call (repeat inputs are cached).
+    Body: {"records": [{Crop_Name, Soil_Type, Irrigation_Type, Water_Scarcity,
+    Rainfall_Requirement, Temperature_Requirement, Yield, Crop_Cycle_Duration}, ...]}
+    """
+    try:
+        with metrics.stage("/api/water_advisor_batch", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        records = body.get("records") if isinstance(body, dict) else body
+        if not isinstance(records, list):
+            return {"error": "Expected a list of records."}
+        if len(records) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large ({len(records)} > {MAX_BATCH_SIZE} records)."}
+
+        predictions = await predict_water(records, route="/api/water_advisor_batch")
+        if predictions is None:
+            return {"error": "Water advisor model not loaded."}
+        return {"count": len(predictions), "results": predictions}
+    except Exception as e:
+        return {"error": f"Water prediction failed: {str(e)}"}
+
+@router.post("/api/water_advisor")
 async def water_advisor(request: Request):
-    body = await request.json()
-    crop_name = body.get("Crop_Name", "").lower()
-    rainfall = float(body.get("Rainfall_Requirement", 0))
-    temperature = float(body.get("Temperature_Requirement", 0))
-    yield_estimate = float(body.get("Yield", 0))
-    cycle_duration = int(body.get("Crop_Cycle_Duration", 0))
-    soil_type = body.get("Soil_Type", "Unknown")
-    irrigation_type = body.get("Irrigation_Type", "Unknown")
-    scarcity = body.get("Water_Scarcity", "Unknown")
+    try:
+        with metrics.stage("/api/water_advisor", "parse"):
+            body = await decode(request, WaterAdvisorRequest)
+    except ValueError as e:
+        return {"error": describe(e)}
+    crop_name = body.Crop_Name.lower()
+    rainfall = body.Rainfall_Requirement
+    temperature = body.Temperature_Requirement
+    cycle_duration = int(body.Crop_Cycle_Duration)
+    soil_type = body.Soil_Type
+    irrigation_type = body.Irrigation_Type
+    scarcity = body.Water_Scarcity
 
     crop_info = CROP_DATA.get(crop_name, None)
     if not crop_info:
         return {"error": f"No reference data found for crop '{crop_name}'."}
+    # Without the suitability table the range checks are skipped; the rest of the advice stands
+    table = await suitability.aget()
+    limits = table.limits(crop_name) if table is not None else None
 
     # --- Advice generation ---
     advice = []
-    if temperature < int(crop_info["temperature"].split("–")[0].replace("°C", "").strip()):
-        advice.append("🌡️ Temperature is too low, crop may not grow well.")
-    elif temperature > int(crop_info["temperature"].split("–")[1].replace("°C", "").strip()):
-        advice.append("🌡️ Temperature is too high, heat stress likely.")
-    else:
-        advice.append("🌡️ Temperature is suitable.")
+    if limits:
+        if temperature < limits["temp_min"]:
+            advice.append("🌡️ Temperature is too low, crop may not grow well.")
+        elif temperature > limits["temp_max"]:
+            advice.append("🌡️ Temperature is too high, heat stress likely.")
+        else:
+            advice.append("🌡️ Temperature is suitable.")
 
-    if rainfall < int(crop_info["rainfall"].split("–")[0].replace("mm/year", "").strip()):
-        advice.append("🌧️ Rainfall insufficient, irrigation required.")
-    elif rainfall > int(crop_info["rainfall"].split("–")[1].replace("mm/year", "").strip()):
-        advice.append("🌧️ Excess rainfall, ensure drainage to prevent flooding.")
-    else:
-        advice.append("🌧️ Rainfall conditions are adequate.")
+        if rainfall < limits["rain_min"]:
+            advice.append("🌧️ Rainfall insufficient, irrigation required.")
+        elif rainfall > limits["rain_max"]:
+            advice.append("🌧️ Excess rainfall, ensure drainage to prevent flooding.")
+        else:
+            advice.append("🌧️ Rainfall conditions are adequate.")
 
     if cycle_duration > 365:
         advice.append("⚠️ Crop cycle duration is unrealistic, check inputs.")
@@ -270,6 +1134,14 @@ async def water_advisor(request: Request):
     if not advice:
         advice.append("✅ Conditions are stable. Monitor regularly.")
 
+    try:
+        # Only the keys the client sent, so the model's own defaults and warnings apply
+        predictions = await predict_water([body.model_dump(exclude_unset=True)])
+        model_prediction = predictions[0] if predictions else None
+    except Exception as e:
+        print("⚠️ Water model prediction failed:", e)
+        model_prediction = None
+
     return {
         "crop": crop_name,
         "soil_type": soil_type,
@@ -280,11 +1152,189 @@ async def water_advisor(request: Request):
         "predicted_rainfall_requirement": crop_info["rainfall"],
         "cycle_duration_days": crop_info["cycle_days"],
         "yield_estimate": crop_info["yield_estimate"],
+        "model_prediction": model_prediction,
         "advice": " ".join(advice)
     }
 
+# --- Weather ---
+def build_weather():
+    from weather import WeatherService, create_provider
+    return WeatherService(
+        create_provider(),
+        tile_size=float(os.getenv("WEATHER_TILE_DEG", 0.1)),
+        days=int(os.getenv("WEATHER_DAYS", 30)),
+        cache_size=int(os.getenv("WEATHER_CACHE_SIZE", 4096)),
+    )
+
+weather = Lazy("weather", build_weather, startup)
+
+@router.get("/api/weather")
+async def weather_summary(lat: float, lon: float):
+    """
+    Last WEATHER_DAYS days of weather around a point: average max/min
+    temperature and daily rainfall, plus the daily series for charts.
+    Served per grid tile and day from cache.
+    """
+    from weather import WeatherUnavailable
+    service = await weather.aget()
+    if service is None:
+        return {"error": "Weather service not configured."}
+    try:
+        with metrics.stage("/api/weather", "fetch"):
+            return await service.summary(lat, lon)
+    except ValueError as e:
+        return {"error": str(e)}
+    except WeatherUnavailable as e:
+        return {"error": f"Weather data unavailable: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Weather lookup failed: {str(e)}"}
+
+# --- Crop Calendar ---
+def build_calendar():
+    # Precomputed from the regional seasons and crop cycles (cached on disk per dataset version)
+    from crop_calendar import CropCalendar, load_or_build
+    return CropCalendar(load_or_build(REGION_DATASET_PATH, CROP_DATA, WATER_DATASET_PATH))
+
+calendar = Lazy("crop_calendar", build_calendar, startup)
+
+@router.get("/api/calendar/states")
+def calendar_states():
+    table = calendar.get()
+    if table is None:
+        return {"error": "Crop calendar not loaded."}
+    return {"states": table.states()}
+
+@router.get("/api/calendar")
+def crop_calendar(state: str, crop: str = None, season: str = None, format: str = "json", year: int = None):
+    """
+    Sowing and harvest windows for every crop grown in a state (most widely
+    grown first), or for one crop. format=ics returns an iCalendar file with
+    the windows for the given sowing year (default: this year).
+    """
+    from crop_calendar import slugify, to_ical
+    table = calendar.get()
+    if table is None:
+        return {"error": "Crop calendar not loaded."}
+    if format not in ("json", "ics"):
+        return {"error": "format must be 'json' or 'ics'."}
+    year = year or time.localtime().tm_year
+    if not 1900 <= year <= 2100:
+        return {"error": "year must be between 1900 and 2100."}
+
+    entries = table.lookup(state, crop, season)
+    if entries is None:
+        return {"error": f"Unknown state '{state}'."}
+    if not entries:
+        return {"error": f"No calendar entries for '{crop or state}'" + (f" in season '{season}'." if season else ".")}
+
+    if format == "ics":
+        name = f"{crop.strip().title()} - {entries[0]['state']}" if crop else entries[0]["state"]
+        filename = "-".join(part for part in (entries[0]["state"], crop, season, str(year)) if part)
+        return Response(
+            to_ical(entries, year, name=f"Kisan Mitra crop calendar: {name}"),
+            media_type="text/calendar; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{slugify(filename)}.ics"'},
+        )
+    return {"state": entries[0]["state"], "year": year, "count": len(entries), "entries": entries}
+
+# --- Bulk Jobs ---
+def build_jobs():
+    from bulk_jobs import JobManager
+    return JobManager(
+        {
+            "model_path": MODEL_PATH,
+            "flat_model_path": FLAT_MODEL_PATH,
+            "water_model_dir": WATER_MODEL_DIR,
+            "water_dataset_path": WATER_DATASET_PATH,
+            "crop_data": CROP_DATA,
+        },
+        workers=int(os.getenv("BULK_WORKERS", 0)) or None,
+        chunk_rows=int(os.getenv("BULK_CHUNK_ROWS", 5000)),
+        max_jobs=int(os.getenv("BULK_MAX_JOBS", 4)),
+        max_upload_bytes=int(os.getenv("BULK_MAX_UPLOAD_MB", 200)) << 20,
+        ttl=float(os.getenv("BULK_JOB_TTL", 3600)),
+        root=os.getenv("BULK_JOB_DIR") or None,
+    )
+
+jobs = Lazy("bulk_jobs", build_jobs, startup)
+
+def job_not_found(job_id):
+    return JSONResponse({"error": f"Unknown job '{job_id}'."}, status_code=404)
+
+def jobs_unavailable():
+    return JSONResponse({"error": "Bulk jobs unavailable."}, status_code=503)
+
+@router.post("/api/jobs")
+async def create_job(request: Request):
+    """
+    Starts a bulk scoring job. The body is the raw CSV (Content-Type: text/csv)
+    with N, P, K, temperature, humidity, ph, rainfall columns and, optionally,
+    the water-advisor columns (Crop_Name, Soil_Type, Irrigation_Type, ...).
+    """
+    from bulk_jobs import JobLimitExceeded, UploadTooLarge
+    manager = await jobs.aget()
+    if manager is None:
+        return jobs_unavailable()
+    try:
+        job = await manager.submit(request.stream())
+    except JobLimitExceeded as e:
+        return JSONResponse({"error": str(e)}, status_code=429)
+    except UploadTooLarge as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+    return {
+        **job.snapshot(),
+        "status_url": f"/api/jobs/{job.id}",
+        "results_url": f"/api/jobs/{job.id}/results",
+    }
+
+@router.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    manager = await jobs.aget()
+    if manager is None:
+        return jobs_unavailable()
+    job = manager.get(job_id)
+    return job.snapshot() if job else job_not_found(job_id)
+
+@router.get("/api/jobs/{job_id}/results")
+async def job_results(job_id: str, format: str = "ndjson", progress: bool = False):
+    """
+    Streams results in input order while the job runs: NDJSON (one object per
+    row, ?progress=1 adds {"progress": ...} lines, a final {"summary": ...})
+    or ?format=csv.
+    """
+    from bulk_jobs import FORMATS, iter_results
+    manager = await jobs.aget()
+    if manager is None:
+        return jobs_unavailable()
+    job = manager.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    if format not in FORMATS:
+        return JSONResponse({"error": f"Unknown format '{format}'. Choose from {', '.join(FORMATS)}."}, status_code=400)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        iter_results(job, format, progress),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancels a running job, or deletes a finished one and its results."""
+    manager = await jobs.aget()
+    if manager is None:
+        return jobs_unavailable()
+    job = manager.get(job_id)
+    if job is None:
+        return job_not_found(job_id)
+    if job.done:
+        manager.remove(job_id)
+        return {**job.snapshot(), "deleted": True}
+    manager.cancel(job_id)
+    return job.snapshot()
+
 # --- Govt Schemes ---
-@app.get("/api/schemes")
+@router.get("/api/schemes")
 async def get_schemes():
     schemes = [
         {"name": "PM-KISAN", "benefit": "₹6000/year income support", "link": "https://pmkisan.gov.in"},
@@ -297,66 +1347,87 @@ async def get_schemes():
 
 
 # --- Crop Prediction ---
-@app.post("/api/select_crop")
+@router.post("/api/select_crop")
 async def select_crop(request: Request):
     """
     Suggests suitable crops based on soil nutrients, pH, temperature, and rainfall.
     """
-    data = await request.json()
     try:
-        N = float(data.get("N", 0))
-        P = float(data.get("P", 0))
-        K = float(data.get("K", 0))
-        ph = float(data.get("ph", 0))
-        temperature = float(data.get("temperature", 0))
-        rainfall = float(data.get("rainfall", 0))  # mm/year
-
-        suitable_crops = []
-
-        for crop, info in CROP_DATA.items():
-            # --- Parse temp ---
-            temp_range = info["temperature"].replace("°C", "").strip()
-            temp_min, temp_max = [float(x.strip()) for x in temp_range.replace("–", "-").split("-")]
-
-            # --- Parse rainfall ---
-            rain_range = info["rainfall"].replace("mm/year", "").strip()
-            rain_min, rain_max = [float(x.strip()) for x in rain_range.replace("–", "-").split("-")]
-
-            # --- Scoring instead of strict filter ---
-            score = 0
-
-            # Temp match
-            if temp_min <= temperature <= temp_max:
-                score += 2  
+        with metrics.stage("/api/select_crop", "parse"):
+            conditions = await decode(request, CropConditions)
+    except ValueError as e:
+        return {"error": describe(e)}
+    table = await suitability.aget()
+    if table is None:
+        return {"error": "Dataset not loaded."}
+    try:
+        with metrics.stage("/api/select_crop", "scoring"):
+            rankings, errors = table.recommend([conditions.model_dump()], k=5)
+        if errors:
+            return {"error": errors[0]}
+        return {"recommended_crops": rankings[0]}
 
-            # Rainfall match
-            if rain_min <= rainfall <= rain_max:
-                score += 2  
+    except Exception as e:
+        return {"error": str(e)}
 
-            # Soil nutrient + pH check (basic logic, can refine with dataset)
-            if 5.5 <= ph <= 7.5:
-                score += 1  
+@router.post("/api/select_crop_batch")
+async def select_crop_batch(request: Request):
+    """
+    Scores many conditions against every crop in one pass.
+    Body: {"conditions": [{N, P, K, ph, temperature, rainfall}, ...], "top_k": 5}
+    """
+    try:
+        with metrics.stage("/api/select_crop_batch", "parse"):
+            body = await read_body(request)
+    except ValueError as e:
+        return {"error": str(e)}
+    try:
+        conditions = body.get("conditions") if isinstance(body, dict) else body
+        k = int(body.get("top_k", 5)) if isinstance(body, dict) else 5
+        if not isinstance(conditions, list):
+            return {"error": "Expected a list of conditions."}
+        if len(conditions) > MAX_BATCH_SIZE:
+            return {"error": f"Batch too large ({len(conditions)} > {MAX_BATCH_SIZE} conditions)."}
 
-            if N > 0 and P > 0 and K > 0:
-                score += 1  
+        table = await suitability.aget()
+        if table is None:
+            return {"error": "Dataset not loaded."}
 
-            if score >= 3:  # ✅ only crops with decent match
-                suitable_crops.append((crop, score))
+        metrics.observe_batch("suitability", len(conditions))
+        with metrics.stage("/api/select_crop_batch", "scoring"):
+            rankings, errors = table.recommend(conditions, k=k)
+        return {
+            "count": len(rankings),
+            "failed": len(errors),
+            "results": [
+                {"error": errors[i]} if i in errors else {"recommended_crops": crops}
+                for i, crops in enumerate(rankings)
+            ]
+        }
+    except Exception as e:
+        return {"error": f"Batch selection failed: {str(e)}"}
 
-        if not suitable_crops:
-            return {"recommended_crops": []}
+# --- App ---
+# Built once every component and route above is defined
+components = [chatbot, crop_stats, suitability, *analytics.values(), roi_scenarios, similar_fields, weather, calendar, states]
 
-        # Sort crops by score first, then yield
-        suitable_crops_sorted = sorted(
-            suitable_crops,
-            key=lambda c: (
-                c[1],  # score
-                int(CROP_DATA[c[0]]["yield_estimate"].split("–")[1].replace("kg/ha", "").strip())
-            ),
-            reverse=True
-        )
+def create_app():
+    app = FastAPI(lifespan=lifespan, default_response_class=ResponseClass)
+    if PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware, profiler=profiler)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
 
-        return {"recommended_crops": [c[0] for c in suitable_crops_sorted[:5]]}
+    # --- CORS ---
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
 
-    except Exception as e:
-        return {"error": str(e)}
+app = create_app()
+startup.record("import", time.perf_counter() - _import_started)
@@ -0,0 +1,94 @@
+"""
+Nearest-neighbour "similar fields" search over the soil/climate samples.
+
+The N/P/K/temperature/humidity/ph/rainfall columns of
+crop_yield_by_rainfall.csv (or any frame with those columns) are
+standardized to zero mean and unit variance, so that no single unit (mm of
+rain vs pH) dominates the distance. They are then indexed once in a KD-tree
+(sklearn.neighbors). A query walks the tree instead of scanning every row,
+so a k-NN lookup costs about O(log n) for this few dimensions. A batch of
+readings is answered with one query call.
+"""
+import numpy as np
+
+from crop_inference import FEATURES, RAINFALL_SCALE, records_to_matrix
+from datasets import read_dataset
+
+ALGORITHMS = ("kd_tree", "ball_tree")
+
+
+class SimilarityIndex:
+    def __init__(self, values, labels, features=FEATURES, algorithm="kd_tree", leaf_size=40):
+        """
+        values: (n, len(features)) raw feature matrix; labels: the crop of each
+        row. Features with zero variance are left unscaled.
+        """
+        from sklearn.neighbors import BallTree, KDTree
+
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown algorithm '{algorithm}'. Choose from {', '.join(ALGORITHMS)}.")
+        self.features = list(features)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.labels = np.asarray(labels)
+        self.algorithm = algorithm
+        self.mean = self.values.mean(axis=0)
+        std = self.values.std(axis=0)
+        self.scale = np.where(std > 0, std, 1.0)
+        tree = KDTree if algorithm == "kd_tree" else BallTree
+        self.tree = tree(self._standardize(self.values), leaf_size=leaf_size)
+
+    @classmethod
+    def from_csv(cls, path, label_column="crop", features=FEATURES, **kwargs):
+        data = read_dataset(path, usecols=list(features) + [label_column])
+        data = data.dropna()
+        labels = data[label_column].astype(str).str.strip().str.lower().to_numpy()
+        return cls(data[list(features)].to_numpy(), labels, features, **kwargs)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _standardize(self, matrix):
+        return (matrix - self.mean) / self.scale
+
+    def query(self, matrix, k=5):
+        """(distances, row ids), both (len(matrix), k), nearest first. Distances are in standardized units."""
+        k = max(1, min(int(k), len(self)))
+        return self.tree.query(self._standardize(np.asarray(matrix, dtype=np.float64)), k=k)
+
+    def similar(self, records, k=5):
+        """
+        The k nearest samples for every record, in input order. Invalid
+        records get an {"error": ...} entry instead of failing the batch.
+        """
+        matrix, errors = records_to_matrix(records, self.features)
+        if "rainfall" in self.features:
+            # records_to_matrix scales rainfall for the model; the samples are in mm
+            matrix[:, self.features.index("rainfall")] *= RAINFALL_SCALE
+        results = [None] * len(records)
+
+        valid = np.array([i not in errors for i in range(len(records))], dtype=bool)
+        if valid.any():
+            distances, rows = self.query(matrix[valid], k)
+            for q, i in enumerate(np.flatnonzero(valid)):
+                results[i] = self._format(distances[q], rows[q])
+
+        for i, message in errors.items():
+            results[i] = {"error": message}
+        return results
+
+    def _format(self, distances, rows):
+        neighbors = [
+            {
+                "crop": str(self.labels[row]),
+                "distance": round(float(distance), 4),
+                **{f: round(float(v), 2) for f, v in zip(self.features, self.values[row])},
+            }
+            for distance, row in zip(distances, rows)
+        ]
+        # Share of each crop among the neighbours, most common first
+        crops, counts = np.unique(self.labels[rows], return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        return {
+            "neighbors": neighbors,
+            "crops": [{"crop": str(crops[j]), "share": round(float(counts[j]) / len(rows), 4)} for j in order],
+        }
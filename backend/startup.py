@@ -0,0 +1,112 @@
+"""
+Startup bookkeeping for the API.
+
+Heavy components (datasets, models, the chatbot client) are wrapped in Lazy
+so importing server.py stays cheap: each one is built on first use, or ahead
+of time by the background warmup. StartupReport records how long the import,
+every component and the warmup took; /ready serves it. Async handlers use
+Lazy.aget(), which runs a first build in a worker thread instead of blocking
+the event loop.
+"""
+import asyncio
+import threading
+import time
+
+
+class StartupReport:
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.timings = {}
+        self.errors = {}
+        self.ready_at = None
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.timings[name] = round(seconds, 4)
+
+    def fail(self, name, error):
+        with self._lock:
+            self.errors[name] = str(error)
+
+    def step(self, name):
+        return _Step(self, name)
+
+    def mark_ready(self):
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    @property
+    def ready(self):
+        return self.ready_at is not None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "ready_after_seconds": round(self.ready_at - self.started, 4) if self.ready else None,
+                "uptime_seconds": round(time.perf_counter() - self.started, 1),
+                "timings": dict(self.timings),
+                "errors": dict(self.errors),
+            }
+
+
+class _Step:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.report.record(self.name, time.perf_counter() - self.start)
+        if exc is not None:
+            self.report.fail(self.name, exc)
+        return False
+
+
+class Lazy:
+    """
+    A component built by factory() on first get(), once, thread-safe. If the
+    factory raises, the error is printed and recorded, and get() returns None
+    from then on (the same as the old "could not load" globals).
+    """
+
+    def __init__(self, name, factory, report):
+        self.name = name
+        self.factory = factory
+        self.report = report
+        self._value = None
+        self._done = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._done and self._value is not None
+
+    @property
+    def built(self):
+        """True once the factory has run, successfully or not; get() no longer blocks."""
+        return self._done
+
+    def get(self):
+        if self._done:
+            return self._value
+        with self._lock:
+            if not self._done:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    print(f"⚠️ Could not load {self.name}:", e)
+                    self.report.fail(self.name, e)
+                self.report.record(self.name, time.perf_counter() - start)
+                self._done = True
+        return self._value
+
+    async def aget(self):
+        """get() for async handlers: a build that has not happened yet runs in a worker thread."""
+        if self._done:
+            return self._value
+        return await asyncio.to_thread(self.get)
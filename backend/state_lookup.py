@@ -0,0 +1,161 @@
+"""
+Offline reverse geocoding: (lat, lon) -> Indian state.
+
+State polygons are read once from a GeoJSON FeatureCollection (Polygon or
+MultiPolygon features with a name property). By default this is
+geodata/india_states.geojson; see geodata/build_state_boundaries.py for how
+it is made, and set STATE_BOUNDARIES_PATH to use official borders instead.
+
+Lookups use an exact even-odd ray cast, with two grid indexes so that it
+rarely has to run:
+- the bounding box is cut into square cells. A cell that no polygon edge
+  crosses lies wholly inside one state, or outside all of them. Its answer
+  is precomputed, so most points are resolved with one array read;
+- every edge is also filed under the horizontal bands (cell rows) its
+  y-range overlaps. A point in a boundary cell is ray-cast only against the
+  edges of its own band, tens of edges instead of thousands.
+
+Batches are resolved band by band as one vectorized crossing count.
+"""
+import json
+import math
+
+import numpy as np
+
+NAME_FIELDS = ("name", "st_nm", "ST_NM", "NAME_1", "state", "STATE")
+
+# Cell codes besides state ids
+OUTSIDE = -1
+BOUNDARY = -2
+
+
+class StateIndex:
+    def __init__(self, features, cell=0.25):
+        """
+        features: [(name, polygons)] where polygons is a list of polygons, each a
+        list of rings of (lon, lat) points (GeoJSON order; the first ring is the
+        exterior, the rest are holes).
+        """
+        self.names = [name for name, _ in features]
+        self.cell = cell
+        edges = []
+        for owner, (_, polygons) in enumerate(features):
+            for polygon in polygons:
+                for ring in polygon:
+                    points = np.asarray(ring, dtype=np.float64)[:, :2]
+                    if len(points) < 3:
+                        continue
+                    if not np.array_equal(points[0], points[-1]):
+                        points = np.vstack([points, points[:1]])
+                    edges.append(np.column_stack([points[:-1], points[1:], np.full(len(points) - 1, owner)]))
+        if not edges:
+            raise ValueError("No polygons to index.")
+        edges = np.vstack(edges)
+        x1, y1, x2, y2, owner = edges.T
+
+        self.x0, self.y0 = float(min(x1.min(), x2.min())), float(min(y1.min(), y2.min()))
+        self.rows = max(1, math.ceil((max(y1.max(), y2.max()) - self.y0) / cell))
+        self.cols = max(1, math.ceil((max(x1.max(), x2.max()) - self.x0) / cell))
+        # One-hot owner matrix turns per-edge crossings into per-state counts
+        self._owners = np.eye(len(self.names), dtype=np.int32)
+
+        # Bands: non-horizontal edges (horizontal ones never cross a horizontal ray)
+        sloped = y1 != y2
+        lo = self._row(np.minimum(y1, y2)[sloped])
+        hi = self._row(np.maximum(y1, y2)[sloped])
+        ids = np.flatnonzero(sloped)
+        spans = hi - lo + 1
+        band_ids = np.repeat(ids, spans)
+        band_rows = np.repeat(lo, spans) + (np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans))
+        order = np.argsort(band_rows, kind="stable")
+        band_ids, band_rows = band_ids[order], band_rows[order]
+        bounds = np.searchsorted(band_rows, np.arange(self.rows + 1))
+        self._bands = []
+        for r in range(self.rows):
+            e = edges[band_ids[bounds[r]:bounds[r + 1]]]
+            self._bands.append((e[:, 0], e[:, 1], e[:, 2], e[:, 3], self._owners[e[:, 4].astype(np.intp)]))
+
+        # Cells: any cell an edge's bounding box touches needs a ray cast; the rest are uniform
+        cells = np.zeros((self.rows, self.cols), dtype=bool)
+        r0, r1 = self._row(np.minimum(y1, y2)), self._row(np.maximum(y1, y2))
+        c0, c1 = self._col(np.minimum(x1, x2)), self._col(np.maximum(x1, x2))
+        for a, b, c, d in zip(r0.tolist(), r1.tolist(), c0.tolist(), c1.tolist()):
+            cells[a:b + 1, c:d + 1] = True
+        self._cells = np.full((self.rows, self.cols), BOUNDARY, dtype=np.int16)
+        rows, cols = np.nonzero(~cells)
+        centers_x = self.x0 + (cols + 0.5) * cell
+        centers_y = self.y0 + (rows + 0.5) * cell
+        self._cells[rows, cols] = self._cast(centers_x, centers_y, rows)
+
+    @classmethod
+    def from_geojson(cls, path, name_field=None, cell=0.25):
+        with open(path, encoding="utf-8") as f:
+            collection = json.load(f)
+        features = []
+        for feature in collection.get("features", []):
+            properties = feature.get("properties") or {}
+            geometry = feature.get("geometry") or {}
+            field = name_field or next((f for f in NAME_FIELDS if properties.get(f)), None)
+            if field is None or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+                continue
+            coordinates = geometry["coordinates"]
+            polygons = [coordinates] if geometry["type"] == "Polygon" else coordinates
+            features.append((str(properties[field]).strip(), polygons))
+        return cls(features, cell=cell)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _row(self, y):
+        return np.clip(np.floor((np.asarray(y) - self.y0) / self.cell).astype(np.intp), 0, self.rows - 1)
+
+    def _col(self, x):
+        return np.clip(np.floor((np.asarray(x) - self.x0) / self.cell).astype(np.intp), 0, self.cols - 1)
+
+    def _cast(self, x, y, rows):
+        """Even-odd ray cast (towards +x) of points against their band's edges. Returns state ids or OUTSIDE."""
+        result = np.full(len(x), OUTSIDE, dtype=np.int16)
+        for r in np.unique(rows).tolist():
+            x1, y1, x2, y2, owners = self._bands[r]
+            if not len(x1):
+                continue
+            at = np.flatnonzero(rows == r)
+            px, py = x[at, None], y[at, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crosses = ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * (x2 - x1) / (y2 - y1))
+            inside = (crosses.astype(np.int32) @ owners) % 2 == 1
+            # First state whose boundary is crossed an odd number of times
+            hit = inside.any(axis=1)
+            result[at[hit]] = inside[hit].argmax(axis=1)
+        return result
+
+    def locate_many(self, lats, lons):
+        """State names (None outside every state) for arrays of coordinates."""
+        lat = np.asarray(lats, dtype=np.float64).ravel()
+        lon = np.asarray(lons, dtype=np.float64).ravel()
+        codes = np.full(len(lat), OUTSIDE, dtype=np.int16)
+        known = np.isfinite(lat) & np.isfinite(lon)
+        known &= (lon >= self.x0) & (lon < self.x0 + self.cols * self.cell)
+        known &= (lat >= self.y0) & (lat < self.y0 + self.rows * self.cell)
+        at = np.flatnonzero(known)
+        rows, cols = self._row(lat[at]), self._col(lon[at])
+        found = self._cells[rows, cols]
+        edge = found == BOUNDARY
+        if edge.any():
+            found[edge] = self._cast(lon[at][edge], lat[at][edge], rows[edge])
+        codes[at] = found
+        return [self.names[c] if c >= 0 else None for c in codes.tolist()]
+
+    def locate(self, lat, lon):
+        """State name for one point, or None."""
+        lat, lon = float(lat), float(lon)
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        r = math.floor((lat - self.y0) / self.cell)
+        c = math.floor((lon - self.x0) / self.cell)
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            return None
+        code = int(self._cells[r, c])
+        if code == BOUNDARY:
+            code = int(self._cast(np.array([lon]), np.array([lat]), np.array([r]))[0])
+        return self.names[code] if code >= 0 else None
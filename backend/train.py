@@ -0,0 +1,350 @@
+"""
+Training CLI for the served models.
+
+    python train.py crop                  # crop selector (RandomForestClassifier)
+    python train.py water                 # water advisor (RandomForestRegressor)
+    python train.py crop --search full --select accuracy
+
+For each task, a grid of candidates is cross-validated in parallel over all
+cores. Every candidate is scored on the same fold splits, which are cached
+per dataset hash under .cache/folds. Each candidate is then refit on the full
+data, and its single-row inference latency and pickled size are measured
+(one refit model is held at a time; the selected one is refit again to ship).
+The selected model is the fastest one within --tolerance of the best CV
+score (--select balanced, the default), or simply the most accurate one
+(--select accuracy). --max-latency-ms and --max-size-mb filter candidates
+first.
+
+Every run writes a versioned directory under <task dir>/versions/ containing
+the artifacts and a metadata JSON (features, per-column encoders, data hash,
+CV results for every candidate). It then promotes them to the paths
+server.py loads, with a <model>.meta.json sidecar that the model registry
+exposes on /admin/models. Pass --no-promote to only write the version.
+"""
+import argparse
+import itertools
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, StratifiedKFold
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from crop_inference import RAINFALL_SCALE  # noqa: E402
+from datasets import CACHE_DIR, read_dataset, source_hash  # noqa: E402
+from forest_eval import FlatForest  # noqa: E402
+from model_registry import metadata_path  # noqa: E402
+from water_model import CATEGORICAL, DATASET_COLUMNS, FEATURES, MISSING  # noqa: E402
+
+FOLD_CACHE_DIR = os.path.join(os.path.dirname(CACHE_DIR), "folds")
+
+# Candidate grids; "quick" is a subset of "full" that still includes the old defaults
+GRIDS = {
+    "quick": {
+        "n_estimators": [25, 50, 100],
+        "max_depth": [None, 12],
+        "min_samples_leaf": [1, 2],
+    },
+    "full": {
+        "n_estimators": [25, 50, 100, 200],
+        "max_depth": [None, 8, 12, 20],
+        "min_samples_leaf": [1, 2, 4],
+        "max_features": ["sqrt", 0.5],
+    },
+}
+
+
+# --- Tasks ---
+def load_crop():
+    path = os.path.join(BASE_DIR, "crop-selector", "datasets", "crop_yield_by_rainfall.csv")
+    data = read_dataset(path)
+    # Same preparation as the original make_model.py: no humidity, rainfall / 100
+    data["rainfall"] = data["rainfall"] / RAINFALL_SCALE
+    features = ["N", "P", "K", "temperature", "ph", "rainfall"]
+    return {
+        "path": path,
+        "X": data[features],
+        "y": data["crop"].to_numpy(),
+        "features": features,
+        "target": "crop",
+        "preprocessing": {"rainfall": f"divided by {RAINFALL_SCALE:g}"},
+    }
+
+
+def load_water():
+    path = os.path.join(BASE_DIR, "water-advisor", "datasets", "agricultural_water_footprint.csv")
+    data = read_dataset(path).rename(columns={**DATASET_COLUMNS, "Water Use (m³/kg)": "Water_Use"})
+    # One LabelEncoder per column (make_model.py reused a single one for all of them)
+    encoders = {}
+    for col in CATEGORICAL:
+        values = data[col].where(data[col].notna(), MISSING).astype(str)
+        encoders[col] = LabelEncoder().fit(values)
+        data[col] = encoders[col].transform(values)
+    targets = ["Water_Use", "Temperature_Requirement", "Rainfall_Requirement"]
+    return {
+        "path": path,
+        "X": data[FEATURES].to_numpy(dtype=np.float64),
+        "y": data[targets].to_numpy(dtype=np.float64),
+        "features": FEATURES,
+        "target": targets,
+        "encoders": encoders,
+        # Unfitted: fit on each training fold in CV, then on all rows for the shipped model
+        "scaler": StandardScaler(),
+        "preprocessing": {"categorical": "per-column LabelEncoder (missing -> '__missing__')", "scaling": "StandardScaler"},
+    }
+
+
+TASKS = {
+    "crop": {
+        "load": load_crop,
+        "estimator": RandomForestClassifier(random_state=42),
+        "classification": True,
+        "metric": "accuracy",
+        "dir": os.path.join(BASE_DIR, "crop-selector"),
+        "model_file": "crop_prediction_model.pkl",
+    },
+    "water": {
+        "load": load_water,
+        "estimator": RandomForestRegressor(random_state=10),
+        "classification": False,
+        "metric": "r2",
+        "dir": os.path.join(BASE_DIR, "water-advisor"),
+        "model_file": "crop_model.pkl",
+    },
+}
+
+
+# --- Cross-validation ---
+def _rows(X, idx):
+    return X.iloc[idx] if hasattr(X, "iloc") else X[idx]
+
+
+def fold_splits(task_name, data, folds, seed):
+    """Test indices per fold, cached per (task, dataset hash, folds, seed)."""
+    key = f"{task_name}-{source_hash(data['path'])[:16]}-k{folds}-s{seed}"
+    path = os.path.join(FOLD_CACHE_DIR, key + ".npz")
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            return [cached[f"fold{i}"] for i in range(folds)], True
+
+    splitter = (StratifiedKFold if TASKS[task_name]["classification"] else KFold)(folds, shuffle=True, random_state=seed)
+    splits = [test for _, test in splitter.split(np.zeros(len(data["y"])), data["y"])]
+    os.makedirs(FOLD_CACHE_DIR, exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez(f, **{f"fold{i}": test for i, test in enumerate(splits)})
+    return splits, False
+
+
+def score(task, model, X, y):
+    predictions = model.predict(X)
+    if task["classification"]:
+        return {"accuracy": accuracy_score(y, predictions)}
+    return {"r2": r2_score(y, predictions), "rmse": float(np.sqrt(mean_squared_error(y, predictions)))}
+
+
+def _fit_fold(task, params, X, y, test, scaler=None):
+    train = np.setdiff1d(np.arange(len(y)), test, assume_unique=True)
+    X_train, X_test = _rows(X, train), _rows(X, test)
+    if scaler is not None:
+        # Scaled with training-fold statistics only, so the test fold stays unseen
+        scaler = clone(scaler).fit(X_train)
+        X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+    model = clone(task["estimator"]).set_params(n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X_train, y[train])
+    fit_seconds = time.perf_counter() - start
+    return score(task, model, X_test, y[test]), fit_seconds
+
+
+def candidates(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+# --- Serving cost ---
+def latency_ms(predict, row, repeats=200):
+    predict(row)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(row)
+        times.append(time.perf_counter() - start)
+    return round(float(np.median(times)) * 1000, 4)
+
+
+def serving_cost(task, model, X):
+    row = _rows(X, [0])
+    cost = {
+        "size_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "latency_ms": latency_ms(model.predict_proba if task["classification"] else model.predict, row),
+    }
+    if task["classification"]:
+        # What the server actually runs for single requests (see forest_eval.py)
+        flat = FlatForest.from_sklearn(model)
+        cost["flat_latency_ms"] = latency_ms(flat.predict_proba, np.asarray(row, dtype=np.float64))
+        cost["serving_latency_ms"] = cost["flat_latency_ms"]
+    else:
+        cost["serving_latency_ms"] = cost["latency_ms"]
+    return cost
+
+
+def select(results, mode, tolerance, max_latency_ms, max_size_mb):
+    eligible = [
+        r for r in results
+        if (max_latency_ms is None or r["serving_latency_ms"] <= max_latency_ms)
+        and (max_size_mb is None or r["size_bytes"] <= max_size_mb * 1024 * 1024)
+    ]
+    if not eligible:
+        raise SystemExit("❌ No candidate meets the latency/size limits.")
+    best = max(r["cv_mean"] for r in eligible)
+    if mode == "accuracy":
+        return max(eligible, key=lambda r: (r["cv_mean"], -r["serving_latency_ms"]))
+    close = [r for r in eligible if r["cv_mean"] >= best - tolerance]
+    return min(close, key=lambda r: (r["serving_latency_ms"], r["size_bytes"], -r["cv_mean"]))
+
+
+# --- Artifacts ---
+def _atomic_copy(src, dst):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".tmp-")
+    os.close(fd)
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def write_artifacts(task_name, task, data, model, metadata, promote):
+    version_dir = os.path.join(task["dir"], "versions", metadata["version"])
+    os.makedirs(version_dir, exist_ok=True)
+
+    files = {task["model_file"]: model}
+    if task_name == "water":
+        files["encoder.pkl"] = data["encoders"]
+        files["scaler.pkl"] = data["scaler"]
+    for name, obj in files.items():
+        # Uncompressed so the registry can memory-map the arrays (MODEL_MMAP_MODE)
+        joblib.dump(obj, os.path.join(version_dir, name))
+    if task_name == "crop":
+        flat_file = os.path.splitext(task["model_file"])[0] + ".npz"
+        FlatForest.from_sklearn(model).save(os.path.join(version_dir, flat_file))
+        files[flat_file] = None
+
+    meta_file = os.path.basename(metadata_path(task["model_file"]))
+    with open(os.path.join(version_dir, meta_file), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, default=str)
+
+    if promote:
+        # Sidecar first, so a hot reload never pairs the new model with old metadata
+        for name in [meta_file] + list(files):
+            _atomic_copy(os.path.join(version_dir, name), os.path.join(task["dir"], name))
+    return version_dir
+
+
+def print_table(results, chosen, metric):
+    print(f"\n{'#':>3} {metric:>10} {'± std':>7} {'fit s':>7} {'serve ms':>9} {'size MB':>8}  params")
+    for i, r in enumerate(sorted(results, key=lambda r: -r["cv_mean"])):
+        mark = "✅" if r is chosen else "  "
+        print(f"{i:>3} {r['cv_mean']:>10.4f} {r['cv_std']:>7.4f} {r['fit_seconds']:>7.2f} "
+              f"{r['serving_latency_ms']:>9.3f} {r['size_bytes'] / 1048576:>8.2f}  {mark} {r['params']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and select the served models.")
+    parser.add_argument("task", choices=sorted(TASKS))
+    parser.add_argument("--search", choices=sorted(GRIDS), default="quick")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel CV jobs (-1 = all cores)")
+    parser.add_argument("--select", choices=["balanced", "accuracy"], default="balanced")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="CV score a faster model may give up (balanced)")
+    parser.add_argument("--max-latency-ms", type=float)
+    parser.add_argument("--max-size-mb", type=float)
+    parser.add_argument("--no-promote", action="store_true", help="only write the versioned artifacts")
+    args = parser.parse_args(argv)
+
+    task = TASKS[args.task]
+    data = task["load"]()
+    X, y = data["X"], data["y"]
+    metric = task["metric"]
+    splits, cached = fold_splits(args.task, data, args.folds, args.seed)
+    grid = candidates(GRIDS[args.search])
+    print(f"📊 {args.task}: {len(y)} rows, {len(grid)} candidates x {args.folds} folds "
+          f"({'cached' if cached else 'new'} splits)")
+
+    start = time.perf_counter()
+    fold_results = joblib.Parallel(n_jobs=args.jobs)(
+        joblib.delayed(_fit_fold)(task, params, X, y, test, data.get("scaler"))
+        for params in grid for test in splits
+    )
+    print(f"⏱️ Cross-validation took {time.perf_counter() - start:.1f}s")
+
+    results = []
+    for i, params in enumerate(grid):
+        folds = fold_results[i * args.folds:(i + 1) * args.folds]
+        scores = [s[metric] for s, _ in folds]
+        results.append({
+            "params": params,
+            "cv_mean": float(np.mean(scores)),
+            "cv_std": float(np.std(scores)),
+            "cv_scores": [round(s, 5) for s in scores],
+            "fit_seconds": float(np.mean([t for _, t in folds])),
+        })
+
+    if data.get("scaler") is not None:
+        data["scaler"] = clone(data["scaler"]).fit(X)
+        X = data["scaler"].transform(X)
+
+    def refit(params):
+        model = clone(task["estimator"]).set_params(n_jobs=-1, **params).fit(X, y)
+        return model.set_params(n_jobs=None)
+
+    # Measure each candidate's serving cost on a full refit, keeping one model in memory at a time
+    for r in results:
+        r.update(serving_cost(task, refit(r["params"]), X))
+
+    chosen = select(results, args.select, args.tolerance, args.max_latency_ms, args.max_size_mb)
+    # Fixed random_state, so this is the same model that was measured
+    model = refit(chosen["params"])
+    print_table(results, chosen, metric)
+
+    data_hash = source_hash(data["path"])
+    version = f"{args.task}-{time.strftime('%Y%m%d-%H%M%S')}-{data_hash[:8]}"
+    metadata = {
+        "version": version,
+        "task": args.task,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "estimator": type(model).__name__,
+        "params": chosen["params"],
+        "features": data["features"],
+        "target": data["target"],
+        "preprocessing": data["preprocessing"],
+        "classes": [str(c) for c in getattr(model, "classes_", [])],
+        "encoders": {col: [str(c) for c in enc.classes_] for col, enc in data.get("encoders", {}).items()},
+        "data": {"path": os.path.relpath(data["path"], BASE_DIR), "sha256": data_hash, "rows": int(len(y))},
+        "cv": {"folds": args.folds, "seed": args.seed, "metric": metric, "mean": chosen["cv_mean"], "std": chosen["cv_std"]},
+        "serving": {k: chosen[k] for k in ("size_bytes", "latency_ms", "flat_latency_ms", "serving_latency_ms") if k in chosen},
+        "selection": {"mode": args.select, "tolerance": args.tolerance,
+                      "max_latency_ms": args.max_latency_ms, "max_size_mb": args.max_size_mb},
+        "candidates": results,
+        "environment": {"python": platform.python_version(), "sklearn": sklearn.__version__, "numpy": np.__version__},
+    }
+    version_dir = write_artifacts(args.task, task, data, model, metadata, promote=not args.no_promote)
+    print(f"\n✅ Selected {chosen['params']} ({metric} {chosen['cv_mean']:.4f}, "
+          f"{chosen['serving_latency_ms']:.3f} ms/row, {chosen['size_bytes'] / 1048576:.2f} MB)")
+    print(f"📦 Artifacts: {os.path.relpath(version_dir)}" + ("" if args.no_promote else " (promoted)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import numpy as np
 # Load the model, encoder, and scaler
 model = joblib.load('crop_model.pkl')
 encoder = joblib.load('encoder.pkl')
+# train.py saves one encoder per column; older artifacts are a single LabelEncoder
+encoders = encoder if isinstance(encoder, dict) else {col: encoder for col in ["Soil_Type", "Irrigation_Type", "Water_Scarcity", "Crop_Name"]}
 scaler = joblib.load('scaler.pkl')
 
 # Example input data for testing (values need to be entered based on your case)
@@ -19,10 +21,10 @@ input_data = {
 }
 
 # Check if input labels match with encoder's training labels
-input_data["Soil_Type"] = encoder.transform([input_data["Soil_Type"]])[0] if input_data["Soil_Type"] in encoder.classes_ else -1
-input_data["Irrigation_Type"] = encoder.transform([input_data["Irrigation_Type"]])[0] if input_data["Irrigation_Type"] in encoder.classes_ else -1
-input_data["Water_Scarcity"] = encoder.transform([input_data["Water_Scarcity"]])[0] if input_data["Water_Scarcity"] in encoder.classes_ else -1
-input_data["Crop_Name"] = encoder.transform([input_data["Crop_Name"]])[0] if input_data["Crop_Name"] in encoder.classes_ else -1
+input_data["Soil_Type"] = encoders["Soil_Type"].transform([input_data["Soil_Type"]])[0] if input_data["Soil_Type"] in encoders["Soil_Type"].classes_ else -1
+input_data["Irrigation_Type"] = encoders["Irrigation_Type"].transform([input_data["Irrigation_Type"]])[0] if input_data["Irrigation_Type"] in encoders["Irrigation_Type"].classes_ else -1
+input_data["Water_Scarcity"] = encoders["Water_Scarcity"].transform([input_data["Water_Scarcity"]])[0] if input_data["Water_Scarcity"] in encoders["Water_Scarcity"].classes_ else -1
+input_data["Crop_Name"] = encoders["Crop_Name"].transform([input_data["Crop_Name"]])[0] if input_data["Crop_Name"] in encoders["Crop_Name"].classes_ else -1
 
 # Handle missing or unseen labels: -1 is used for unseen labels
 if input_data["Soil_Type"] == -1 or input_data["Irrigation_Type"] == -1 or input_data["Water_Scarcity"] == -1 or input_data["Crop_Name"] == -1:
@@ -0,0 +1,188 @@
+"""
+Serving path for the water-advisor RandomForestRegressor.
+
+Categorical inputs are encoded with one vocabulary per column, numeric inputs
+are snapped to agronomically meaningful steps (10 mm rainfall, 0.5 °C, ...)
+and scaled in one array operation. Predictions are cached on the snapped
+inputs, so repeat queries skip the forest entirely. A batch only evaluates
+its distinct cache misses, in a single predict call.
+
+The original make_model.py reused one LabelEncoder for every column, so
+encoder.pkl only knows crop names. Each column was still encoded as its own
+sorted vocabulary at training time, so encoders_from_dataset() rebuilds
+exactly those codes from the CSV when per-column encoders are not available.
+"""
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from datasets import read_dataset
+
+FEATURES = [
+    "Rainfall_Requirement",
+    "Temperature_Requirement",
+    "Soil_Type",
+    "Irrigation_Type",
+    "Water_Scarcity",
+    "Yield",
+    "Crop_Cycle_Duration",
+    "Crop_Name",
+]
+CATEGORICAL = ["Soil_Type", "Irrigation_Type", "Water_Scarcity", "Crop_Name"]
+NUMERIC = [f for f in FEATURES if f not in CATEGORICAL]
+TARGETS = ["water_use", "temperature_requirement", "rainfall_requirement"]
+
+# Dataset column -> model feature (same renames as water-advisor/make_model.py)
+DATASET_COLUMNS = {
+    "Rainfall Requirement (mm/year)": "Rainfall_Requirement",
+    "Temperature Requirement (°C)": "Temperature_Requirement",
+    "Soil Type": "Soil_Type",
+    "Irrigation Type": "Irrigation_Type",
+    "Water Scarcity": "Water_Scarcity",
+    "Yield (tons/ha)": "Yield",
+    "Crop Cycle Duration (days)": "Crop_Cycle_Duration",
+    "Crop": "Crop_Name",
+}
+
+# Cache granularity for numeric inputs
+STEPS = {
+    "Rainfall_Requirement": 10.0,       # mm/year
+    "Temperature_Requirement": 0.5,     # °C
+    "Yield": 0.1,                       # tons/ha
+    "Crop_Cycle_Duration": 5.0,         # days
+}
+
+# Labels the frontend uses -> dataset labels (None = the dataset's missing value)
+ALIASES = {
+    "Soil_Type": {"clay": "clayey", "loam": "loamy", "silt": "silty", "sand": "sandy"},
+    "Irrigation_Type": {"surface": "flood", "unknown": None, "none": None, "": None},
+}
+
+UNSEEN = -1     # code for labels the model never saw (as in water-advisor/test_model.py)
+MISSING = "__missing__"
+
+
+def encoders_from_dataset(path):
+    """Rebuilds LabelEncoder codes per column: sorted labels, missing last."""
+    data = read_dataset(path, usecols=[c for c, f in DATASET_COLUMNS.items() if f in CATEGORICAL])
+    data = data.rename(columns=DATASET_COLUMNS)
+    encoders = {}
+    for col in CATEGORICAL:
+        labels = sorted(str(v) for v in data[col].dropna().unique())
+        vocab = {label.lower(): code for code, label in enumerate(labels)}
+        if data[col].isna().any():
+            vocab[MISSING] = len(labels)
+        encoders[col] = vocab
+    return encoders
+
+
+def encoders_from_artifact(artifact):
+    """Accepts {column: LabelEncoder or list of labels}; returns per-column vocabularies."""
+    encoders = {}
+    for col in CATEGORICAL:
+        classes = getattr(artifact[col], "classes_", artifact[col])
+        vocab = {}
+        for code, label in enumerate(classes):
+            missing = label is None or (isinstance(label, float) and math.isnan(label))
+            vocab[MISSING if missing else str(label).lower()] = code
+        encoders[col] = vocab
+    return encoders
+
+
+def _encode(vocab, column, value):
+    """Returns (code, warning or None)."""
+    label = MISSING if value is None else str(value).strip().lower()
+    if label != MISSING:
+        label = ALIASES.get(column, {}).get(label, label)
+        label = MISSING if label is None else label
+    if label in vocab:
+        return vocab[label], None
+    if column == "Crop_Name" and label != MISSING:
+        for plural in (label + "s", label + "es"):
+            if plural in vocab:
+                return vocab[plural], None
+    return UNSEEN, f"Unseen {column} '{value}', prediction may be inaccurate."
+
+
+class WaterAdvisorModel:
+    def __init__(self, model, scaler, encoders, cache_size=4096):
+        self.model = model
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.encoders = encoders
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _row(self, record):
+        """Snapped feature row (as a hashable key) plus any warnings."""
+        row, warnings = [], []
+        for i, feature in enumerate(FEATURES):
+            value = record.get(feature)
+            if feature in CATEGORICAL:
+                code, warning = _encode(self.encoders[feature], feature, value)
+                row.append(float(code))
+                if warning:
+                    warnings.append(warning)
+                continue
+            try:
+                number = float(value)
+                if not math.isfinite(number):
+                    raise ValueError
+            except (TypeError, ValueError):
+                number = self.mean[i]
+                warnings.append(f"Missing {feature}, using the dataset average.")
+            step = STEPS.get(feature)
+            row.append(round(number / step) * step if step else number)
+        return tuple(row), warnings
+
+    def predict(self, records):
+        """
+        Predicts for a list of input dicts (model feature names as keys).
+        Returns one {target: value, ..., "warnings": [...]} per record.
+        """
+        rows = [self._row(r if isinstance(r, dict) else {}) for r in records]
+
+        known, misses = {}, {}
+        for key, _ in rows:
+            if key in known or key in misses:
+                continue
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                known[key] = cached
+            else:
+                misses[key] = None
+        self.stats["hits"] += len(rows) - len(misses)
+        self.stats["misses"] += len(misses)
+
+        if misses:
+            keys = list(misses)
+            X = (np.asarray(keys, dtype=np.float64) - self.mean) / self.scale
+            predictions = np.atleast_2d(self.model.predict(X))
+            for key, values in zip(keys, predictions):
+                known[key] = self._cache[key] = {t: round(float(v), 2) for t, v in zip(TARGETS, values)}
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+
+        return [{**known[key], "warnings": warnings} for key, warnings in rows]
+
+    def predict_one(self, record):
+        return self.predict([record])[0]
+
+    def cache_info(self):
+        return {**self.stats, "size": len(self._cache), "max_size": self.cache_size}
+
+
+def load_water_advisor(model_dir, dataset_path, cache_size=4096):
+    """
+    Loads crop_model.pkl, scaler.pkl and encoder.pkl from model_dir without
+    the model registry (for worker processes).
+    """
+    import joblib
+
+    forest, scaler, encoder = (joblib.load(f"{model_dir}/{name}.pkl") for name in ("crop_model", "scaler", "encoder"))
+    encoders = encoders_from_artifact(encoder) if isinstance(encoder, dict) else encoders_from_dataset(dataset_path)
+    return WaterAdvisorModel(forest, scaler, encoders, cache_size=cache_size)
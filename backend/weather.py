@@ -0,0 +1,222 @@
+"""
+Recent-weather summaries for a map location, for the crop selector.
+
+Coordinates are snapped to a grid tile (WEATHER_TILE_DEG, 0.1° ~ 11 km by
+default) and each tile is fetched once per day. The averages are computed
+here, and the summary is cached per (tile, day) in an LRU, so repeat clicks
+around the same place cost a dict lookup. Concurrent requests for a tile
+that is still being fetched wait for that one upstream call instead of
+starting their own.
+
+The upstream is pluggable: WEATHER_PROVIDER "open-meteo" (default) calls the
+open-meteo archive API through one pooled httpx.AsyncClient. "fixture"
+serves a local JSON file, or deterministic synthetic weather, and is what
+tests and offline deployments use.
+"""
+import asyncio
+import datetime
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+OPEN_METEO_ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+DAILY_FIELDS = ("temperature_2m_max", "temperature_2m_min", "precipitation_sum")
+
+
+class WeatherUnavailable(Exception):
+    pass
+
+
+def snap(lat, lon, size):
+    """(row, col) of the tile holding a point, and the tile centre as (lat, lon)."""
+    row, col = math.floor(lat / size), math.floor(lon / size)
+    return (row, col), (round((row + 0.5) * size, 6), round((col + 0.5) * size, 6))
+
+
+# --- Providers ---
+class OpenMeteoProvider:
+    def __init__(self, base_url=OPEN_METEO_ARCHIVE_URL, timeout=10.0, max_connections=20, retries=1):
+        import httpx
+
+        self.base_url = base_url
+        # One pooled client for the whole process; connect failures are retried by the transport
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=retries, limits=limits),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+        )
+
+    async def daily(self, lat, lon, start, end):
+        import httpx
+
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "daily": ",".join(DAILY_FIELDS),
+            "timezone": "auto",
+        }
+        try:
+            response = await self.client.get(self.base_url, params=params)
+            response.raise_for_status()
+            return response.json()["daily"]
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            raise WeatherUnavailable(f"open-meteo request failed: {e}") from e
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class FixtureProvider:
+    """
+    Offline stand-in. With a path, serves the "daily" block of an open-meteo
+    style JSON file for every location. Without one, makes up smooth,
+    repeatable weather from the coordinates and date.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.fixture = None
+        if path:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.fixture = data.get("daily", data)
+        self.calls = 0
+
+    async def daily(self, lat, lon, start, end):
+        self.calls += 1
+        if self.fixture is not None:
+            return self.fixture
+        days = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+        time, t_max, t_min, rain = [], [], [], []
+        for day in days:
+            season = math.sin(2 * math.pi * (day.timetuple().tm_yday - 100) / 365)
+            base = 30 - abs(lat) * 0.4 + 8 * season
+            time.append(day.isoformat())
+            t_max.append(round(base + 5, 1))
+            t_min.append(round(base - 5, 1))
+            rain.append(round(max(0.0, 4 * season + 2 * math.sin(day.toordinal() + lon)), 1))
+        return {"time": time, "temperature_2m_max": t_max, "temperature_2m_min": t_min, "precipitation_sum": rain}
+
+    async def aclose(self):
+        pass
+
+
+def _open_meteo_provider():
+    return OpenMeteoProvider(
+        base_url=os.getenv("WEATHER_URL", OPEN_METEO_ARCHIVE_URL),
+        timeout=float(os.getenv("WEATHER_TIMEOUT", 10)),
+        max_connections=int(os.getenv("WEATHER_MAX_CONNECTIONS", 20)),
+    )
+
+
+def _fixture_provider():
+    return FixtureProvider(os.getenv("WEATHER_FIXTURE") or None)
+
+
+# name -> factory returning a provider
+PROVIDERS = {
+    "open-meteo": _open_meteo_provider,
+    "fixture": _fixture_provider,
+}
+
+
+def create_provider(name=None):
+    name = name or os.getenv("WEATHER_PROVIDER", "open-meteo")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown weather provider '{name}'. Choose from {', '.join(PROVIDERS)}.")
+    return PROVIDERS[name]()
+
+
+# --- Aggregation ---
+def _mean(values):
+    # The archive leaves the last few days null until they are final
+    present = [v for v in values if v is not None]
+    return round(sum(present) / len(present), 2) if present else None
+
+
+def summarize(daily):
+    """Averages and the daily series of an open-meteo style "daily" block."""
+    t_max, t_min, rain = (daily.get(field) or [] for field in DAILY_FIELDS)
+    present_rain = [v for v in rain if v is not None]
+    return {
+        # Mean daily maximum: what the crop selector has always called the average temperature
+        "average_temperature": _mean(t_max),
+        "average_min_temperature": _mean(t_min),
+        "average_rainfall": _mean(rain),
+        "total_rainfall": round(sum(present_rain), 1),
+        "days_reported": len(present_rain),
+        "daily": {
+            "dates": daily.get("time") or [],
+            "max_temperatures": t_max,
+            "min_temperatures": t_min,
+            "rainfall": rain,
+        },
+    }
+
+
+class WeatherService:
+    def __init__(self, provider, tile_size=0.1, days=30, cache_size=4096):
+        self.provider = provider
+        self.tile_size = tile_size
+        self.days = days
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def cache_info(self):
+        with self._lock:
+            return {**self.stats, "size": len(self._cache), "max_size": self.cache_size, "inflight": len(self._inflight)}
+
+    async def summary(self, lat, lon, today=None):
+        """Cached weather summary for the tile holding (lat, lon). Raises ValueError or WeatherUnavailable."""
+        lat, lon = float(lat), float(lon)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat must be within [-90, 90] and lon within [-180, 180].")
+        tile, (center_lat, center_lon) = snap(lat, lon, self.tile_size)
+        today = today or datetime.date.today()
+        key = (tile, today)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return cached
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.stats["coalesced"] += 1
+            else:
+                self.stats["misses"] += 1
+                pending = asyncio.ensure_future(self._fetch(key, center_lat, center_lon, today))
+                self._inflight[key] = pending
+        # shield: a caller that gives up does not cancel the fetch for the others
+        return await asyncio.shield(pending)
+
+    async def _fetch(self, key, lat, lon, today):
+        try:
+            start = today - datetime.timedelta(days=self.days)
+            daily = await self.provider.daily(lat, lon, start, today)
+            result = {
+                "tile": {"lat": lat, "lon": lon, "size": self.tile_size},
+                "start_date": start.isoformat(),
+                "end_date": today.isoformat(),
+                **summarize(daily),
+            }
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                    self.stats["evictions"] += 1
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aclose(self):
+        await self.provider.aclose()
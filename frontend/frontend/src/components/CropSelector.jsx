@@ -5,6 +5,8 @@ import MapSelector from "./MapSelector";
 import { Line, Bar } from "react-chartjs-2";
 import "chart.js/auto";
 
+const API_BASE = "http://127.0.0.1:8000"; // backend URL
+
 const CropSelector = () => {
   const [coordinates, setCoordinates] = useState([28.6139, 77.209]);
   const [nitrogen, setNitrogen] = useState("");
@@ -17,40 +19,26 @@ const CropSelector = () => {
   const [loading, setLoading] = useState(false);
   const [weatherLoading, setWeatherLoading] = useState(false);
 
-  // Fetch weather data
+  // Fetch weather data (aggregated and cached per map tile by the backend)
   const fetchMonthlyWeatherData = async (lat, lon) => {
     setWeatherLoading(true);
     try {
-      const startDate = new Date();
-      startDate.setDate(startDate.getDate() - 30);
-      const formattedStartDate = startDate.toISOString().split("T")[0];
-      const endDate = new Date().toISOString().split("T")[0];
-
-      const url = `https://archive-api.open-meteo.com/v1/archive?latitude=${lat}&longitude=${lon}&start_date=${formattedStartDate}&end_date=${endDate}&daily=temperature_2m_max,temperature_2m_min,precipitation_sum&timezone=auto`;
-
-      const response = await axios.get(url);
+      const response = await axios.get(`${API_BASE}/api/weather`, {
+        params: { lat, lon },
+      });
       const data = response.data;
-
-      const { temperature_2m_max, temperature_2m_min, precipitation_sum, time } =
-        data.daily;
-
-      const avgTemp =
-        temperature_2m_max.reduce((a, b) => a + b, 0) /
-        temperature_2m_max.length;
-      const avgRainfall =
-        precipitation_sum.reduce((a, b) => a + b, 0) /
-        precipitation_sum.length;
+      if (data.error) throw new Error(data.error);
 
       setWeatherData({
-        averageTemperature: avgTemp,
-        averageRainfall: avgRainfall,
+        averageTemperature: data.average_temperature,
+        averageRainfall: data.average_rainfall,
       });
 
       setDailyWeather({
-        dates: time,
-        maxTemperatures: temperature_2m_max,
-        minTemperatures: temperature_2m_min,
-        rainfall: precipitation_sum,
+        dates: data.daily.dates,
+        maxTemperatures: data.daily.max_temperatures,
+        minTemperatures: data.daily.min_temperatures,
+        rainfall: data.daily.rainfall,
       });
     } catch (error) {
       console.error("Error fetching monthly weather data:", error);
@@ -88,7 +76,7 @@ const CropSelector = () => {
 
     try {
       const response = await axios.post(
-       "http://127.0.0.1:8000/api/select_crop",
+       `${API_BASE}/api/select_crop`,
         WData,
       {
       headers: { "Content-Type": "application/json" },
@@ -28,6 +28,49 @@ export default function FarmerChatbotPage() {
     }
   };
 
+  // 📡 Stream the answer from the backend (SSE over fetch), calling onText as tokens arrive
+  const streamAnswer = async (question, onText) => {
+    const res = await fetch(`${API}/api/ask/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ query: question }),
+    });
+    if (!res.ok || !res.body) throw new Error(`Stream failed (${res.status})`);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let answer = "";
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let sep;
+      while ((sep = buffer.indexOf("\n\n")) !== -1) {
+        const raw = buffer.slice(0, sep);
+        buffer = buffer.slice(sep + 2);
+
+        let event = "message";
+        let data = "";
+        raw.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        });
+        const payload = data ? JSON.parse(data) : {};
+
+        if (event === "error") throw new Error(payload.message || "Chatbot failed");
+        if (event === "done") return answer;
+        if (payload.token) {
+          answer += payload.token;
+          onText(answer);
+        }
+      }
+    }
+    return answer;
+  };
+
   // 🎤 Start Speech Recognition
   const startListening = () => {
     if (!("webkitSpeechRecognition" in window)) {
@@ -65,22 +108,36 @@ export default function FarmerChatbotPage() {
     setMessages([...messages, { role: "user", text: q }]);
     setInput("");
     setLoading(true);
+    let answerShown = false;
 
     try {
       // 1. Translate farmer's question to English
       const englishQ = await translateText(q, "en");
 
-      // 2. Ask backend in English
-      const res = await axios.post(`${API}/api/ask`, { query: englishQ });
-      let answer = res.data?.answer || "Sorry, I could not find an answer.";
+      // 2. Ask backend in English, showing tokens as they stream in
+      setMessages((msgs) => [...msgs, { role: "assistant", text: "…" }]);
+      answerShown = true;
+      const updateAnswer = (text) =>
+        setMessages((msgs) => [...msgs.slice(0, -1), { role: "assistant", text }]);
+
+      let answer;
+      try {
+        answer = await streamAnswer(englishQ, updateAnswer);
+      } catch (streamErr) {
+        console.error("Streaming failed, falling back", streamErr);
+        const res = await axios.post(`${API}/api/ask`, { query: englishQ });
+        answer = res.data?.answer;
+      }
+      answer = answer || "Sorry, I could not find an answer.";
 
       // 3. Translate answer back to selected language
-      const translatedAnswer = await translateText(answer, language);
+      const translatedAnswer = language === "en" ? answer : await translateText(answer, language);
 
-      setMessages((msgs) => [...msgs, { role: "assistant", text: translatedAnswer }]);
+      updateAnswer(translatedAnswer);
       speak(translatedAnswer, language); // Speak out
     } catch (e) {
-      setMessages((msgs) => [...msgs, { role: "assistant", text: "⚠️ Server error. Try again." }]);
+      const error = { role: "assistant", text: "⚠️ Server error. Try again." };
+      setMessages((msgs) => (answerShown ? [...msgs.slice(0, -1), error] : [...msgs, error]));
     } finally {
       setLoading(false);
     }